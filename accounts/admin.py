@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.models import User
+from recipes.deletion import restore_user, soft_delete_user
 from .models import UserProfile
 
 
@@ -27,6 +28,28 @@ class CustomUserAdmin(UserAdmin):
     Extends Django's default User admin to include UserProfile.
     """
     inlines = [UserProfileInline]
+    list_filter = UserAdmin.list_filter + ('userprofile__is_deleted',)
+    actions = ['restore_selected']
+
+    # Deleting is a soft delete: the account is deactivated and hidden at
+    # once, and purged by a background job later (see recipes.deletion).
+    # The confirmation page doesn't list every related row, which could
+    # take minutes for a prolific author.
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        soft_delete_user(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            soft_delete_user(user)
+
+    @admin.action(description="Restore selected deleted users")
+    def restore_selected(self, request, queryset):
+        for user in queryset:
+            restore_user(user)
+        self.message_user(request, f"Restored {len(queryset)} users.")
 
 # Unregister the default User admin and register our custom one
 
@@ -44,10 +67,12 @@ class UserProfileAdmin(admin.ModelAdmin):
     """
     list_display = [
                     'user',
+                    'is_deleted',
                     'created_at',
                     'updated_at'
                     ]
     list_filter = [
+                   'is_deleted',
                    'created_at',
                    'updated_at'
                    ]
@@ -58,7 +83,8 @@ class UserProfileAdmin(admin.ModelAdmin):
                      ]
     readonly_fields = [
                        'created_at',
-                       'updated_at'
+                       'updated_at',
+                       'deleted_at'
                        ]
 
     # Organize fields into sections
@@ -76,7 +102,8 @@ class UserProfileAdmin(admin.ModelAdmin):
         ('Timestamps', {
             'fields': [
                        'created_at',
-                       'updated_at'
+                       'updated_at',
+                       'deleted_at'
                        ],
             'classes': ['collapse']  # collapsed by default
         })
@@ -18,6 +18,10 @@ class UserProfile(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Soft delete: the account is deactivated and hidden straight away,
+    # then really removed by a background purge (see recipes.deletion)
+    is_deleted = models.BooleanField(default=False, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         """
@@ -0,0 +1,14 @@
+"""
+Signal handlers for the accounts app.
+"""
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from recipes.tasks import rebuild_feed
+from .models import UserProfile
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, **kwargs):
+    # Dietary preferences decide what the personalised feed may show
+    rebuild_feed.enqueue(user_id=instance.user_id)
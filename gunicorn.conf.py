@@ -0,0 +1,47 @@
+"""
+Gunicorn settings, picked up automatically by `gunicorn only_pans.wsgi`
+(see Procfile). Worker count and port come from Heroku's WEB_CONCURRENCY
+and PORT, which gunicorn reads itself.
+
+preload_app loads Django once in the master process; workers are forked
+from it already warm, so booting (and restarting) a worker costs almost
+nothing and the loaded code is shared between workers. Set
+GUNICORN_PRELOAD=False to go back to every worker loading its own copy.
+Use `python manage.py profile_startup` to see what loading costs.
+
+The hooks also look after the /metrics files (see metrics/registry.py):
+they are switched on and cleared when gunicorn starts, and a finished
+worker's numbers are folded into the archive so totals survive worker
+restarts.
+"""
+import gc
+import os
+
+
+preload_app = os.environ.get("GUNICORN_PRELOAD", "True") == "True"
+
+
+def on_starting(server):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "only_pans.settings")
+    from metrics.registry import use_files
+    use_files()
+
+
+def pre_fork(server, worker):
+    # Move everything loaded so far out of the garbage collector's reach,
+    # so collections in a worker don't touch (and copy) the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Database and cache connections must not be shared between
+    # processes; close any the master opened so each worker makes its own
+    from django.core.cache import caches
+    from django.db import connections
+    connections.close_all()
+    caches.close_all()
+
+
+def child_exit(server, worker):
+    from metrics.registry import retire_process
+    retire_process(worker.pid)
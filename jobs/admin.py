@@ -0,0 +1,42 @@
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """
+    Admin interface for background jobs - mostly for looking at failures.
+    """
+    list_display = [
+                    'name',
+                    'kwargs',
+                    'status',
+                    'priority',
+                    'attempts',
+                    'run_after',
+                    'finished_at'
+                    ]
+    list_filter = [
+                   'status',
+                   'name'
+                   ]
+    search_fields = ['name', 'dedupe_key']
+    readonly_fields = [
+                       'created_at',
+                       'finished_at',
+                       'locked_by',
+                       'locked_at',
+                       'last_error'
+                       ]
+    ordering = ['-created_at']
+    actions = ['retry_jobs']
+
+    @admin.action(description="Retry selected failed jobs")
+    def retry_jobs(self, request, queryset):
+        updated = queryset.filter(status=Job.FAILED).update(
+            status=Job.PENDING, attempts=0, run_after=timezone.now(),
+            finished_at=None,
+        )
+        self.message_user(request, f"{updated} job(s) queued again.")
@@ -0,0 +1,107 @@
+"""
+Run background jobs.
+
+    python manage.py run_worker                      # 4 threads, forever
+    python manage.py run_worker --concurrency 8 --executor process
+    python manage.py run_worker --burst              # drain queue and exit
+
+Threads suit the I/O-heavy jobs we have (mostly database work); use
+--executor process for CPU-bound ones. Stops cleanly on SIGTERM/SIGINT,
+letting running jobs finish first.
+"""
+import os
+import signal
+import socket
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait,
+)
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import (
+    claim_jobs, execute, mark_done, mark_failed, prune_finished_jobs,
+    requeue_stale_jobs,
+)
+
+
+HOUSEKEEPING_EVERY = 60  # seconds
+
+
+def _init_process():
+    """Each worker process sets Django up and opens its own connections."""
+    import django
+    django.setup()
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Process queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--executor', choices=['thread', 'process'],
+                            default='thread')
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='seconds to wait when the queue is empty')
+        parser.add_argument('--burst', action='store_true',
+                            help='exit once no jobs are due')
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        concurrency = options['concurrency']
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        if options['executor'] == 'process':
+            connections.close_all()  # don't share sockets with children
+            executor = ProcessPoolExecutor(concurrency,
+                                           initializer=_init_process)
+        else:
+            executor = ThreadPoolExecutor(concurrency,
+                                          thread_name_prefix='job')
+
+        self.stdout.write(f"Worker {worker_id} started "
+                          f"({concurrency} {options['executor']} workers)")
+        in_flight = {}
+        next_housekeeping = 0
+        processed = 0
+        with executor:
+            while not self.stopping or in_flight:
+                if time.monotonic() >= next_housekeeping:
+                    requeue_stale_jobs()
+                    prune_finished_jobs()
+                    next_housekeeping = time.monotonic() + HOUSEKEEPING_EVERY
+
+                free = concurrency - len(in_flight)
+                if free and not self.stopping:
+                    for job in claim_jobs(worker_id, free):
+                        future = executor.submit(execute, job.name,
+                                                 job.kwargs)
+                        in_flight[future] = job
+
+                if not in_flight:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(in_flight, timeout=options['poll_interval'],
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = in_flight.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        mark_done(job)
+                    else:
+                        mark_failed(job, error)
+                    processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Worker {worker_id} stopped after {processed} jobs"))
+
+    def _stop(self, signum, frame):
+        self.stdout.write("Stopping after running jobs finish...")
+        self.stopping = True
@@ -0,0 +1,60 @@
+from django.db import models
+from django.db.models import Q
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by `python manage.py run_worker`.
+
+    Jobs with the same name and dedupe_key coalesce while they are still
+    pending - 50 edits to one recipe leave exactly one job in the queue.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100,
+                            help_text='registered task name')
+    kwargs = models.JSONField(default=dict, blank=True)
+    dedupe_key = models.CharField(
+        max_length=255,
+        null=True,
+        blank=True,
+        help_text='pending jobs with the same name + key are merged'
+    )
+    status = models.CharField(max_length=10,
+                              choices=STATUS_CHOICES,
+                              default=PENDING)
+    priority = models.IntegerField(default=0,
+                                   help_text='higher runs first')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(help_text='not before this time')
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker's "what's next?" query
+            models.Index(fields=['status', '-priority', 'run_after']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'dedupe_key'],
+                condition=Q(status='pending'),
+                name='jobs_one_pending_per_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} {self.kwargs} ({self.status})"
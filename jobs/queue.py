@@ -0,0 +1,213 @@
+"""
+A small database-backed job queue.
+
+Register work with the @task decorator in an app's tasks.py:
+
+    @task(priority=5, delay=2)
+    def refresh_recipe_nutrition(recipe_id):
+        ...
+
+and queue it from anywhere (a view, a signal handler):
+
+    refresh_recipe_nutrition.enqueue(recipe_id=recipe.pk)
+
+Enqueueing is a single INSERT in the caller's transaction, so a rolled
+back request never leaves a job behind. Pending jobs with the same task
+and arguments coalesce into one, and ``delay`` gives bursts of edits
+time to collapse before the worker picks the job up.
+"""
+import hashlib
+import json
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Count, F, Subquery
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+# Retry backoff: 10s, 40s, 160s, ...
+RETRY_BASE_SECONDS = 10
+RETRY_FACTOR = 4
+# A job still "running" after this long is assumed to have lost its worker
+STALE_AFTER = timedelta(minutes=15)
+
+
+class TaskInfo:
+    """What the registry knows about one task."""
+
+    def __init__(self, name, func, priority, max_attempts, delay):
+        self.name = name
+        self.func = func
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.delay = delay
+
+
+_registry = {}
+
+
+def task(name=None, priority=0, max_attempts=3, delay=0):
+    """
+    Register a function as a background task.
+
+    - name: defaults to "<app>.<function name>"
+    - priority: higher runs first
+    - max_attempts: runs before the job is marked failed
+    - delay: seconds to wait before running, so repeated enqueues in a
+      burst coalesce into one job
+    """
+    def decorator(func):
+        task_name = name or (
+            f"{func.__module__.split('.')[0]}.{func.__name__}")
+        _registry[task_name] = TaskInfo(task_name, func, priority,
+                                        max_attempts, delay)
+
+        def enqueue_task(**kwargs):
+            return enqueue(task_name, **kwargs)
+        func.task_name = task_name
+        func.enqueue = enqueue_task
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(name, dedupe=True, priority=None, delay=None, **kwargs):
+    """
+    Queue task ``name`` to run with ``kwargs`` (must be JSON friendly).
+
+    With dedupe on (the default) a pending job for the same task and
+    arguments absorbs this one - the insert is skipped by the database's
+    unique constraint, no extra query needed. The arguments are matched
+    by a hash, so long ones (lists of ids) fit in dedupe_key.
+
+    With settings.JOBS_EAGER the task runs in-process as soon as the
+    current transaction commits (handy for development without a worker).
+    """
+    info = _registry[name]
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: info.func(**kwargs))
+        return
+
+    delay = info.delay if delay is None else delay
+    Job.objects.bulk_create([Job(
+        name=name,
+        kwargs=kwargs,
+        dedupe_key=(dedupe_key(kwargs) if dedupe else None),
+        priority=info.priority if priority is None else priority,
+        max_attempts=info.max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )], ignore_conflicts=True)
+
+
+def dedupe_key(kwargs):
+    """A fixed-length key for a job's arguments."""
+    text = json.dumps(kwargs, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def queue_depth():
+    """Pending jobs per task name - {'recipes.refresh_...': 3}."""
+    return dict(
+        Job.objects.filter(status=Job.PENDING)
+        .values('name').annotate(n=Count('id'))
+        .values_list('name', 'n')
+    )
+
+
+def claim_jobs(worker_id, limit):
+    """
+    Atomically take up to ``limit`` due jobs, highest priority first.
+
+    The claim is a single UPDATE ... WHERE id IN (next due ids) AND
+    status = 'pending', so two workers racing for the same rows can never
+    both get one - the loser's re-checked status no longer matches.
+    """
+    now = timezone.now()
+    claim = f"{worker_id}:{uuid.uuid4().hex[:8]}"
+    due = (Job.objects.filter(status=Job.PENDING, run_after__lte=now)
+           .order_by('-priority', 'run_after').values('id')[:limit])
+    claimed = Job.objects.filter(
+        id__in=Subquery(due), status=Job.PENDING,
+    ).update(status=Job.RUNNING, locked_by=claim, locked_at=now,
+             attempts=F('attempts') + 1)
+    if not claimed:
+        return []
+    return list(Job.objects.filter(status=Job.RUNNING, locked_by=claim)
+                .order_by('-priority', 'run_after'))
+
+
+def execute(name, kwargs):
+    """
+    Run a task body. Used inside worker threads / processes, so it also
+    tidies up the database connection that thread or process opened.
+    """
+    try:
+        _registry[name].func(**kwargs)
+    finally:
+        close_old_connections()
+
+
+def mark_done(job):
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, finished_at=timezone.now(), last_error='')
+
+
+def mark_failed(job, error):
+    """Schedule a retry with exponential backoff, or give up."""
+    message = ''.join(traceback.format_exception(error))[-4000:]
+    if job.attempts < job.max_attempts:
+        retry_in = RETRY_BASE_SECONDS * RETRY_FACTOR ** (job.attempts - 1)
+        logger.warning("Job %s (%s) failed, retrying in %ss",
+                       job.pk, job.name, retry_in)
+        _requeue(job, run_after=timezone.now() + timedelta(seconds=retry_in),
+                 last_error=message)
+    else:
+        logger.error("Job %s (%s) failed for good", job.pk, job.name)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, finished_at=timezone.now(),
+            last_error=message)
+
+
+def _requeue(job, **fields):
+    """
+    Put a job back to pending. If an identical job was queued in the
+    meantime that one already covers it, so this copy is dropped.
+
+    The unique constraint on pending jobs decides which copy that is: a
+    check-then-update would let an enqueue slip in between the two.
+    """
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING, locked_by='', locked_at=None, **fields)
+    except IntegrityError:
+        Job.objects.filter(pk=job.pk).delete()
+
+
+def requeue_stale_jobs():
+    """Recover jobs whose worker died mid-run. Returns how many."""
+    stale = list(Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=timezone.now() - STALE_AFTER))
+    for job in stale:
+        _requeue(job, run_after=timezone.now())
+    return len(stale)
+
+
+def prune_finished_jobs(older_than=timedelta(days=1)):
+    """Delete done jobs (failed ones are kept for inspection)."""
+    deleted, _ = Job.objects.filter(
+        status=Job.DONE,
+        finished_at__lt=timezone.now() - older_than,
+    ).delete()
+    return deleted
@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import queue
+from .models import Job
+
+
+@queue.task(name='jobs.test_noop')
+def noop(recipe_id):
+    pass
+
+
+@override_settings(JOBS_EAGER=False)
+class EnqueueTests(TestCase):
+
+    def test_long_arguments_are_deduplicated(self):
+        recipe_ids = list(range(1000))
+        noop.enqueue(recipe_id=recipe_ids)
+        noop.enqueue(recipe_id=recipe_ids)
+        noop.enqueue(recipe_id=recipe_ids[:-1])
+        self.assertEqual(Job.objects.count(), 2)
+        self.assertLessEqual(
+            max(len(job.dedupe_key) for job in Job.objects.all()), 255)
+
+
+@override_settings(JOBS_EAGER=False)
+class RequeueTests(TestCase):
+    """Putting a job back to pending while an identical one is queued."""
+
+    def claim(self):
+        noop.enqueue(recipe_id=1)
+        Job.objects.update(run_after=timezone.now())
+        [job] = queue.claim_jobs('test', 1)
+        return job
+
+    def test_stale_job_gives_way_to_a_newer_enqueue(self):
+        job = self.claim()
+        # Another process queues the same work while this copy is running
+        noop.enqueue(recipe_id=1)
+        Job.objects.filter(pk=job.pk).update(
+            locked_at=timezone.now() - queue.STALE_AFTER - timedelta(1))
+
+        self.assertEqual(queue.requeue_stale_jobs(), 1)
+        self.assertEqual(Job.objects.count(), 1)
+        self.assertEqual(Job.objects.get().status, Job.PENDING)
+
+    def test_retry_gives_way_to_a_newer_enqueue(self):
+        job = self.claim()
+        noop.enqueue(recipe_id=1)
+
+        queue.mark_failed(job, ValueError('boom'))
+        self.assertFalse(Job.objects.filter(pk=job.pk).exists())
+        self.assertEqual(
+            Job.objects.filter(status=Job.PENDING).count(), 1)
+
+    def test_retry_without_a_twin_is_requeued(self):
+        job = self.claim()
+
+        queue.mark_failed(job, ValueError('boom'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertEqual(job.locked_by, '')
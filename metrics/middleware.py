@@ -0,0 +1,64 @@
+"""
+Times every request and counts its database queries, for /metrics.
+
+Goes first in MIDDLEWARE so the timing covers all the other middleware.
+Requests are labelled by URL name (not path, which would make a series
+per recipe); anything that didn't match a URL - static files, 404s - is
+labelled "unmatched".
+"""
+import time
+
+from django.db import connection
+
+from . import registry
+
+
+REQUEST_SECONDS = registry.Histogram(
+    'http_request_duration_seconds', 'Time to handle a request',
+    ['view', 'method', 'status'])
+DB_QUERIES = registry.Counter(
+    'db_queries_total', 'Database queries run', ['view'])
+DB_SECONDS = registry.Counter(
+    'db_query_seconds_total', 'Time spent in database queries', ['view'])
+QUERIES_PER_REQUEST = registry.Histogram(
+    'db_queries_per_request', 'Database queries run by one request',
+    ['view'], buckets=(1, 2, 3, 5, 10, 20, 50, 100))
+
+
+class QueryTimer:
+    """execute_wrapper that counts queries and the time they take."""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.view_name if match else '') or 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, view=view, method=request.method,
+                                status=response.status_code)
+        QUERIES_PER_REQUEST.observe(timer.queries, view=view)
+        if timer.queries:
+            DB_QUERIES.inc(timer.queries, view=view)
+            DB_SECONDS.inc(timer.seconds, view=view)
+        return response
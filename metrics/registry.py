@@ -0,0 +1,310 @@
+"""
+Counters and histograms shared by every gunicorn worker, in the
+Prometheus text format.
+
+Each process counts in its own memory - an uncontended lock around a
+dict update, so it costs next to nothing on the request path. Under
+gunicorn (its config calls use_files()) a background thread in each
+process writes a snapshot of its numbers every FLUSH_INTERVAL seconds
+(when they changed) to its own file in settings.METRICS_DIR, named
+after its pid, via a temporary file and a rename so readers never see
+half a file.
+
+A scrape (see metrics.views) adds up the files of the processes still
+running. It only reads files, so it never waits on a worker, and
+workers never wait on it. When gunicorn replaces a worker, the old
+worker's numbers are folded into ARCHIVE (see gunicorn.conf.py) so
+counters never go backwards.
+
+Anywhere else - runserver, the job worker, tests, management commands -
+no files are written and a scrape shows the current process's numbers.
+
+    REQUESTS = Counter('app_things_total', 'Things done', ['kind'])
+    REQUESTS.inc(kind='big')
+    LATENCY = Histogram('app_thing_seconds', 'Time per thing', ['kind'])
+    LATENCY.observe(0.12, kind='big')
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+
+FLUSH_INTERVAL = 1.0
+ARCHIVE = 'archive.json'
+# Seconds - from "instant" to "something is wrong"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# name -> Counter / Histogram, in the order they were defined
+_metrics = {}
+# (name, label values) -> float (counters) or [bucket counts..., sum]
+_values = {}
+_lock = threading.Lock()
+# One flush at a time, so an older snapshot never overwrites a newer one
+_flush_lock = threading.Lock()
+_changed = False
+# The process the flusher thread was started in (threads don't survive
+# a fork, so a forked worker starts its own)
+_flusher_pid = None
+# Set by use_files() in the gunicorn master; forked workers inherit it
+_use_files = False
+
+
+def metrics_dir():
+    return settings.METRICS_DIR
+
+
+class Counter:
+    """A number that only goes up (requests, queries, seconds spent)."""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics[name] = self
+
+    def inc(self, amount=1, **labels):
+        key = (self.name, tuple(str(labels[name])
+                                for name in self.labelnames))
+        _start_flusher()
+        with _lock:
+            _values[key] = _values.get(key, 0) + amount
+            _mark_changed()
+
+    def samples(self, labels, value):
+        yield self.name, labels, value
+
+
+class Histogram:
+    """
+    How values (usually durations) are spread: a count per bucket
+    ("at most 0.1s"), plus their sum and count.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        _metrics[name] = self
+
+    def observe(self, value, **labels):
+        key = (self.name, tuple(str(labels[name])
+                                for name in self.labelnames))
+        index = next(i for i, bound in enumerate(self.buckets)
+                     if value <= bound)
+        _start_flusher()
+        with _lock:
+            counts = _values.get(key)
+            if counts is None:
+                counts = _values[key] = [0] * (len(self.buckets) + 1)
+            counts[index] += 1
+            counts[-1] += value
+            _mark_changed()
+
+    def samples(self, labels, counts):
+        """Buckets are stored one by one; Prometheus wants running totals."""
+        running = 0
+        for bound, count in zip(self.buckets, counts):
+            running += count
+            le = '+Inf' if bound == math.inf else repr(float(bound))
+            yield f'{self.name}_bucket', {**labels, 'le': le}, running
+        yield f'{self.name}_sum', labels, counts[-1]
+        yield f'{self.name}_count', labels, running
+
+
+# ---------------------------------------------------------------------------
+# Files
+# ---------------------------------------------------------------------------
+
+def _write(path, values):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    rows = [[name, list(labels), value]
+            for (name, labels), value in values.items()]
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(rows, file)
+    os.replace(temporary, path)
+
+
+def _read(path):
+    try:
+        with open(path) as file:
+            rows = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return {(name, tuple(labels)): value for name, labels, value in rows}
+
+
+def _add(total, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = total.get(key)
+            total[key] = value[:] if current is None else [
+                a + b for a, b in zip(current, value)]
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def _mark_changed():
+    global _changed
+    _changed = True
+
+
+def use_files():
+    """
+    Share numbers between processes through METRICS_DIR, starting from
+    zero. Called once by the gunicorn master before it forks.
+    """
+    global _use_files
+    _use_files = True
+    clear()
+
+
+def _snapshot():
+    with _lock:
+        return {key: value[:] if isinstance(value, list) else value
+                for key, value in _values.items()}
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def flush():
+    """Write this process's numbers to its file, if they changed."""
+    global _changed
+    if not _use_files:
+        return
+    with _flush_lock:
+        with _lock:
+            if not _changed:
+                return
+            _changed = False
+            snapshot = {key: value[:] if isinstance(value, list) else value
+                        for key, value in _values.items()}
+        _write(os.path.join(metrics_dir(), f'{os.getpid()}.json'),
+               snapshot)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def _start_flusher():
+    global _flusher_pid
+    if not _use_files or _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_forever, daemon=True,
+                     name='metrics-flusher').start()
+
+
+atexit.register(flush)
+
+
+def retire_process(pid):
+    """
+    Fold a finished process's file into the archive. Only called from
+    the gunicorn master, so the archive has a single writer.
+    """
+    directory = metrics_dir()
+    path = os.path.join(directory, f'{pid}.json')
+    values = _read(path)
+    if values:
+        archive = _read(os.path.join(directory, ARCHIVE))
+        _add(archive, values)
+        _write(os.path.join(directory, ARCHIVE), archive)
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def clear():
+    """Start from zero (the gunicorn master does this when it starts)."""
+    directory = metrics_dir()
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json') or name.endswith('.tmp'):
+                os.remove(os.path.join(directory, name))
+
+
+def collect():
+    """
+    Every live process's numbers (plus the archive) added up:
+    {(name, label values): value}. Files left by processes that are
+    gone without being retired are skipped.
+    """
+    if not _use_files:
+        return _snapshot()
+    flush()
+    total = {}
+    directory = metrics_dir()
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            stem, extension = os.path.splitext(name)
+            if extension != '.json':
+                continue
+            if name != ARCHIVE and not (stem.isdecimal()
+                                        and _alive(int(stem))):
+                continue
+            _add(total, _read(os.path.join(directory, name)))
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Text format
+# ---------------------------------------------------------------------------
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def format_sample(name, labels, value):
+    if labels:
+        text = ','.join(f'{key}="{_escape(label)}"'
+                        for key, label in labels.items())
+        name = f'{name}{{{text}}}'
+    return f'{name} {value}'
+
+
+def format_metric(name, kind, documentation, samples):
+    """HELP and TYPE lines, then one line per (name, labels, value)."""
+    lines = [f'# HELP {name} {documentation}', f'# TYPE {name} {kind}']
+    lines += [format_sample(*sample) for sample in samples]
+    return lines
+
+
+def render():
+    """Every registered metric, added up across processes, as text."""
+    values = collect()
+    lines = []
+    for metric in _metrics.values():
+        samples = []
+        for (name, labels), value in sorted(values.items()):
+            if name == metric.name:
+                samples += metric.samples(
+                    dict(zip(metric.labelnames, labels)), value)
+        lines += format_metric(metric.name, metric.kind,
+                               metric.documentation, samples)
+    return lines
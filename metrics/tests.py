@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import registry
+
+
+THINGS = registry.Counter('test_things_total', 'Things counted in tests',
+                          ['kind'])
+
+
+class RegistryTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(METRICS_DIR=self.directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def value(self, kind):
+        return registry.collect().get(('test_things_total', (kind,)), 0)
+
+    def test_outside_gunicorn_nothing_is_written(self):
+        before = self.value('plain')
+        THINGS.inc(kind='plain')
+        registry.flush()
+        self.assertEqual(self.value('plain'), before + 1)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertIn('test_things_total{kind="plain"}',
+                      '\n'.join(registry.render()))
+
+    def test_files_of_dead_processes_are_skipped(self):
+        registry.use_files()
+        self.addCleanup(setattr, registry, '_use_files', False)
+        child = subprocess.Popen([sys.executable, '-c', ''])
+        child.wait()
+        key = ('test_things_total', ('shared',))
+        registry._write(os.path.join(self.directory, f'{child.pid}.json'),
+                        {key: 5})
+        registry._write(os.path.join(self.directory, registry.ARCHIVE),
+                        {key: 2})
+        self.assertEqual(registry.collect()[key], 2)
+
+        THINGS.inc(kind='shared')
+        self.assertEqual(registry.collect()[key], 3)
+        self.assertIn(f'{os.getpid()}.json', os.listdir(self.directory))
+
+        registry.retire_process(child.pid)
+        self.assertEqual(registry.collect()[key], 8)
+
+
+@override_settings(METRICS_TOKEN='secret')
+class MetricsViewTests(TestCase):
+
+    def test_scrapes_need_the_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.get('/api/tags/')
+        response = self.client.get('/metrics',
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('http_request_duration_seconds_bucket{'
+                      'view="api_tag_list",method="GET",status="200"', text)
+        self.assertIn('db_queries_total{view="api_tag_list"}', text)
+        self.assertIn('search_cache_hit_ratio', text)
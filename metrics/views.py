@@ -0,0 +1,68 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+
+from jobs.queue import queue_depth
+from search.cache import stats as search_cache_stats
+from social.throttle import counters as throttle_counters
+from . import registry
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _allowed(request):
+    """
+    Scrapers send "Authorization: Bearer <settings.METRICS_TOKEN>";
+    staff can also just open the page.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token:
+        sent = request.headers.get('Authorization', '')
+        if hmac.compare_digest(sent.encode(), f'Bearer {token}'.encode()):
+            return True
+    return request.user.is_staff
+
+
+def shared_metrics():
+    """
+    Numbers already added up elsewhere - in the shared cache, or the
+    job table - read when scraped rather than counted per process.
+    """
+    lines = []
+    search = search_cache_stats()
+    lines += registry.format_metric(
+        'search_cache_lookups_total', 'counter',
+        'Search cache lookups and evictions by outcome',
+        [('search_cache_lookups_total', {'outcome': outcome}, count)
+         for outcome, count in search.items() if outcome != 'hit_rate'])
+    lines += registry.format_metric(
+        'search_cache_hit_ratio', 'gauge',
+        'Share of search cache lookups answered from the cache',
+        [('search_cache_hit_ratio', {}, search['hit_rate'])])
+    lines += registry.format_metric(
+        'social_writes_total', 'counter',
+        'Like, rating and comment writes by throttle outcome',
+        [('social_writes_total', {'endpoint': endpoint, 'outcome': outcome},
+          count)
+         for endpoint, outcomes in throttle_counters().items()
+         for outcome, count in outcomes.items()])
+    lines += registry.format_metric(
+        'jobs_pending', 'gauge', 'Background jobs waiting to run',
+        [('jobs_pending', {'task': name}, count)
+         for name, count in sorted(queue_depth().items())])
+    return lines
+
+
+@require_GET
+def metrics_view(request):
+    """
+    GET /metrics - request, database, search, social and job queue
+    metrics in the Prometheus text format (see metrics.registry).
+    """
+    if not _allowed(request):
+        return JsonResponse({'error': 'Staff only'}, status=403)
+    lines = registry.render() + shared_metrics()
+    return HttpResponse('\n'.join(lines) + '\n', content_type=CONTENT_TYPE)
@@ -1,8 +1,8 @@
 import os
 import sys
+import tempfile
 from pathlib import Path
 import dj_database_url
-import cloudinary
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'cloudinary_storage',
     'django.contrib.sites',
     'allauth',
@@ -50,15 +51,21 @@ INSTALLED_APPS = [
     'tags',
     'social',
     'search',
+    'jobs',
+    'profiling',
+    'metrics',
 ]
 
 MIDDLEWARE = [
+    'metrics.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'recipes.middleware.PrerenderedPageMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'profiling.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -90,9 +97,24 @@ WSGI_APPLICATION = 'only_pans.wsgi.application'
 DATABASES = {
     'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
 }
-cloudinary.config(
-    cloudinary_url=os.environ.get("CLOUDINARY_URL")
-)
+# Cloudinary reads CLOUDINARY_URL from the environment itself the first
+# time it is used, so it isn't imported or configured here
+
+# Cache shared by every gunicorn worker - Redis in production. Without
+# REDIS_URL (local development) each process gets its own memory cache.
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
 
 
 
@@ -142,3 +164,32 @@ DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 SITE_ID = 1
+
+# Lets the tests run without CLOUDINARY_URL (see only_pans/test_runner.py)
+TEST_RUNNER = 'only_pans.test_runner.TestRunner'
+
+# Background jobs (see jobs/queue.py). Set JOBS_EAGER=True to run jobs
+# straight after each request instead of needing `manage.py run_worker`.
+JOBS_EAGER = os.environ.get("JOBS_EAGER") == "True"
+
+# Request profiling (see profiling/middleware.py). PROFILE_SAMPLE_RATE of
+# requests (e.g. 0.01) are profiled and kept if they took at least
+# PROFILE_SLOW_MS; staff can profile any page with ?profile=1. Stored
+# profiles are pruned to the last PROFILE_KEEP_DAYS / PROFILE_MAX_STORED.
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = int(os.environ.get("PROFILE_SLOW_MS", "500"))
+PROFILE_KEEP_DAYS = 7
+PROFILE_MAX_STORED = 500
+
+# /metrics (see metrics/registry.py). Every process writes its numbers
+# to a file in METRICS_DIR; scrapers authenticate with
+# "Authorization: Bearer <METRICS_TOKEN>" (staff can always look).
+METRICS_DIR = os.environ.get(
+    "METRICS_DIR", os.path.join(tempfile.gettempdir(), "only_pans_metrics"))
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+# Pre-rendered pages for anonymous visitors (see recipes/prerender.py).
+# Off by default; the job worker and web processes must share the folder.
+PRERENDER_PAGES = os.environ.get("PRERENDER_PAGES") == "True"
+PRERENDER_ROOT = os.environ.get("PRERENDER_ROOT",
+                                str(BASE_DIR / "prerendered"))
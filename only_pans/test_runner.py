@@ -0,0 +1,17 @@
+"""
+Test runner for ``manage.py test``.
+
+Image URLs are built locally from the cloud name - no request is made -
+but building one still needs a cloud name. Without CLOUDINARY_URL a
+made-up one is used, so the suite runs without Cloudinary credentials.
+"""
+import cloudinary
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if not cloudinary.config().cloud_name:
+            cloudinary.config(cloud_name='only-pans-test')
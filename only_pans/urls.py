@@ -21,4 +21,7 @@ from django.urls import path, include
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('recipes.urls')),
+    path('', include('search.urls')),
+    path('', include('social.urls')),
+    path('', include('metrics.urls')),
 ]
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'only_pans.settings')
 
 application = get_wsgi_application()
+
+# Load the URLconf (and with it every view module) now rather than on the
+# first request. With gunicorn's preload_app (see gunicorn.conf.py) this
+# happens once in the master and every worker forks with it loaded.
+from django.urls import get_resolver  # noqa: E402
+
+get_resolver().url_patterns
@@ -0,0 +1,110 @@
+from collections import Counter
+
+from django.contrib import admin
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import Profile
+from .sampler import flame_tree, format_stacks, top_functions
+
+
+def collapsed_response(stacks, filename):
+    """Collapsed stacks as a download for flamegraph.pl / speedscope."""
+    response = HttpResponse(format_stacks(stacks),
+                            content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@admin.register(Profile)
+class ProfileAdmin(admin.ModelAdmin):
+    """
+    Admin interface for request profiles - browse them, see the hottest
+    functions and a flame graph, or download the collapsed stacks.
+    Profiles are written by the profiling middleware, never by hand.
+    """
+    list_display = [
+                    'created_at',
+                    'method',
+                    'path',
+                    'view_name',
+                    'status_code',
+                    'duration_ms',
+                    'samples',
+                    'trigger'
+                    ]
+    list_filter = [
+                   'trigger',
+                   'view_name',
+                   'created_at'
+                   ]
+    search_fields = ['path', 'view_name']
+    ordering = ['-created_at']
+    actions = ['download_merged']
+
+    # Shows the hottest functions and the flame graph
+    change_form_template = 'admin/profiling/profile/change_form.html'
+    fields = [
+              'created_at',
+              'method',
+              'path',
+              'view_name',
+              'status_code',
+              'duration_ms',
+              'samples',
+              'trigger',
+              'user',
+              'download'
+              ]
+
+    def get_readonly_fields(self, request, obj=None):
+        return self.fields
+
+    def has_add_permission(self, request):
+        return False
+
+    def download(self, obj):
+        return format_html(
+            '<a href="{}">Collapsed stacks</a> (for flamegraph.pl or '
+            'speedscope.app)',
+            reverse('admin:profiling_profile_collapsed', args=[obj.pk]))
+    download.short_description = "Download"
+
+    def get_urls(self):
+        """Add the collapsed stacks download under each profile."""
+        return [
+            path('<int:pk>/collapsed/',
+                 self.admin_site.admin_view(self.collapsed_view),
+                 name='profiling_profile_collapsed'),
+        ] + super().get_urls()
+
+    def collapsed_view(self, request, pk):
+        profile = get_object_or_404(Profile, pk=pk)
+        return collapsed_response(profile.get_stacks(),
+                                  f'profile-{profile.pk}.txt')
+
+    def change_view(self, request, object_id, form_url='',
+                    extra_context=None):
+        profile = self.get_object(request, object_id)
+        if profile is not None:
+            stacks = profile.get_stacks()
+            extra_context = {
+                **(extra_context or {}),
+                'top_functions': top_functions(stacks),
+                'flame': flame_tree(stacks),
+            }
+        return super().change_view(request, object_id, form_url,
+                                   extra_context)
+
+    @admin.action(description="Download merged stacks of selected profiles")
+    def download_merged(self, request, queryset):
+        """
+        Add up the selected profiles' stacks - e.g. every slow profile
+        of one view - to see where that view usually spends its time.
+        """
+        merged = Counter()
+        for profile in queryset:
+            merged.update(profile.get_stacks())
+        return collapsed_response(merged, 'profiles-merged.txt')
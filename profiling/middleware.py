@@ -0,0 +1,73 @@
+"""
+Profile a share of requests, or any request a staff member asks for.
+
+- settings.PROFILE_SAMPLE_RATE (0 to 1, default 0 = off) of requests
+  are profiled at random. They are only stored if they took at least
+  settings.PROFILE_SLOW_MS, so the fast majority doesn't crowd out the
+  slow pages worth looking at.
+- Staff can profile any request by adding ``?profile=1`` to the URL or
+  sending an ``X-Profile: 1`` header. Those are always stored, and the
+  response's ``X-Profile-Id`` header says which profile to look at in
+  the admin (Profiling > Profiles).
+
+Must come after AuthenticationMiddleware (it checks request.user).
+"""
+import random
+import sys
+
+from django.conf import settings
+
+from .models import Profile
+from .sampler import DEFAULT_INTERVAL, Sampler, format_stacks
+from .tasks import prune_profiles
+
+
+def _requested(request):
+    asked = (request.GET.get('profile') == '1'
+             or request.headers.get('X-Profile') == '1')
+    return asked and request.user.is_staff
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILE_SAMPLE_RATE', 0)
+        self.slow_ms = getattr(settings, 'PROFILE_SLOW_MS', 0)
+        self.interval = getattr(settings, 'PROFILE_INTERVAL',
+                                DEFAULT_INTERVAL)
+
+    def __call__(self, request):
+        if _requested(request):
+            trigger = Profile.REQUESTED
+        elif self.sample_rate and random.random() < self.sample_rate:
+            trigger = Profile.SAMPLED
+        else:
+            return self.get_response(request)
+
+        # Stacks are recorded from here inwards
+        sampler = Sampler(self.interval, root=sys._getframe()).start()
+        try:
+            response = self.get_response(request)
+        finally:
+            stacks = sampler.stop()
+        duration_ms = sampler.duration * 1000
+
+        if stacks and (trigger == Profile.REQUESTED
+                       or duration_ms >= self.slow_ms):
+            match = request.resolver_match
+            profile = Profile.objects.create(
+                method=request.method,
+                path=request.get_full_path()[:500],
+                view_name=match.view_name if match else '',
+                status_code=response.status_code,
+                duration_ms=round(duration_ms, 1),
+                samples=sum(stacks.values()),
+                trigger=trigger,
+                user=request.user if request.user.is_authenticated else None,
+                stacks=format_stacks(stacks),
+            )
+            prune_profiles.enqueue()
+            if trigger == Profile.REQUESTED:
+                response['X-Profile-Id'] = str(profile.pk)
+        return response
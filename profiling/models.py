@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import models
+
+from .sampler import parse_stacks
+
+
+class Profile(models.Model):
+    """
+    Where one request spent its time, from the sampling profiler (see
+    profiling.middleware). ``stacks`` holds the collapsed stacks, ready
+    for flamegraph.pl or speedscope.
+    """
+    SAMPLED = 'sampled'
+    REQUESTED = 'requested'
+    TRIGGER_CHOICES = [
+        (SAMPLED, 'Sampled'),
+        (REQUESTED, 'Requested by staff'),
+    ]
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    view_name = models.CharField(max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    samples = models.PositiveIntegerField()
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.SET_NULL,
+                             null=True, blank=True)
+    stacks = models.TextField(help_text='collapsed stacks, one per line')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # "Slowest profiles of this view"
+            models.Index(fields=['view_name', '-duration_ms']),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+    def get_stacks(self):
+        return parse_stacks(self.stacks)
@@ -0,0 +1,148 @@
+"""
+A small sampling profiler for one request.
+
+While a request runs, a helper thread wakes up every ``interval``
+seconds, looks at the request thread's current call stack
+(sys._current_frames) and counts it. Functions that appear in many
+samples are where the time went. The request itself is not slowed down
+the way cProfile slows down every function call, so it is safe to leave
+on for a small share of production traffic.
+
+Stacks are kept "collapsed": one line per distinct stack, outermost
+frame first, frames separated by ";" and followed by how many samples
+saw it:
+
+    recipes.views.home_view;recipes.views._card_page;... 12
+
+That is the input format of flamegraph.pl and speedscope, and it is
+small - a slow page is usually a few dozen distinct stacks.
+"""
+import sys
+import threading
+import time
+from collections import Counter
+
+
+DEFAULT_INTERVAL = 0.005
+
+
+def frame_name(frame):
+    """"module.function" (with the class, if any) for a stack frame."""
+    module = frame.f_globals.get('__name__', '?')
+    return f"{module}.{frame.f_code.co_qualname}"
+
+
+def collapse(frame, root=None):
+    """
+    The stack ending at ``frame`` as "outer;...;inner". Frames from
+    ``root`` outwards (the server and middleware that called the code
+    being profiled) are left out.
+    """
+    names = []
+    while frame is not None and frame is not root:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler:
+    """
+    Samples the calling thread's stack until stop() is called.
+
+        sampler = Sampler(root=sys._getframe())
+        sampler.start()
+        ...
+        stacks = sampler.stop()   # Counter({'a;b;c': 12, ...})
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, root=None):
+        self.interval = interval
+        self.root = root
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name='profiling-sampler')
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop sampling; returns the collapsed stack counts."""
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                stack = collapse(frame, self.root)
+                if stack:
+                    self.stacks[stack] += 1
+
+
+def format_stacks(stacks):
+    """Counter of stacks -> collapsed text, most sampled first."""
+    return '\n'.join(f"{stack} {samples}"
+                     for stack, samples in stacks.most_common())
+
+
+def parse_stacks(text):
+    """Collapsed text -> Counter of stacks (merging repeated lines)."""
+    stacks = Counter()
+    for line in text.splitlines():
+        stack, _, samples = line.rpartition(' ')
+        if stack and samples.isdecimal():
+            stacks[stack] += int(samples)
+    return stacks
+
+
+def top_functions(stacks, limit=20):
+    """
+    The functions the samples landed in most, as
+    [(name, self samples, total samples)] sorted by total. "Self" counts
+    samples where the function itself was running, "total" also counts
+    the time spent in functions it called.
+    """
+    own, total = Counter(), Counter()
+    for stack, samples in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += samples
+        for name in set(frames):
+            total[name] += samples
+    return [(name, own[name], samples)
+            for name, samples in total.most_common(limit)]
+
+
+def flame_tree(stacks, min_share=0.005):
+    """
+    Nest the stacks into a tree for drawing a flame graph:
+    {'name', 'samples', 'children': [...]} with the widest children
+    first. Branches under ``min_share`` of all samples are left out so
+    the page stays readable.
+    """
+    root = {'name': 'all', 'samples': 0, 'children': {}}
+    for stack, samples in stacks.items():
+        node = root
+        node['samples'] += samples
+        for name in stack.split(';'):
+            node = node['children'].setdefault(
+                name, {'name': name, 'samples': 0, 'children': {}})
+            node['samples'] += samples
+
+    cutoff = root['samples'] * min_share
+
+    def finish(node):
+        children = [child for child in node['children'].values()
+                    if child['samples'] >= cutoff]
+        children.sort(key=lambda child: -child['samples'])
+        for child in children:
+            child['share'] = child['samples'] / node['samples'] * 100
+            finish(child)
+        node['children'] = children
+        return node
+    return finish(root)
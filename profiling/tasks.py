@@ -0,0 +1,27 @@
+"""Background tasks for the profiling app."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.queue import task
+from .models import Profile
+
+
+@task(delay=60)
+def prune_profiles():
+    """
+    Keep stored profiles within settings.PROFILE_KEEP_DAYS and
+    settings.PROFILE_MAX_STORED (newest kept). Queued after every stored
+    profile; the delay lets a minute's worth collapse into one run.
+    """
+    keep_days = getattr(settings, 'PROFILE_KEEP_DAYS', 7)
+    max_stored = getattr(settings, 'PROFILE_MAX_STORED', 500)
+    Profile.objects.filter(
+        created_at__lt=timezone.now() - timedelta(days=keep_days)).delete()
+    # Ids grow with time, so everything from the first one past the
+    # limit downwards is the oldest
+    cutoff = Profile.objects.order_by('-id').values_list(
+        'id', flat=True)[max_stored:max_stored + 1]
+    if cutoff:
+        Profile.objects.filter(id__lte=cutoff[0]).delete()
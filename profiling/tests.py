@@ -0,0 +1,80 @@
+import time
+from collections import Counter
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from .middleware import ProfilingMiddleware
+from .models import Profile
+from .sampler import (Sampler, flame_tree, format_stacks, parse_stacks,
+                      top_functions)
+from .tasks import prune_profiles
+
+
+def busy(seconds=0.05):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return HttpResponse('done')
+
+
+class SamplerTests(TestCase):
+
+    def test_samples_land_in_the_running_function(self):
+        sampler = Sampler(interval=0.001).start()
+        busy()
+        stacks = sampler.stop()
+        self.assertIn(f'{__name__}.busy',
+                      [name for name, _, _ in top_functions(stacks)])
+
+    def test_collapsed_stacks_round_trip(self):
+        stacks = Counter({'view;query': 3, 'view;render': 1, 'view': 2})
+        self.assertEqual(parse_stacks(format_stacks(stacks)), stacks)
+        self.assertEqual(top_functions(stacks)[0], ('view', 2, 6))
+        tree = flame_tree(stacks)
+        self.assertEqual(tree['samples'], 6)
+        self.assertEqual([child['name']
+                          for child in tree['children'][0]['children']],
+                         ['query', 'render'])
+
+
+@override_settings(PROFILE_SAMPLE_RATE=0, PROFILE_INTERVAL=0.001)
+class MiddlewareTests(TestCase):
+
+    def request(self, user, **params):
+        request = RequestFactory().get('/', params)
+        request.user = user
+        return ProfilingMiddleware(lambda request: busy())(request)
+
+    def test_staff_can_ask_for_a_profile(self):
+        staff = User.objects.create_user('admin', is_staff=True)
+        response = self.request(staff, profile='1')
+        profile = Profile.objects.get()
+        self.assertEqual(response['X-Profile-Id'], str(profile.pk))
+        self.assertEqual(profile.trigger, Profile.REQUESTED)
+        self.assertIn(f'{__name__}.busy', profile.stacks)
+
+    def test_others_are_not_profiled(self):
+        response = self.request(AnonymousUser(), profile='1')
+        self.assertFalse(response.has_header('X-Profile-Id'))
+        self.assertFalse(Profile.objects.exists())
+
+    @override_settings(PROFILE_SAMPLE_RATE=1, PROFILE_SLOW_MS=10000)
+    def test_fast_sampled_requests_are_not_kept(self):
+        self.request(AnonymousUser())
+        self.assertFalse(Profile.objects.exists())
+
+
+class PruneTests(TestCase):
+
+    @override_settings(PROFILE_MAX_STORED=2)
+    def test_only_the_newest_profiles_are_kept(self):
+        profiles = [Profile.objects.create(
+            method='GET', path='/', status_code=200, duration_ms=1,
+            samples=1, trigger=Profile.SAMPLED, stacks='view 1')
+            for _ in range(3)]
+        prune_profiles()
+        self.assertEqual(
+            sorted(Profile.objects.values_list('id', flat=True)),
+            [profile.pk for profile in profiles[1:]])
@@ -1,8 +1,16 @@
 # recipes/admin.py
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.cache import cache
 from django.db import models
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html
+from search.admin import FuzzySearchMixin
+from .authoring import INGREDIENT_FIELDS, STEP_FIELDS, save_recipe_contents
+from .deletion import restore_recipes, soft_delete_recipes
 from .models import Recipe, Ingredient, RecipeIngredient, RecipeStep, StepImage
+from .tasks import DUPLICATE_REPORT_KEY, report_duplicates
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -18,7 +26,13 @@ class RecipeIngredientInline(admin.TabularInline):
               'quantity_numeric',
               'unit',
               'notes',
-              'display_order']
+              'display_order',
+              'quantity_grams',
+              'quantity_ml']
+    # Worked out automatically from the quantity on save
+    readonly_fields = ['quantity_grams', 'quantity_ml']
+    # Type-to-search box instead of a select listing every ingredient
+    autocomplete_fields = ['ingredient']
     ordering = ['display_order']
 
 
@@ -36,8 +50,29 @@ class RecipeStepInline(admin.TabularInline):
     ordering = ['step_number']
 
 
+def submitted_rows(formset, fields):
+    """
+    An inline formset's rows as the dicts recipes.authoring expects:
+    ``fields`` plus 'id', skipping rows marked for deletion and blank
+    extra forms.
+    """
+    rows = []
+    for form in formset.forms:
+        data = form.cleaned_data
+        if not data or data.get('DELETE'):
+            continue
+        if form.instance.pk is None and not form.has_changed():
+            continue
+        row = {'id': form.instance.pk}
+        for name in fields:
+            value = data.get(name.removesuffix('_id'))
+            row[name] = value.pk if name.endswith('_id') and value else value
+        rows.append(row)
+    return rows
+
+
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(FuzzySearchMixin, admin.ModelAdmin):
     """
     Admin interface for Recipe model.
     """
@@ -49,7 +84,7 @@ class RecipeAdmin(admin.ModelAdmin):
                     'title',
                     'user',
                     'difficulty_level',
-                    'total_time',
+                    'total_minutes',
                     'is_public',
                     'created_at'
                     ]
@@ -58,24 +93,29 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = [
                    'difficulty_level',
                    'is_public',
+                   'is_deleted',
                    'created_at',
                    'updated_at'
                    ]
 
-    # Add search functionality
+    # Add search functionality (typo-tolerant on the title)
     search_fields = [
                      'title',
                      'description',
                      'user__username'
                      ]
+    fuzzy_search_field = 'title'
 
     # Fields that can't be edited
     readonly_fields = [
                        'created_at',
                        'updated_at',
+                       'deleted_at',
                        'main_image_preview'
                        ]
 
+    actions = ['restore_selected']
+
     # Force text input for image URL field
     formfield_overrides = {
         models.TextField: {'widget': admin.widgets.AdminTextInputWidget},
@@ -85,7 +125,8 @@ class RecipeAdmin(admin.ModelAdmin):
         """Show preview of main recipe image"""
         if obj.main_image_url:
             return format_html(
-                '<img src="{}" style="max-height: 150px; max-width: 200px;" />',
+                '<img src="{}" '
+                'style="max-height: 150px; max-width: 200px;" />',
                 obj.main_image_url
             )
         return "No image uploaded"
@@ -114,7 +155,8 @@ class RecipeAdmin(admin.ModelAdmin):
         ('Timestamps', {
             'fields': [
                         'created_at',
-                        'updated_at'
+                        'updated_at',
+                        'deleted_at'
                         ],
             'classes': ['collapse']
         })
@@ -123,9 +165,101 @@ class RecipeAdmin(admin.ModelAdmin):
     # Default ordering
     ordering = ['-created_at']
 
+    def get_queryset(self, request):
+        """Show soft-deleted recipes too, so they can be restored."""
+        return Recipe.all_objects.select_related('user')
+
+    def save_related(self, request, form, formsets, change):
+        """
+        Save the ingredient and step inlines in bulk - only the rows that
+        changed, a few queries in all, one refresh of the recipe (see
+        recipes.authoring) - instead of a save() and signals per row.
+        """
+        form.save_m2m()
+        contents = {RecipeIngredient: None, RecipeStep: None}
+        for formset in formsets:
+            if formset.model in contents:
+                contents[formset.model] = formset
+            else:
+                self.save_formset(request, form, formset, change=change)
+        ingredients, steps = contents.values()
+        results = save_recipe_contents(
+            form.instance,
+            ingredients=(submitted_rows(ingredients, INGREDIENT_FIELDS)
+                         if ingredients is not None else None),
+            steps=(submitted_rows(steps, STEP_FIELDS)
+                   if steps is not None else None),
+        )
+        # What the admin's change history reads
+        for formset, changes in zip((ingredients, steps), results):
+            if formset is not None:
+                formset.new_objects = changes.created
+                formset.changed_objects = changes.updated
+                formset.deleted_objects = changes.deleted
+
+    # Deleting is a soft delete: the recipe is hidden at once and purged
+    # by a background job later (see recipes.deletion). The confirmation
+    # page doesn't list every related row, which could take minutes.
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        soft_delete_recipes([obj.pk])
+
+    def delete_queryset(self, request, queryset):
+        soft_delete_recipes(queryset.values_list('id', flat=True))
+
+    @admin.action(description="Restore selected deleted recipes")
+    def restore_selected(self, request, queryset):
+        restored = restore_recipes(queryset.values_list('id', flat=True))
+        self.message_user(request, f"Restored {restored} recipes.")
+
+    # Adds a "Duplicates" button above the recipe list
+    change_list_template = 'admin/recipes/recipe/change_list.html'
+
+    def get_urls(self):
+        """Add the duplicates report page under the recipe admin."""
+        return [
+            path('duplicates/',
+                 self.admin_site.admin_view(self.duplicates_view),
+                 name='recipes_recipe_duplicates'),
+        ] + super().get_urls()
+
+    def duplicates_view(self, request):
+        """
+        Clusters of near-duplicate recipes (see recipes.dedupe).
+        The report is built by a background job, not while you wait.
+        """
+        if request.method == 'POST':
+            report_duplicates.enqueue()
+            messages.info(request, "The duplicates report is being rebuilt "
+                                   "- refresh this page in a minute.")
+            return redirect('admin:recipes_recipe_duplicates')
+
+        clusters = cache.get(DUPLICATE_REPORT_KEY)
+        if clusters:
+            titles = dict(Recipe.objects.filter(id__in={
+                recipe_id for cluster in clusters
+                for recipe_id in cluster['recipe_ids']
+            }).values_list('id', 'title'))
+            clusters = [{
+                'similarity': cluster['similarity'],
+                'recipes': [(recipe_id, titles.get(recipe_id, '(deleted)'))
+                            for recipe_id in cluster['recipe_ids']],
+            } for cluster in clusters]
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Duplicate recipes',
+            'clusters': clusters,
+        }
+        return TemplateResponse(request,
+                                'admin/recipes/recipe/duplicates.html',
+                                context)
+
 
 @admin.register(Ingredient)
-class IngredientAdmin(admin.ModelAdmin):
+class IngredientAdmin(FuzzySearchMixin, admin.ModelAdmin):
     """
     Admin interface for Ingredient model.
     """
@@ -136,7 +270,10 @@ class IngredientAdmin(admin.ModelAdmin):
                     'calories_per_100g'
                     ]
     list_filter = ['category']
+    # Typo-tolerant on the name - also used by the ingredient autocomplete
     search_fields = ['name', 'category']
+    fuzzy_search_field = 'name'
+    ordering = ['name']
 
     fieldsets = [
         ('Basic Information', {
@@ -249,7 +386,8 @@ class StepImageAdmin(admin.ModelAdmin):
         """Show image preview in admin"""
         if obj.image_url:
             return format_html(
-                '<img src="{}" style="max-height: 100px; max-width: 150px;" />',
+                '<img src="{}" '
+                'style="max-height: 100px; max-width: 150px;" />',
                 obj.image_url
             )
         return "No image"
@@ -0,0 +1,753 @@
+"""
+JSON read API for recipes, ingredients, tags and comments.
+
+Clients choose what they get back:
+- ?fields=title,total_time,rating  only returns those fields
+- ?include=ingredients,steps       adds the related lists to each recipe
+
+Recipe responses support conditional GET (see ``recipes.conditional``),
+so clients re-sending ETag / Last-Modified get a cheap 304 back.
+
+Every response is built from a fixed number of ``.values()`` queries that
+are grouped into plain dicts up front, so a page of 100 recipes costs the
+same number of queries as a page of 1 (no per-object ORM access). When
+every field asked for is on the recipe card (see ``recipes.cards``) and
+nothing is included, a list is a single query on RecipeCard.
+"""
+import json
+
+import hashlib
+import math
+from collections import defaultdict
+
+from django.db.models import Avg, Count, Q
+from django.http import JsonResponse
+from django.views.decorators.http import condition, require_GET
+
+from social.models import Comment, Rating, UserLikes
+from tags.models import RecipeTag, Tag
+from .conditional import (
+    catalogue_api_etag, recipe_api_etag, recipe_last_modified,
+)
+from accounts.models import UserProfile
+from .cards import primary_tags_for, public_cards
+from .feed import get_feed
+from . import masterdata
+from .models import Ingredient, Recipe, RecipeIngredient, RecipeStep, StepImage
+from .shopping import build_shopping_list
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 100
+MAX_PLAN_SIZE = 100
+MEAL_PLAN_TARGETS = ['calories', 'protein_g', 'carbs_g', 'fat_g', 'sodium_mg']
+
+
+class ApiError(Exception):
+    """Raised for bad query parameters - turned into a 400 response."""
+
+
+# Public field name -> database columns it needs (via .values()).
+# Fields that map to an empty tuple are computed from other data.
+RECIPE_FIELDS = {
+    'id': ('id',),
+    'title': ('title',),
+    'description': ('description',),
+    'prep_time': ('prep_time',),
+    'cook_time': ('cook_time',),
+    'total_time': ('prep_time', 'cook_time'),
+    'base_servings': ('base_servings',),
+    'difficulty_level': ('difficulty_level',),
+    'main_image_url': ('main_image_url',),
+    'author': ('user__username',),
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+    'rating': (),
+    'like_count': (),
+    'comment_count': (),
+    'primary_tags': (),
+}
+# Fields a RecipeCard holds too -> its column
+CARD_COLUMNS = {
+    'id': 'recipe_id',
+    'title': 'title',
+    'description': 'description',
+    'total_time': 'total_time',
+    'difficulty_level': 'difficulty_level',
+    'main_image_url': 'image_url',
+    'author': 'author',
+    'created_at': 'created_at',
+    'rating': 'average_rating',
+    'like_count': 'like_count',
+    'comment_count': 'comment_count',
+    'primary_tags': 'primary_tags',
+}
+DEFAULT_RECIPE_FIELDS = [
+    'id', 'title', 'description', 'total_time', 'difficulty_level',
+    'main_image_url', 'author', 'rating',
+]
+RECIPE_INCLUDES = ['ingredients', 'steps', 'tags', 'comments']
+
+INGREDIENT_FIELDS = [
+    'id', 'name', 'category', 'common_unit', 'dietary_flags',
+    'calories_per_100g', 'protein_per_100g', 'carbs_per_100g',
+    'fat_per_100g', 'fibre_per_100g', 'sugars_per_100g',
+    'sodium_mg_per_100g', 'saturated_fat_per_100g', 'nutritional_basis',
+]
+DEFAULT_INGREDIENT_FIELDS = ['id', 'name', 'category', 'common_unit']
+
+TAG_FIELDS = ['id', 'name', 'tag_type', 'color', 'icon_url']
+
+COMMENT_FIELDS = [
+    'id', 'recipe_id', 'author', 'comment_text', 'parent_id',
+    'created_at', 'updated_at',
+]
+
+
+# ---------------------------------------------------------------------------
+# Query parameter helpers
+# ---------------------------------------------------------------------------
+
+def _split_param(request, name):
+    """Turn ?name=a,b,c into ['a', 'b', 'c'] (empty list if missing)."""
+    raw = request.GET.get(name, '')
+    return [part.strip() for part in raw.split(',') if part.strip()]
+
+
+def parse_fields(request, available, default):
+    """Validate ?fields= against the fields a resource offers."""
+    fields = _split_param(request, 'fields') or list(default)
+    unknown = [f for f in fields if f not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def parse_include(request, available):
+    """Validate ?include= against the relations a resource can expand."""
+    include = _split_param(request, 'include')
+    unknown = [i for i in include if i not in available]
+    if unknown:
+        raise ApiError(f"Unknown include(s): {', '.join(unknown)}")
+    return include
+
+
+def parse_ids(raw, limit):
+    """Parse a comma separated list of ids, keeping the order given."""
+    ids = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not part.isdecimal():
+            raise ApiError(f"Invalid id: {part}")
+        if int(part) not in ids:
+            ids.append(int(part))
+    if len(ids) > limit:
+        raise ApiError(f"At most {limit} ids per request")
+    return ids
+
+
+def parse_plan(raw, limit):
+    """Parse ?plan=12:4,15:2 into [(12, 4.0), (15, 2.0)] - recipe:servings."""
+    plan = []
+    for part in raw.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        recipe_id, _, servings = part.partition(':')
+        try:
+            plan.append((int(recipe_id), float(servings)))
+        except ValueError:
+            raise ApiError(f"Invalid plan entry: {part}")
+        if not 0 < plan[-1][1] < math.inf:
+            raise ApiError(f"Servings must be positive: {part}")
+    if len(plan) > limit:
+        raise ApiError(f"At most {limit} recipes per plan")
+    return plan
+
+
+def parse_max_time(request):
+    """?max_time=30 - only recipes ready in 30 minutes or less."""
+    raw = request.GET.get('max_time')
+    if not raw:
+        return None
+    if not raw.isdecimal():
+        raise ApiError("max_time must be a whole number of minutes")
+    return int(raw)
+
+
+def parse_page(request):
+    """Keyset pagination: ?limit=20&before=<id of last item seen>."""
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+        before = request.GET.get('before')
+        before = int(before) if before else None
+    except ValueError:
+        raise ApiError("limit and before must be integers")
+    return max(1, min(limit, MAX_PAGE_SIZE)), before
+
+
+def _number(value):
+    """Decimals are not JSON friendly - send them as floats."""
+    return float(value) if value is not None else None
+
+
+def _image_url(resource):
+    """CloudinaryField values come back as resources - expose the URL."""
+    return resource.url if resource else None
+
+
+def api_error_response(error):
+    return JsonResponse({'error': str(error)}, status=400)
+
+
+# ---------------------------------------------------------------------------
+# Serializers - each takes ids (or rows) and returns plain dicts
+# ---------------------------------------------------------------------------
+
+def _group_by_recipe(rows):
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row.pop('recipe_id')].append(row)
+    return grouped
+
+
+def _ingredients_for(recipe_ids):
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('recipe_id', 'display_order').values(
+        'recipe_id', 'ingredient_id', 'quantity_numeric',
+        'quantity_display', 'unit', 'notes', 'display_order',
+    )
+    names = masterdata.ingredients().by_id
+    return _group_by_recipe({
+        'recipe_id': row['recipe_id'],
+        'ingredient_id': row['ingredient_id'],
+        'name': names[row['ingredient_id']].name
+        if row['ingredient_id'] in names else '',
+        'quantity': _number(row['quantity_numeric']),
+        'quantity_display': row['quantity_display'],
+        'unit': row['unit'],
+        'notes': row['notes'],
+        'display_order': row['display_order'],
+    } for row in rows)
+
+
+def _steps_for(recipe_ids):
+    steps = list(RecipeStep.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('recipe_id', 'step_number').values(
+        'id', 'recipe_id', 'step_number', 'instruction', 'estimated_time',
+    ))
+    images = defaultdict(list)
+    image_rows = StepImage.objects.filter(
+        step_id__in=[step['id'] for step in steps]
+    ).order_by('step_id', 'display_order').values(
+        'step_id', 'image_url', 'alt_text',
+    )
+    for row in image_rows:
+        images[row['step_id']].append({
+            'image_url': _image_url(row['image_url']),
+            'alt_text': row['alt_text'],
+        })
+    for step in steps:
+        step['images'] = images.get(step['id'], [])
+    return _group_by_recipe(steps)
+
+
+def _tags_for(recipe_ids):
+    rows = RecipeTag.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('recipe_id', 'tag_id')
+    by_id = masterdata.tags().by_id
+    tags = [{'recipe_id': recipe_id, **by_id[tag_id].as_dict()}
+            for recipe_id, tag_id in rows if tag_id in by_id]
+    tags.sort(key=lambda tag: (tag['recipe_id'], tag['name']))
+    return _group_by_recipe(tags)
+
+
+def _comment_rows(queryset):
+    return [{
+        'id': row['id'],
+        'recipe_id': row['recipe_id'],
+        'author': row['user__username'],
+        'comment_text': row['comment_text'],
+        'parent_id': row['parent_comment_id'],
+        'created_at': row['created_at'],
+        'updated_at': row['updated_at'],
+    } for row in queryset.values(
+        'id', 'recipe_id', 'user__username', 'comment_text',
+        'parent_comment_id', 'created_at', 'updated_at',
+    )]
+
+
+def _comments_for(recipe_ids):
+    return _group_by_recipe(_comment_rows(
+        Comment.objects.filter(
+            recipe_id__in=recipe_ids, user__is_active=True,
+        ).order_by('recipe_id', 'created_at')
+    ))
+
+
+INCLUDE_LOADERS = {
+    'ingredients': _ingredients_for,
+    'steps': _steps_for,
+    'tags': _tags_for,
+    'comments': _comments_for,
+}
+
+
+def _counts_by_recipe(model, recipe_ids):
+    return dict(
+        model.objects.filter(recipe_id__in=recipe_ids, user__is_active=True)
+        .values('recipe_id').annotate(n=Count('id'))
+        .values_list('recipe_id', 'n')
+    )
+
+
+def serialize_recipes(queryset, fields, include=()):
+    """
+    Serialize recipes into dicts containing only ``fields``.
+
+    The base rows come from one ``.values()`` query; aggregates and each
+    included relation cost one extra grouped query for the whole batch.
+    Returns a list in the queryset's order.
+    """
+    columns = {'id'}
+    for field in fields:
+        columns.update(RECIPE_FIELDS[field])
+    rows = list(queryset.values(*columns))
+    recipe_ids = [row['id'] for row in rows]
+    if not recipe_ids:
+        return []
+
+    ratings = {}
+    if 'rating' in fields:
+        ratings = dict(
+            Rating.objects.filter(recipe_id__in=recipe_ids,
+                                  user__is_active=True)
+            .values('recipe_id').annotate(avg=Avg('rating_value'))
+            .values_list('recipe_id', 'avg')
+        )
+    likes = (_counts_by_recipe(UserLikes, recipe_ids)
+             if 'like_count' in fields else {})
+    comments = (_counts_by_recipe(Comment, recipe_ids)
+                if 'comment_count' in fields else {})
+    tags = primary_tags_for(recipe_ids) if 'primary_tags' in fields else {}
+    related = {name: INCLUDE_LOADERS[name](recipe_ids) for name in include}
+
+    results = []
+    for row in rows:
+        item = {}
+        for field in fields:
+            if field == 'total_time':
+                item[field] = row['prep_time'] + row['cook_time']
+            elif field == 'author':
+                item[field] = row['user__username']
+            elif field == 'main_image_url':
+                item[field] = _image_url(row['main_image_url'])
+            elif field == 'rating':
+                average = ratings.get(row['id'])
+                item[field] = round(average, 2) if average else 0
+            elif field == 'like_count':
+                item[field] = likes.get(row['id'], 0)
+            elif field == 'comment_count':
+                item[field] = comments.get(row['id'], 0)
+            elif field == 'primary_tags':
+                item[field] = tags.get(row['id'], [])
+            else:
+                item[field] = row[field]
+        for name in include:
+            item[name] = related[name].get(row['id'], [])
+        results.append(item)
+    return results
+
+
+def uses_cards(fields, include=()):
+    """Can RecipeCard answer this on its own?"""
+    return not include and all(field in CARD_COLUMNS for field in fields)
+
+
+def _card_item(row, fields):
+    item = {}
+    for field in fields:
+        value = row[CARD_COLUMNS[field]]
+        if field == 'primary_tags':
+            value = json.loads(value) if value else []
+        elif field == 'main_image_url':
+            value = value or None
+        elif field == 'rating':
+            value = value or 0
+        item[field] = value
+    return item
+
+
+def serialize_cards(queryset, fields):
+    """Serialize a RecipeCard queryset in one ``.values()`` query."""
+    columns = {CARD_COLUMNS[field] for field in fields}
+    return [_card_item(row, fields) for row in queryset.values(*columns)]
+
+
+def serialize_by_id(recipe_ids, fields, include=()):
+    """
+    {id: dict} for the public recipes among ``recipe_ids``, read from
+    their cards when that is enough. Recipes whose card hasn't been built
+    yet fall back to serialize_recipes(). ``fields`` must include 'id'.
+    """
+    found = {}
+    if uses_cards(fields, include):
+        found = {item['id']: item for item in serialize_cards(
+            public_cards().filter(recipe_id__in=recipe_ids), fields)}
+    rest = [recipe_id for recipe_id in recipe_ids if recipe_id not in found]
+    if rest:
+        found.update((item['id'], item) for item in serialize_recipes(
+            Recipe.objects.public().filter(id__in=rest), fields, include))
+    return found
+
+
+def serialize_ingredients(queryset, fields):
+    """Serialize ingredients with a single ``.values()`` query."""
+    columns = set(fields) | {'id'}
+    results = []
+    for row in queryset.values(*columns):
+        item = {}
+        for field in fields:
+            value = row[field]
+            if field == 'dietary_flags':
+                value = Ingredient(dietary_flags=value).get_dietary_flags()
+            elif field.endswith('_per_100g'):
+                value = _number(value)
+            item[field] = value
+        results.append(item)
+    return results
+
+
+# ---------------------------------------------------------------------------
+# Views
+# ---------------------------------------------------------------------------
+
+def _recipe_params(request):
+    return (parse_fields(request, RECIPE_FIELDS, DEFAULT_RECIPE_FIELDS),
+            parse_include(request, RECIPE_INCLUDES))
+
+
+def _recipe_page(request, cards, recipes):
+    """
+    One page of recipes, newest first - from ``cards`` (a RecipeCard
+    queryset, one query) when they hold every field asked for, otherwise
+    from ``recipes``. Both must select the same recipes.
+    ?max_time= narrows either to quick recipes.
+    """
+    try:
+        fields, include = _recipe_params(request)
+        limit, before = parse_page(request)
+        max_time = parse_max_time(request)
+    except ApiError as error:
+        return api_error_response(error)
+    if max_time is not None:
+        cards = cards.filter(total_time__lte=max_time)
+        recipes = recipes.quicker_than(max_time)
+
+    if uses_cards(fields, include):
+        cards = cards.order_by('-recipe_id')
+        if before:
+            cards = cards.filter(recipe_id__lt=before)
+        columns = {CARD_COLUMNS[field] for field in fields} | {'recipe_id'}
+        rows = list(cards.values(*columns)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return JsonResponse({
+            'results': [_card_item(row, fields) for row in rows],
+            'next_before': rows[-1]['recipe_id'] if has_more else None,
+        })
+
+    queryset = recipes.order_by('-id')
+    if before:
+        queryset = queryset.filter(id__lt=before)
+    page_ids = list(queryset.values_list('id', flat=True)[:limit + 1])
+    has_more = len(page_ids) > limit
+    page_ids = page_ids[:limit]
+
+    results = serialize_recipes(
+        Recipe.objects.filter(id__in=page_ids).order_by('-id'),
+        fields, include,
+    )
+    return JsonResponse({
+        'results': results,
+        'next_before': page_ids[-1] if has_more else None,
+    })
+
+
+@require_GET
+@condition(etag_func=catalogue_api_etag)
+def recipe_list_api(request):
+    """
+    GET /api/recipes/ - newest public recipes first.
+    Paginate with ?before=<next_before from the previous page>.
+    """
+    return _recipe_page(request, public_cards(), Recipe.objects.public())
+
+
+@require_GET
+@condition(etag_func=catalogue_api_etag)
+def tag_recipes_api(request, pk):
+    """GET /api/tags/<pk>/recipes/ - public recipes with a tag."""
+    return _recipe_page(
+        request,
+        public_cards().filter(recipe__recipetag__tag_id=pk),
+        Recipe.objects.public().filter(recipetag__tag_id=pk),
+    )
+
+
+@require_GET
+@condition(etag_func=catalogue_api_etag)
+def user_recipes_api(request, username):
+    """GET /api/users/<username>/recipes/ - a user's public recipes."""
+    return _recipe_page(
+        request,
+        public_cards().filter(user__username=username,
+                              user__is_active=True),
+        Recipe.objects.public().filter(user__username=username,
+                                       user__is_active=True),
+    )
+
+
+@require_GET
+@condition(etag_func=recipe_api_etag,
+           last_modified_func=recipe_last_modified)
+def recipe_detail_api(request, pk):
+    """GET /api/recipes/<pk>/ - a single public recipe."""
+    try:
+        fields, include = _recipe_params(request)
+    except ApiError as error:
+        return api_error_response(error)
+
+    results = serialize_recipes(
+        Recipe.objects.public().filter(pk=pk), fields, include
+    )
+    if not results:
+        return JsonResponse({'error': 'Recipe not found'}, status=404)
+    return JsonResponse(results[0])
+
+
+@require_GET
+@condition(etag_func=catalogue_api_etag)
+def recipe_batch_api(request):
+    """
+    GET /api/recipes/batch/?ids=3,1,2 - many recipes in one round trip.
+    Results come back in the order requested; unknown or private ids are
+    listed under "missing".
+    """
+    try:
+        fields, include = _recipe_params(request)
+        ids = parse_ids(request.GET.get('ids', ''), MAX_BATCH_SIZE)
+    except ApiError as error:
+        return api_error_response(error)
+
+    if 'id' not in fields:
+        fields = ['id'] + fields
+    found = serialize_by_id(ids, fields, include)
+    return JsonResponse({
+        'results': [found[i] for i in ids if i in found],
+        'missing': [i for i in ids if i not in found],
+    })
+
+
+@require_GET
+@condition(etag_func=recipe_api_etag,
+           last_modified_func=recipe_last_modified)
+def recipe_comments_api(request, pk):
+    """GET /api/recipes/<pk>/comments/ - comments oldest first."""
+    try:
+        fields = parse_fields(request, COMMENT_FIELDS, COMMENT_FIELDS)
+    except ApiError as error:
+        return api_error_response(error)
+
+    if not Recipe.objects.public().filter(pk=pk).exists():
+        return JsonResponse({'error': 'Recipe not found'}, status=404)
+    rows = _comment_rows(
+        Comment.objects.filter(recipe_id=pk, user__is_active=True)
+        .order_by('created_at')
+    )
+    return JsonResponse({
+        'results': [{f: row[f] for f in fields} for row in rows]
+    })
+
+
+@require_GET
+def ingredient_list_api(request):
+    """GET /api/ingredients/ - optionally filtered with ?category=."""
+    try:
+        fields = parse_fields(request, INGREDIENT_FIELDS,
+                              DEFAULT_INGREDIENT_FIELDS)
+    except ApiError as error:
+        return api_error_response(error)
+
+    queryset = Ingredient.objects.order_by('name')
+    category = request.GET.get('category')
+    if category:
+        queryset = queryset.filter(category=category)
+    return JsonResponse({'results': serialize_ingredients(queryset, fields)})
+
+
+@require_GET
+def ingredient_detail_api(request, pk):
+    """GET /api/ingredients/<pk>/"""
+    try:
+        fields = parse_fields(request, INGREDIENT_FIELDS, INGREDIENT_FIELDS)
+    except ApiError as error:
+        return api_error_response(error)
+
+    results = serialize_ingredients(
+        Ingredient.objects.filter(pk=pk), fields
+    )
+    if not results:
+        return JsonResponse({'error': 'Ingredient not found'}, status=404)
+    return JsonResponse(results[0])
+
+
+@require_GET
+def tag_list_api(request):
+    """GET /api/tags/ - optionally filtered with ?tag_type=."""
+    try:
+        fields = parse_fields(request, TAG_FIELDS, TAG_FIELDS)
+    except ApiError as error:
+        return api_error_response(error)
+
+    queryset = Tag.objects.order_by('tag_type', 'name')
+    tag_type = request.GET.get('tag_type')
+    if tag_type:
+        queryset = queryset.filter(tag_type=tag_type)
+    return JsonResponse({'results': list(queryset.values(*fields))})
+
+
+@require_GET
+def shopping_list_api(request):
+    """
+    GET /api/shopping-list/?plan=12:4,15:2 - one combined shopping list
+    for recipe 12 scaled to 4 servings plus recipe 15 scaled to 2.
+    Private recipes are only allowed for their owner.
+    """
+    try:
+        plan = parse_plan(request.GET.get('plan', ''), MAX_PLAN_SIZE)
+    except ApiError as error:
+        return api_error_response(error)
+
+    visible = Q(is_public=True)
+    if request.user.is_authenticated:
+        visible |= Q(user=request.user)
+    allowed = set(Recipe.objects.filter(
+        visible, id__in=[recipe_id for recipe_id, _ in plan]
+    ).values_list('id', flat=True))
+    return JsonResponse({
+        'categories': build_shopping_list(
+            (recipe_id, servings) for recipe_id, servings in plan
+            if recipe_id in allowed
+        ),
+        'missing': sorted({recipe_id for recipe_id, _ in plan
+                           if recipe_id not in allowed}),
+    })
+
+
+def _dietary_preferences(request):
+    """?diet=vegan,nut-free wins; otherwise the logged in user's profile."""
+    diet = _split_param(request, 'diet')
+    if diet or not request.user.is_authenticated:
+        return diet
+    profile = UserProfile.objects.filter(user=request.user).first()
+    return profile.get_dietary_preferences() if profile else []
+
+
+@require_GET
+def meal_plan_api(request):
+    """
+    GET /api/meal-plan/?calories=2000&protein_g=120&sodium_mg=2000
+    A week of recipes and servings that fits the daily targets. Also
+    takes ?days=, ?meals= (per day), ?diet= and ?seed= for variety.
+    """
+    try:
+        targets = {name: float(request.GET[name])
+                   for name in MEAL_PLAN_TARGETS if request.GET.get(name)}
+        days = int(request.GET.get('days', 7))
+        meals = int(request.GET.get('meals', 3))
+        seed = request.GET.get('seed')
+        seed = int(seed) if seed else None
+    except ValueError:
+        return api_error_response("Targets, days, meals and seed must be "
+                                  "numbers")
+    if not 1 <= days <= 14 or not 1 <= meals <= 6:
+        return api_error_response("days must be 1-14 and meals 1-6")
+    if not all(0 < value < math.inf for value in targets.values()):
+        return api_error_response("Targets must be positive numbers")
+
+    # Imported here: it needs numpy, which most workers never use
+    from .meal_plan import generate_meal_plan
+    plan = generate_meal_plan(targets, _dietary_preferences(request),
+                              days=days, meals_per_day=meals, seed=seed)
+    if plan is None:
+        return JsonResponse(
+            {'error': 'Not enough recipes match these preferences'},
+            status=404)
+
+    recipe_ids = {meal['recipe_id']
+                  for day in plan['days'] for meal in day['meals']}
+    titles = dict(Recipe.objects.filter(
+        id__in=recipe_ids).values_list('id', 'title'))
+    for day in plan['days']:
+        for meal in day['meals']:
+            meal['title'] = titles.get(meal['recipe_id'])
+    return JsonResponse(plan)
+
+
+def _feed_page(request):
+    """
+    The requested slice of the user's cached feed, memoised on the
+    request so the ETag check and the view share one cache read.
+    """
+    if not hasattr(request, '_feed_page'):
+        try:
+            page = max(1, int(request.GET.get('page', 1)))
+        except ValueError:
+            page = 1
+        entry = get_feed(request.user.pk)
+        start = (page - 1) * DEFAULT_PAGE_SIZE
+        request._feed_page = (
+            entry['version'], page,
+            entry['recipe_ids'][start:start + DEFAULT_PAGE_SIZE],
+            len(entry['recipe_ids']) > start + DEFAULT_PAGE_SIZE,
+        )
+    return request._feed_page
+
+
+def _feed_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    version = _feed_page(request)[0]
+    query = hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:8]
+    return f'"{version}-{query}"'
+
+
+@require_GET
+@condition(etag_func=_feed_etag)
+def feed_api(request):
+    """
+    GET /api/feed/?page=1 - the logged in user's personalised feed.
+    One cache read for the ranked ids, one batch fetch for the recipes.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Log in to see your feed'}, status=401)
+    try:
+        fields, include = _recipe_params(request)
+    except ApiError as error:
+        return api_error_response(error)
+
+    _, page, recipe_ids, has_more = _feed_page(request)
+    if 'id' not in fields:
+        fields = ['id'] + fields
+    found = serialize_by_id(recipe_ids, fields, include)
+    return JsonResponse({
+        'results': [found[i] for i in recipe_ids if i in found],
+        'next_page': page + 1 if has_more else None,
+    })
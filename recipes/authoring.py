@@ -0,0 +1,154 @@
+"""
+Saving a recipe's ingredient and step lists in bulk.
+
+An editor (the admin today, a recipe editor page later) submits the
+whole ingredient list and the whole step list. Saving each row with
+save() costs a query per row - and a touch of the recipe plus a refresh
+job per row from the signal handlers - even when only one line changed
+or the list was just reordered.
+
+save_recipe_contents() compares the submitted lists with what is stored
+and writes only the difference, in one transaction:
+
+- new rows            -> one bulk_create
+- rows that changed   -> one bulk_update of just the changed columns
+- rows left out       -> one DELETE ... WHERE id IN (...)
+
+No per-row signals are sent. Instead the recipe_changed signal is sent
+once (see recipes.signals), which touches the recipe and queues its
+refresh.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+
+from .deletion import raw_delete
+from .models import Ingredient, RecipeIngredient, RecipeStep, StepImage
+from .quantities import CANONICAL_FIELDS, canonicalize_rows
+from .signals import recipe_changed
+
+
+# What an editor submits for each row (plus 'id' for rows already saved)
+INGREDIENT_FIELDS = ['ingredient_id', 'quantity_display', 'quantity_numeric',
+                     'unit', 'notes', 'display_order']
+STEP_FIELDS = ['step_number', 'instruction', 'estimated_time']
+
+
+@dataclass
+class RowChanges:
+    """
+    What saving one list did. ``updated`` holds (row, names of the
+    fields that changed) pairs.
+    """
+    created: list = field(default_factory=list)
+    updated: list = field(default_factory=list)
+    deleted: list = field(default_factory=list)
+
+    def __bool__(self):
+        return bool(self.created or self.updated or self.deleted)
+
+
+def _field_names(model, attnames):
+    """'ingredient_id' -> 'ingredient', as forms and the admin name them."""
+    return [model._meta.get_field(attname).name for attname in attnames]
+
+
+def _diff(model, recipe, stored, submitted, fields, prepare=None):
+    """
+    Match ``submitted`` dicts to ``stored`` rows ({id: row}) by 'id'.
+    Returns (RowChanges, changed column names) with nothing written yet.
+    ``prepare`` is called with every submitted row and the stored values
+    ({id: {field: value}}) before comparing.
+    """
+    changes = RowChanges()
+    rows = []
+    before = {}
+    for values in submitted:
+        row_id = values.get('id')
+        if row_id is None:
+            row = model(recipe=recipe)
+            changes.created.append(row)
+        elif row_id in stored:
+            row = stored.pop(row_id)
+            before[row_id] = {name: getattr(row, name)
+                              for name in fields + CANONICAL_FIELDS
+                              if hasattr(row, name)}
+        else:
+            raise ValueError(f"{model.__name__} {row_id} is not part of "
+                             f"recipe {recipe.pk}")
+        for name in fields:
+            setattr(row, name, values.get(name))
+        rows.append(row)
+    if prepare:
+        prepare(rows, before)
+
+    columns = set()
+    for row in rows:
+        if row.pk is None:
+            continue
+        changed = [name for name, value in before[row.pk].items()
+                   if getattr(row, name) != value]
+        if changed:
+            changes.updated.append((row, _field_names(model, changed)))
+            columns.update(changed)
+    changes.deleted = list(stored.values())
+    return changes, sorted(columns)
+
+
+def _prepare_ingredients(rows, before):
+    """Fill in the canonical quantities, as RecipeIngredient.save() does."""
+    ingredients = Ingredient.objects.in_bulk(
+        {row.ingredient_id for row in rows})
+    for row in rows:
+        # Saves a query per row when the change is described (str(row))
+        if row.ingredient_id in ingredients:
+            row.ingredient = ingredients[row.ingredient_id]
+    canonicalize_rows(rows, {ingredient_id: ingredient.name
+                             for ingredient_id, ingredient
+                             in ingredients.items()}, before)
+
+
+def save_recipe_contents(recipe, ingredients=None, steps=None):
+    """
+    Make ``recipe``'s ingredients and steps match the submitted lists.
+
+    Each list is a list of dicts with the keys in INGREDIENT_FIELDS /
+    STEP_FIELDS, plus 'id' for a row that already exists. Stored rows
+    missing from a list are deleted. Pass None to leave a list alone.
+
+    Returns (ingredient RowChanges, step RowChanges). Raises ValueError
+    if an 'id' belongs to another recipe.
+    """
+    ingredient_changes, step_changes = RowChanges(), RowChanges()
+    with transaction.atomic():
+        if ingredients is not None:
+            stored = {row.pk: row for row in RecipeIngredient.objects
+                      .filter(recipe=recipe).select_related('ingredient')}
+            ingredient_changes, columns = _diff(
+                RecipeIngredient, recipe, stored, ingredients,
+                INGREDIENT_FIELDS, _prepare_ingredients)
+            _apply(RecipeIngredient, ingredient_changes, columns)
+
+        if steps is not None:
+            stored = {row.pk: row for row in
+                      RecipeStep.objects.filter(recipe=recipe)}
+            step_changes, columns = _diff(RecipeStep, recipe, stored, steps,
+                                          STEP_FIELDS)
+            # Step images go with their step (raw deletes don't cascade)
+            raw_delete(StepImage, 'step_id',
+                       [row.pk for row in step_changes.deleted])
+            _apply(RecipeStep, step_changes, columns)
+
+        if ingredient_changes or step_changes:
+            recipe_changed.send(sender=recipe.__class__, recipe_id=recipe.pk)
+    return ingredient_changes, step_changes
+
+
+def _apply(model, changes, columns):
+    """Write one list's changes: a query for each kind of change."""
+    raw_delete(model, 'id', [row.pk for row in changes.deleted])
+    if changes.updated:
+        model.objects.bulk_update([row for row, _ in changes.updated],
+                                  columns)
+    if changes.created:
+        model.objects.bulk_create(changes.created)
@@ -0,0 +1,178 @@
+"""
+Author statistics and "top cooks" leaderboards.
+
+AuthorStats holds each author's recipe counts and the likes, ratings and
+comments their public recipes received. Those numbers are already kept
+per recipe on the recipe cards, so refresh_author_stats() just sums an
+author's cards - two grouped queries for a whole batch of authors, no
+joins across ratings, likes and comments. refresh_cards() and
+remove_cards() call it for the authors whose cards they touched, so the
+stats follow every social and recipe write (and every hide, restore and
+change of owner) through the same background refresh as the cards.
+
+Leaderboards are rebuilt as a whole by rebuild_leaderboards() - queued
+at most every LEADERBOARD_DELAY after stats change, or run with
+`manage.py rebuild_leaderboards`:
+
+- all time: authors ranked by likes + ratings + comments received,
+  straight from AuthorStats
+- last 30 days: the same score, counting only likes, ratings and
+  comments from the activity stream in the last LEADERBOARD_DAYS days
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from social.models import ActivityEvent
+from .models import AuthorStats, LeaderboardEntry, Recipe, RecipeCard
+
+
+LEADERBOARD_SIZE = 100
+LEADERBOARD_DAYS = 30
+# Rebuild the boards at most this often (seconds) while stats change
+LEADERBOARD_DELAY = 60 * 15
+
+
+def refresh_author_stats(user_ids):
+    """
+    Recount the stats of ``user_ids`` from their recipes and cards.
+    Authors left without any recipe lose their row. Returns how many
+    rows were written.
+    """
+    user_ids = list(set(user_ids))
+    if not user_ids:
+        return 0
+    recipes = {
+        row['user_id']: row for row in
+        Recipe.objects.filter(user_id__in=user_ids).values('user_id')
+        .annotate(recipes=Count('id'),
+                  public=Count('id', filter=Q(is_public=True)))
+    }
+    # Cards only exist for public recipes
+    cards = {
+        row['user_id']: row for row in
+        RecipeCard.objects.filter(user_id__in=user_ids).values('user_id')
+        .annotate(likes=Sum('like_count'),
+                  ratings=Sum('rating_count'),
+                  stars=Sum(F('average_rating') * F('rating_count')),
+                  comments=Sum('comment_count'))
+    }
+    stats = []
+    for user_id, row in recipes.items():
+        card = cards.get(user_id, {})
+        ratings = card.get('ratings') or 0
+        stats.append(AuthorStats(
+            user_id=user_id,
+            recipe_count=row['recipes'],
+            public_recipe_count=row['public'],
+            like_count=card.get('likes') or 0,
+            rating_count=ratings,
+            average_rating=round(card['stars'] / ratings, 2)
+            if ratings else 0,
+            comment_count=card.get('comments') or 0,
+        ))
+    with transaction.atomic():
+        AuthorStats.objects.bulk_create(
+            stats,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['recipe_count', 'public_recipe_count',
+                           'like_count', 'rating_count', 'average_rating',
+                           'comment_count', 'refreshed_at'],
+        )
+        AuthorStats.objects.filter(user_id__in=user_ids).exclude(
+            user_id__in=list(recipes)).delete()
+    if stats:
+        from .tasks import refresh_leaderboards
+        refresh_leaderboards.enqueue()
+    return len(stats)
+
+
+def author_stats(user):
+    """A user's stats - zeros (unsaved) if they have no recipes yet."""
+    return (AuthorStats.objects.filter(user=user).first()
+            or AuthorStats(user=user))
+
+
+def _all_time_rows(limit):
+    return (
+        AuthorStats.objects
+        .filter(user__is_active=True, public_recipe_count__gt=0)
+        .annotate(score=F('like_count') + F('rating_count')
+                  + F('comment_count'))
+        .filter(score__gt=0)
+        .order_by('-score', '-average_rating', 'user_id')
+        .values('user_id', 'user__username', 'score', 'like_count',
+                'rating_count', 'average_rating', 'comment_count')[:limit]
+    )
+
+
+def _recent_rows(since, limit):
+    """One grouped query over the activity stream since ``since``."""
+    rows = (
+        ActivityEvent.objects
+        .filter(created_at__gte=since, recipe__is_public=True,
+                recipe__is_deleted=False, recipe__user__is_active=True,
+                actor__is_active=True)
+        .values('recipe__user_id', 'recipe__user__username')
+        .annotate(
+            like_count=Count('id', filter=Q(verb=ActivityEvent.LIKE)),
+            rating_count=Count('id', filter=Q(verb=ActivityEvent.RATE)),
+            stars=Sum('rating_value'),
+            comment_count=Count('id', filter=Q(
+                verb__in=[ActivityEvent.COMMENT, ActivityEvent.REPLY])),
+            score=Count('id'),
+        )
+        .order_by('-score', 'recipe__user_id')[:limit]
+    )
+    for row in rows:
+        ratings = row['rating_count']
+        yield {
+            'user_id': row['recipe__user_id'],
+            'user__username': row['recipe__user__username'],
+            'score': row['score'],
+            'like_count': row['like_count'],
+            'rating_count': ratings,
+            'average_rating': round(row['stars'] / ratings, 2)
+            if ratings else 0,
+            'comment_count': row['comment_count'],
+        }
+
+
+def rebuild_leaderboards(limit=LEADERBOARD_SIZE):
+    """
+    Rebuild both boards. Each is replaced in one transaction, so readers
+    see the old board or the new one, never half of each. Returns
+    {board: entries}.
+    """
+    now = timezone.now()
+    boards = {
+        LeaderboardEntry.ALL_TIME: _all_time_rows(limit),
+        LeaderboardEntry.LAST_30_DAYS: _recent_rows(
+            now - timedelta(days=LEADERBOARD_DAYS), limit),
+    }
+    sizes = {}
+    for board, rows in boards.items():
+        entries = [
+            LeaderboardEntry(
+                board=board, rank=rank, user_id=row['user_id'],
+                author=row['user__username'], score=row['score'],
+                like_count=row['like_count'],
+                rating_count=row['rating_count'],
+                average_rating=row['average_rating'],
+                comment_count=row['comment_count'], built_at=now)
+            for rank, row in enumerate(rows, start=1)
+        ]
+        with transaction.atomic():
+            LeaderboardEntry.objects.filter(board=board).delete()
+            LeaderboardEntry.objects.bulk_create(entries)
+        sizes[board] = len(entries)
+    return sizes
+
+
+def leaderboard(board, limit=LEADERBOARD_SIZE):
+    """The top ``limit`` entries of a board, in rank order - one query."""
+    return LeaderboardEntry.objects.filter(board=board).order_by(
+        'rank')[:limit]
@@ -0,0 +1,233 @@
+"""
+Benchmark scenarios for the key endpoints and service functions (run
+them with the benchmark command).
+
+A scenario is a function that does one unit of work - one request, one
+service call - given a BenchmarkContext with sample ids to pick from.
+Register it with @scenario('group.name'); the harness times it, counts
+its queries and reports throughput and p50/p95/p99 latency.
+"""
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from search.fuzzy import fuzzy_search
+from .dedupe import find_similar
+from .meal_plan import generate_meal_plan
+from .models import Recipe
+from .nutrition import compute_nutrition
+from .shopping import build_shopping_list
+from .synthetic import DISHES, INGREDIENTS
+
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    """Register a benchmark scenario under ``name``."""
+    def decorator(func):
+        SCENARIOS[name] = func
+        return func
+    return decorator
+
+
+class BenchmarkContext:
+    """Sample data and HTTP clients shared by every scenario in a run."""
+
+    def __init__(self, seed=0, sample_size=1000):
+        self.random = random.Random(seed)
+        self.recipe_ids = list(
+            Recipe.objects.public().order_by('?')
+            .values_list('id', flat=True)[:sample_size])
+        if not self.recipe_ids:
+            raise ValueError("No public recipes - run generate_data first")
+        self.words = [ingredient[0] for ingredient in INGREDIENTS] + DISHES
+
+        # Requests go through the full middleware stack, like real ones
+        self.client = Client(HTTP_HOST='127.0.0.1')
+        self.user_client = Client(HTTP_HOST='127.0.0.1')
+        user = (User.objects.filter(is_active=True)
+                .order_by('-last_login').first())
+        if user:
+            self.user_client.force_login(user)
+        self._search_client = None
+
+    @property
+    def search_client(self):
+        """
+        A client logged in as a throwaway user, so the SearchHistory rows
+        searches write can be told apart and removed by close().
+        """
+        if self._search_client is None:
+            self.search_user = User.objects.create_user(
+                f'benchmark-{uuid.uuid4().hex[:12]}')
+            self._search_client = Client(HTTP_HOST='127.0.0.1')
+            self._search_client.force_login(self.search_user)
+        return self._search_client
+
+    def close(self):
+        """Remove what the run wrote (the throwaway user's searches)."""
+        if self._search_client is not None:
+            self.search_user.delete()
+            self._search_client = None
+
+    def recipe_id(self):
+        return self.random.choice(self.recipe_ids)
+
+    def recipe_sample(self, count):
+        return self.random.sample(self.recipe_ids,
+                                  min(count, len(self.recipe_ids)))
+
+    def word(self):
+        return self.random.choice(self.words)
+
+    def typo(self):
+        """A search word with one letter dropped."""
+        word = self.word()
+        cut = self.random.randrange(len(word))
+        return word[:cut] + word[cut + 1:]
+
+
+def _get(client, url, **params):
+    response = client.get(url, params)
+    if response.status_code != 200:
+        raise AssertionError(f"GET {url} returned {response.status_code}")
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Endpoints
+# ---------------------------------------------------------------------------
+
+@scenario('api.recipe_list')
+def api_recipe_list(ctx):
+    _get(ctx.client, '/api/recipes/', limit=20)
+
+
+@scenario('api.recipe_detail')
+def api_recipe_detail(ctx):
+    _get(ctx.client, f'/api/recipes/{ctx.recipe_id()}/',
+         include='ingredients,steps,tags')
+
+
+@scenario('api.recipe_batch')
+def api_recipe_batch(ctx):
+    ids = ','.join(map(str, ctx.recipe_sample(20)))
+    _get(ctx.client, '/api/recipes/batch/', ids=ids)
+
+
+@scenario('api.recipe_comments')
+def api_recipe_comments(ctx):
+    _get(ctx.client, f'/api/recipes/{ctx.recipe_id()}/comments/')
+
+
+@scenario('api.search')
+def api_search(ctx):
+    _get(ctx.search_client, '/api/search/', q=ctx.word())
+
+
+@scenario('api.search_typo')
+def api_search_typo(ctx):
+    _get(ctx.search_client, '/api/search/', q=ctx.typo())
+
+
+@scenario('api.shopping_list')
+def api_shopping_list(ctx):
+    plan = ','.join(f'{recipe_id}:4' for recipe_id in ctx.recipe_sample(10))
+    _get(ctx.client, '/api/shopping-list/', plan=plan)
+
+
+@scenario('api.meal_plan')
+def api_meal_plan(ctx):
+    _get(ctx.client, '/api/meal-plan/', calories=2000, protein_g=100,
+         seed=ctx.random.randrange(1000))
+
+
+@scenario('api.feed')
+def api_feed(ctx):
+    _get(ctx.user_client, '/api/feed/')
+
+
+@scenario('page.recipe_detail')
+def page_recipe_detail(ctx):
+    _get(ctx.client, f'/recipes/{ctx.recipe_id()}/')
+
+
+# ---------------------------------------------------------------------------
+# Service functions
+# ---------------------------------------------------------------------------
+
+@scenario('service.build_shopping_list')
+def service_shopping_list(ctx):
+    build_shopping_list([(recipe_id, 4)
+                         for recipe_id in ctx.recipe_sample(50)])
+
+
+@scenario('service.compute_nutrition')
+def service_compute_nutrition(ctx):
+    compute_nutrition(ctx.recipe_sample(100))
+
+
+@scenario('service.generate_meal_plan')
+def service_meal_plan(ctx):
+    generate_meal_plan({'calories': 2000, 'protein_g': 100}, [],
+                       seed=ctx.random.randrange(1000))
+
+
+@scenario('service.find_similar')
+def service_find_similar(ctx):
+    find_similar(ctx.recipe_id())
+
+
+@scenario('service.fuzzy_search')
+def service_fuzzy_search(ctx):
+    fuzzy_search(Recipe.objects.public(), 'title', ctx.typo())
+
+
+# ---------------------------------------------------------------------------
+# Harness
+# ---------------------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, int(round(fraction * len(sorted_values) + 0.5)) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def run_scenario(func, ctx, iterations=100, warmup=5):
+    """
+    Run ``func`` ``warmup`` times untimed (to fill caches), then
+    ``iterations`` times timed. Returns a dict of statistics; times are
+    in milliseconds.
+    """
+    for _ in range(warmup):
+        func(ctx)
+
+    timings, query_counts = [], []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func(ctx)
+            timings.append((time.perf_counter() - start) * 1000)
+        query_counts.append(len(queries))
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    return {
+        'iterations': iterations,
+        'throughput_per_s': round(iterations / elapsed, 2),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(percentile(timings, 0.50), 3),
+        'p95_ms': round(percentile(timings, 0.95), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+        'max_ms': round(timings[-1], 3),
+        'queries_mean': round(statistics.fmean(query_counts), 2),
+        'queries_max': max(query_counts),
+    }
@@ -0,0 +1,224 @@
+"""
+The recipe card read model (RecipeCard): one row per public recipe with
+everything a list or grid of recipes shows.
+
+build_cards() works a batch of cards out from the source tables with a
+fixed number of queries; refresh_cards() stores them (and drops cards
+of recipes that are no longer public). The recipe refresh job calls it
+whenever a recipe, its tags or its ratings, likes and comments change,
+so list views can read RecipeCard alone. Both also recount the stats
+of the authors whose cards they touched (see recipes.authors), and
+bump the RecipeCard version stamp that catalogue ETags are built from
+(see recipes.conditional).
+
+check_cards() walks every recipe in chunks, compares the stored cards
+with freshly built ones and can rebuild the ones that differ.
+"""
+import json
+
+from django.db.models import Avg, Count
+
+from social.models import Comment, Rating, UserLikes
+from tags.models import RecipeTag, Tag
+from . import masterdata
+from .authors import refresh_author_stats
+from .models import Recipe, RecipeCard
+
+
+CARD_TAG_LIMIT = 3
+CHUNK_SIZE = 500
+
+# Tags shown first on a card
+TAG_TYPE_ORDER = [tag_type for tag_type, _ in Tag.TAG_TYPES]
+
+CARD_FIELDS = [
+    'user_id', 'author', 'title', 'description', 'image_url', 'total_time',
+    'difficulty_level', 'average_rating', 'rating_count', 'like_count',
+    'comment_count', 'primary_tags', 'created_at', 'source_updated_at',
+]
+
+
+def _chunks(ids, size):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def public_cards():
+    """
+    Cards safe to show. A recipe made private keeps its card until the
+    refresh job runs, so visibility is checked on the recipe row itself
+    (a primary key join) rather than trusted to the card.
+    """
+    return RecipeCard.objects.filter(recipe__is_public=True,
+                                     recipe__is_deleted=False)
+
+
+def primary_tags_for(recipe_ids):
+    """{recipe_id: [first CARD_TAG_LIMIT tags as dicts]} in one query."""
+    rows = RecipeTag.objects.filter(recipe_id__in=recipe_ids).values_list(
+        'recipe_id', 'tag_id')
+    by_id = masterdata.tags().by_id
+    tags = {}
+    for recipe_id, tag_id in rows:
+        if tag_id in by_id:
+            tags.setdefault(recipe_id, []).append(by_id[tag_id].as_dict())
+    for recipe_id, recipe_tags in tags.items():
+        recipe_tags.sort(key=lambda tag: (
+            TAG_TYPE_ORDER.index(tag['tag_type'])
+            if tag['tag_type'] in TAG_TYPE_ORDER else len(TAG_TYPE_ORDER),
+            tag['name']))
+        del recipe_tags[CARD_TAG_LIMIT:]
+    return tags
+
+
+def _counts(model, recipe_ids):
+    return dict(
+        model.objects.filter(recipe_id__in=recipe_ids, user__is_active=True)
+        .values('recipe_id').annotate(n=Count('id'))
+        .values_list('recipe_id', 'n')
+    )
+
+
+def build_cards(recipe_ids):
+    """
+    Work out the cards for whichever of ``recipe_ids`` are public.
+    Returns {recipe_id: RecipeCard (unsaved)} using five queries.
+    Likes, ratings and comments of deactivated (deleted) users don't
+    count.
+    """
+    rows = list(Recipe.objects.public().filter(id__in=recipe_ids).values(
+        'id', 'user_id', 'user__username', 'title', 'description',
+        'main_image_url', 'prep_time', 'cook_time', 'difficulty_level',
+        'created_at', 'updated_at',
+    ))
+    ids = [row['id'] for row in rows]
+    if not ids:
+        return {}
+
+    ratings = {
+        row['recipe_id']: row for row in
+        Rating.objects.filter(recipe_id__in=ids, user__is_active=True)
+        .values('recipe_id')
+        .annotate(average=Avg('rating_value'), n=Count('id'))
+    }
+    likes = _counts(UserLikes, ids)
+    comments = _counts(Comment, ids)
+    tags = primary_tags_for(ids)
+
+    cards = {}
+    for row in rows:
+        rating = ratings.get(row['id'], {})
+        image = row['main_image_url']
+        cards[row['id']] = RecipeCard(
+            recipe_id=row['id'],
+            user_id=row['user_id'],
+            author=row['user__username'],
+            title=row['title'],
+            description=row['description'],
+            image_url=image.url if image else '',
+            total_time=row['prep_time'] + row['cook_time'],
+            difficulty_level=row['difficulty_level'],
+            average_rating=round(rating.get('average') or 0, 2),
+            rating_count=rating.get('n', 0),
+            like_count=likes.get(row['id'], 0),
+            comment_count=comments.get(row['id'], 0),
+            primary_tags=json.dumps(tags.get(row['id'], [])),
+            created_at=row['created_at'],
+            source_updated_at=row['updated_at'],
+        )
+    return cards
+
+
+def refresh_cards(recipe_ids, batch_size=CHUNK_SIZE):
+    """
+    Rebuild the cards of ``recipe_ids``, in batches of ``batch_size``.
+    Recipes that are private, deleted or gone lose their card.
+    Returns (cards written, cards removed).
+    """
+    written = removed = 0
+    for chunk in _chunks(recipe_ids, batch_size):
+        # The authors before and after - a recipe may change hands
+        authors = _authors_of(chunk)
+        cards = build_cards(chunk)
+        authors.update(card.user_id for card in cards.values())
+        RecipeCard.objects.bulk_create(
+            cards.values(),
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=CARD_FIELDS + ['refreshed_at'],
+        )
+        written += len(cards)
+        removed += RecipeCard.objects.filter(recipe_id__in=chunk).exclude(
+            recipe_id__in=list(cards)).delete()[0]
+        refresh_author_stats(authors)
+    if written or removed:
+        masterdata.bump_version(RecipeCard)
+    return written, removed
+
+
+def _authors_of(recipe_ids):
+    """Users owning ``recipe_ids`` or their current cards."""
+    return (set(Recipe.all_objects.filter(id__in=recipe_ids)
+                .values_list('user_id', flat=True))
+            | set(RecipeCard.objects.filter(recipe_id__in=recipe_ids)
+                  .values_list('user_id', flat=True)))
+
+
+def remove_cards(recipe_ids):
+    """Drop cards straight away (e.g. recipes that were just hidden)."""
+    removed = 0
+    for chunk in _chunks(recipe_ids, CHUNK_SIZE):
+        authors = _authors_of(chunk)
+        removed += RecipeCard.objects.filter(recipe_id__in=chunk).delete()[0]
+        refresh_author_stats(authors)
+    if removed:
+        masterdata.bump_version(RecipeCard)
+    return removed
+
+
+def check_cards(chunk_size=CHUNK_SIZE, fix=False, progress=None):
+    """
+    Compare every stored card with a freshly built one, ``chunk_size``
+    recipes at a time. Returns {'checked', 'missing', 'stale', 'orphaned'}
+    where the last three are lists of recipe ids:
+
+    - missing: public recipes without a card
+    - stale: cards that differ from what they should say
+    - orphaned: cards of recipes that are not public any more
+
+    With ``fix=True`` each bad chunk is rebuilt as it is found.
+    ``progress`` is called with the running report after each chunk.
+    """
+    report = {'checked': 0, 'missing': [], 'stale': [], 'orphaned': []}
+    last_id = 0
+    while True:
+        chunk = list(Recipe.all_objects.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True)[:chunk_size])
+        if not chunk:
+            return report
+        last_id = chunk[-1]
+
+        expected = build_cards(chunk)
+        stored = {card.recipe_id: card for card in
+                  RecipeCard.objects.filter(recipe_id__in=chunk)}
+        bad = []
+        for recipe_id in chunk:
+            card, should_be = stored.get(recipe_id), expected.get(recipe_id)
+            if card is None and should_be is None:
+                continue
+            if card is None:
+                report['missing'].append(recipe_id)
+            elif should_be is None:
+                report['orphaned'].append(recipe_id)
+            elif any(getattr(card, field) != getattr(should_be, field)
+                     for field in CARD_FIELDS):
+                report['stale'].append(recipe_id)
+            else:
+                continue
+            bad.append(recipe_id)
+        if fix and bad:
+            refresh_cards(bad)
+        report['checked'] += len(chunk)
+        if progress:
+            progress(report)
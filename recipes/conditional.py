@@ -0,0 +1,156 @@
+"""
+Cheap change stamps for conditional GET (ETag / Last-Modified).
+
+Each helper works out "when did this last change?" with ONE indexed query
+so Django's ``condition`` decorator can answer ``304 Not Modified`` before
+the view runs - no templates rendered, no child rows loaded.
+
+Child rows without their own timestamp (ingredients, steps, step images,
+tags) bump ``Recipe.updated_at`` through ``recipes.signals``, so the
+recipe row itself covers them. Some changes have no timestamp to offer,
+so they only go into the ETag:
+
+- the "similar recipes" panel is rewritten with new SimilarRecipe rows
+  (its newest row id and row count)
+- tag and ingredient edits (the master data version stamps - names and
+  colours come from recipes.masterdata)
+- the author's username and profile
+
+The catalogue has no Last-Modified at all: a recipe being deleted or
+made private doesn't leave a newer timestamp behind. Its ETag comes from
+version stamps alone, so answering a catalogue request costs no query.
+"""
+import hashlib
+
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from social.models import Comment, Rating, UserLikes
+from tags.models import Tag
+from . import masterdata
+from .models import Ingredient, Recipe, RecipeCard, SimilarRecipe
+
+
+def _latest(model, field, **filters):
+    """Subquery for the newest ``field`` value (uses the matching index)."""
+    return Subquery(
+        model.objects.filter(**filters)
+        .order_by(f'-{field}').values(field)[:1]
+    )
+
+
+def _count(model, **filters):
+    """Subquery counting rows - catches deletes that a max() would miss."""
+    return Coalesce(Subquery(
+        model.objects.filter(**filters)
+        .values('recipe').annotate(n=Count('id')).values('n')
+    ), 0)
+
+
+def _digest(*parts):
+    text = ':'.join(str(part) for part in parts)
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def get_recipe_stamp(request, pk):
+    """
+    Return ``(last_modified, version)`` for a public recipe, or None.
+
+    The result is memoised on the request because ``condition`` asks for
+    the ETag and Last-Modified separately and we only want one query.
+    """
+    stamps = request.__dict__.setdefault('_recipe_stamps', {})
+    if pk in stamps:
+        return stamps[pk]
+
+    # Deleted users' likes, ratings and comments aren't shown or counted
+    active = {'recipe': OuterRef('pk'), 'user__is_active': True}
+    row = Recipe.objects.public().filter(pk=pk).annotate(
+        comment_changed=_latest(Comment, 'updated_at', **active),
+        rating_changed=_latest(Rating, 'updated_at', **active),
+        like_changed=_latest(UserLikes, 'created_at', **active),
+        comment_count=_count(Comment, **active),
+        rating_count=_count(Rating, **active),
+        like_count=_count(UserLikes, **active),
+        similar_version=_latest(SimilarRecipe, 'id', recipe=OuterRef('pk')),
+        similar_count=_count(SimilarRecipe, recipe=OuterRef('pk')),
+    ).values(
+        'updated_at', 'comment_changed', 'rating_changed', 'like_changed',
+        'comment_count', 'rating_count', 'like_count',
+        'similar_version', 'similar_count',
+        'user__username', 'user__userprofile__updated_at',
+    ).first()
+
+    stamp = None
+    if row:
+        changed = [row['updated_at'], row['comment_changed'],
+                   row['rating_changed'], row['like_changed']]
+        last_modified = max(value for value in changed if value)
+        version = _digest(pk, last_modified.isoformat(), row['comment_count'],
+                          row['rating_count'], row['like_count'],
+                          row['similar_version'], row['similar_count'],
+                          row['user__username'],
+                          row['user__userprofile__updated_at'],
+                          masterdata.current_version(Tag),
+                          masterdata.current_version(Ingredient))
+        stamp = (last_modified, version)
+    stamps[pk] = stamp
+    return stamp
+
+
+def get_catalogue_stamp(request):
+    """
+    Return a version string for the public recipe catalogue.
+
+    Used for feed-style list responses. Nothing is counted or scanned:
+    the stamp is made of version stamps (recipes.masterdata) that writes
+    bump - Recipe's on every save, delete and soft delete, RecipeCard's
+    whenever cards are rebuilt or dropped, and the tag and ingredient
+    tables' for the names and colours lists include. Social activity
+    and edits to a recipe's ingredients or steps reach the lists through
+    the card refresh job, so the version moves when the cards catch up.
+    """
+    if not hasattr(request, '_catalogue_stamp'):
+        request._catalogue_stamp = _digest(
+            masterdata.current_version(Recipe),
+            masterdata.current_version(RecipeCard),
+            masterdata.current_version(Tag),
+            masterdata.current_version(Ingredient))
+    return request._catalogue_stamp
+
+
+# ---------------------------------------------------------------------------
+# Functions in the shape django.views.decorators.http.condition expects
+# ---------------------------------------------------------------------------
+
+def recipe_last_modified(request, pk):
+    stamp = get_recipe_stamp(request, pk)
+    return stamp[0] if stamp else None
+
+
+def recipe_page_etag(request, pk):
+    """
+    Weak ETag for the HTML page - the markup also depends on who is
+    looking at it (and carries a CSRF token), so it is only semantically
+    equivalent between requests, not byte-for-byte.
+    """
+    stamp = get_recipe_stamp(request, pk)
+    if not stamp:
+        return None
+    return f'W/"{_digest(stamp[1], request.user.pk)}"'
+
+
+def recipe_api_etag(request, pk):
+    """
+    Strong ETag for JSON - same data and same query string always give
+    the exact same bytes.
+    """
+    stamp = get_recipe_stamp(request, pk)
+    if not stamp:
+        return None
+    return f'"{_digest(stamp[1], request.GET.urlencode())}"'
+
+
+def catalogue_api_etag(request, *args, **kwargs):
+    stamp = get_catalogue_stamp(request)
+    return f'"{_digest(stamp, request.GET.urlencode())}"'
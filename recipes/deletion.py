@@ -0,0 +1,305 @@
+"""
+Soft delete and background purge for recipes and users.
+
+Deleting a prolific author through the ORM makes Django load every
+recipe, ingredient row, step, image, tag, rating, like and comment tree
+into memory before deleting any of it - slow enough to time out. So
+deletes happen in two stages:
+
+1. Soft delete (instant): the recipe or user profile is flagged
+   ``is_deleted``. The default Recipe manager skips flagged rows, so they
+   vanish from every page and API at once. Users are also deactivated
+   so they can't log in. Until the purge runs this can be undone.
+
+2. Purge (background job, after PURGE_GRACE): rows are really deleted,
+   children before parents, with plain DELETE ... WHERE ... IN (...)
+   statements of at most CHUNK_SIZE ids. Each batch of parents gets its
+   own short transaction, so memory use and lock time stay bounded
+   however much data hangs off them.
+
+Raw deletes skip signal handlers, so the purge keeps derived data
+consistent itself: recipes that lose ratings, likes or comments are
+touched and refreshed, and the search index is told recipes went away.
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from search.cache import invalidate_all as invalidate_search_cache
+from social.models import Comment, Rating, UserLikes
+from .cards import refresh_cards, remove_cards
+from .masterdata import bump_version
+from .models import Recipe
+from .prerender import prerender_recipes, remove_recipe_pages
+
+
+PURGE_GRACE = timedelta(days=7)
+CHUNK_SIZE = 500
+RECIPES_PER_TRANSACTION = 100
+
+
+# ---------------------------------------------------------------------------
+# Soft delete
+# ---------------------------------------------------------------------------
+
+def soft_delete_recipes(recipe_ids, now=None):
+    """
+    Hide recipes now and schedule their purge. Returns how many.
+    ``now`` is stored as their deleted_at (default: the current time).
+    """
+    from .tasks import drop_from_feeds, purge_deleted
+    recipe_ids = list(recipe_ids)
+    now = now or timezone.now()
+    hidden = Recipe.objects.filter(id__in=recipe_ids).update(
+        is_deleted=True, deleted_at=now, updated_at=now)
+    if hidden:
+        # update() sends no signals (see recipes.masterdata)
+        bump_version(Recipe)
+        remove_cards(recipe_ids)
+        remove_recipe_pages(recipe_ids)
+        invalidate_search_cache()
+        drop_from_feeds.enqueue(recipe_ids=recipe_ids)
+        purge_deleted.enqueue(delay=PURGE_GRACE.total_seconds() + 60)
+    return hidden
+
+
+def restore_recipes(recipe_ids):
+    """Undo a soft delete that hasn't been purged yet. Returns how many."""
+    recipe_ids = list(recipe_ids)
+    restored = Recipe.all_objects.filter(
+        id__in=recipe_ids, is_deleted=True,
+    ).update(is_deleted=False, deleted_at=None, updated_at=timezone.now())
+    if restored:
+        bump_version(Recipe)
+        refresh_cards(recipe_ids)
+        prerender_recipes(recipe_ids)
+        invalidate_search_cache()
+    return restored
+
+
+def soft_delete_user(user):
+    """
+    Deactivate a user and hide them and all their recipes now; their
+    data is purged after PURGE_GRACE.
+
+    Their likes, ratings and comments stop counting at once (everything
+    that shows them filters on ``user__is_active``); the cards and pages
+    of the recipes they touched are redone by a background job.
+    """
+    from .tasks import refresh_activity_recipes
+    now = timezone.now()
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        profile, _ = UserProfile.objects.get_or_create(user=user)
+        UserProfile.objects.filter(pk=profile.pk).update(
+            is_deleted=True, deleted_at=now)
+        # The recipes share the profile's deleted_at, so restore_user()
+        # can tell them from ones the user had already deleted
+        soft_delete_recipes(Recipe.objects.filter(
+            user=user).values_list('id', flat=True), now=now)
+        refresh_activity_recipes.enqueue(user_id=user.pk)
+    user.is_active = False
+
+
+def restore_user(user):
+    """
+    Undo soft_delete_user() if the purge hasn't happened yet. Only the
+    recipes hidden along with the account come back - ones the user
+    deleted themselves beforehand stay deleted.
+    """
+    from .tasks import refresh_activity_recipes
+    with transaction.atomic():
+        deleted_at = UserProfile.objects.filter(
+            user=user, is_deleted=True).values_list(
+            'deleted_at', flat=True).first()
+        User.objects.filter(pk=user.pk).update(is_active=True)
+        UserProfile.objects.filter(user=user).update(
+            is_deleted=False, deleted_at=None)
+        if deleted_at:
+            restore_recipes(Recipe.all_objects.filter(
+                user=user, is_deleted=True, deleted_at=deleted_at,
+            ).values_list('id', flat=True))
+        refresh_activity_recipes.enqueue(user_id=user.pk)
+    user.is_active = True
+
+
+# ---------------------------------------------------------------------------
+# Purge
+# ---------------------------------------------------------------------------
+
+def _chunks(ids, size=CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def _cascade_relations(model):
+    """
+    Every foreign key pointing at ``model`` (including ones Django keeps
+    hidden, such as many-to-many tables) - the same set the ORM's own
+    delete would follow.
+    """
+    return [
+        field for field in model._meta.get_fields(include_hidden=True)
+        if field.auto_created and not field.concrete
+        and (field.one_to_one or field.one_to_many)
+    ]
+
+
+def raw_delete(model, column, ids):
+    """
+    DELETE FROM <table> WHERE <column> IN (...), in chunks - no model
+    instances loaded and no signals sent. Returns rows deleted.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(column)
+    deleted = 0
+    with connection.cursor() as cursor:
+        for chunk in _chunks(ids):
+            placeholders = ', '.join(['%s'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+                chunk)
+            deleted += cursor.rowcount
+    return deleted
+
+
+def _purge_rows(model, pks, counts):
+    """
+    Delete ``model`` rows with the given primary keys and everything that
+    cascades from them, deepest children first. Tables with nothing
+    hanging off them are deleted by foreign key without loading ids.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+    for relation in _cascade_relations(model):
+        child = relation.related_model
+        field = relation.field
+        on_delete = relation.on_delete
+        if on_delete is models.DO_NOTHING:
+            continue
+        if on_delete is models.SET_NULL:
+            for chunk in _chunks(pks):
+                child._base_manager.filter(
+                    **{f'{field.name}__in': chunk}).update(
+                    **{field.name: None})
+            continue
+        if on_delete is not models.CASCADE:
+            raise ValueError(f"Can't purge {model.__name__}: "
+                             f"{child.__name__}.{field.name} would block it")
+
+        if _cascade_relations(child) and child is not model:
+            for chunk in _chunks(pks):
+                _purge_rows(child, child._base_manager.filter(
+                    **{f'{field.name}__in': chunk}
+                ).values_list('pk', flat=True), counts)
+        elif child is model:
+            # Self-referencing (comment replies) - walk down the tree
+            for chunk in _chunks(pks):
+                replies = child._base_manager.filter(
+                    **{f'{field.name}__in': chunk}).values_list(
+                    'pk', flat=True)
+                _purge_rows(child, replies, counts)
+        else:
+            deleted = raw_delete(child, field.column, pks)
+            if deleted:
+                counts[child._meta.label] = (
+                    counts.get(child._meta.label, 0) + deleted)
+
+    deleted = raw_delete(model, model._meta.pk.column, pks)
+    counts[model._meta.label] = counts.get(model._meta.label, 0) + deleted
+
+
+def _refresh_recipes(recipe_ids):
+    """
+    Recipes whose ratings, likes or comments were purged from under
+    them: bump updated_at (so cached pages and ETags change) and queue
+    the usual refresh of their derived data.
+    """
+    from .tasks import refresh_recipe
+    recipe_ids = list(recipe_ids)
+    for chunk in _chunks(recipe_ids):
+        Recipe.objects.filter(id__in=chunk).update(updated_at=timezone.now())
+    for recipe_id in recipe_ids:
+        refresh_recipe.enqueue(recipe_id=recipe_id)
+
+
+def purge_recipes(recipe_ids):
+    """
+    Really delete recipes and everything under them, a few at a time.
+    Returns {model label: rows deleted}.
+    """
+    counts = {}
+    for chunk in _chunks(recipe_ids, RECIPES_PER_TRANSACTION):
+        with transaction.atomic():
+            _purge_rows(Recipe, chunk, counts)
+    if counts:
+        bump_version(Recipe)
+    return counts
+
+
+def purge_user(user_id):
+    """
+    Really delete a user: their recipes first (in batches), then their
+    own rows everywhere else. Returns {model label: rows deleted}.
+    """
+    counts = purge_recipes(Recipe.all_objects.filter(
+        user_id=user_id).values_list('id', flat=True))
+
+    # Other people's recipes lose this user's ratings, likes and comments
+    affected = set()
+    for model in (Rating, UserLikes, Comment):
+        affected.update(model.objects.filter(user_id=user_id).values_list(
+            'recipe_id', flat=True).distinct())
+    with transaction.atomic():
+        _purge_rows(User, [user_id], counts)
+    _refresh_recipes(affected)
+    return counts
+
+
+def purge_deleted(older_than=PURGE_GRACE):
+    """
+    Purge everything soft-deleted more than ``older_than`` ago - users
+    first (they take their recipes with them), then other recipes.
+    Returns {model label: rows deleted}.
+    """
+    cutoff = timezone.now() - older_than
+    totals = {}
+
+    def add(counts):
+        for label, count in counts.items():
+            totals[label] = totals.get(label, 0) + count
+
+    for user_id in UserProfile.objects.filter(
+            is_deleted=True, deleted_at__lte=cutoff
+    ).values_list('user_id', flat=True):
+        add(purge_user(user_id))
+
+    while True:
+        batch = list(Recipe.all_objects.filter(
+            is_deleted=True, deleted_at__lte=cutoff,
+        ).order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not batch:
+            return totals
+        add(purge_recipes(batch))
+
+
+def next_purge_in(older_than=PURGE_GRACE):
+    """
+    Seconds until the oldest soft-deleted user or recipe still waiting
+    is due for purging, or None if nothing is waiting.
+    """
+    waiting = [
+        model.filter(is_deleted=True).aggregate(
+            oldest=models.Min('deleted_at'))['oldest']
+        for model in (UserProfile.objects, Recipe.all_objects)
+    ]
+    waiting = [moment for moment in waiting if moment]
+    if not waiting:
+        return None
+    due = min(waiting) + older_than - timezone.now()
+    return max(due.total_seconds(), 0) + 60
@@ -0,0 +1,56 @@
+"""
+Dietary flags and preferences.
+
+Ingredient.dietary_flags says what an ingredient CONTAINS
+("dairy", "gluten", "nuts", ...). UserProfile.dietary_preferences says
+what a user wants to AVOID ("vegan", "gluten-free", ...). This module
+translates between the two, and packs flags into an integer bitmask so a
+whole catalogue can be filtered with one bitwise AND.
+"""
+
+# Every flag an ingredient can carry gets its own bit
+KNOWN_FLAGS = [
+    'dairy', 'gluten', 'nuts', 'soy', 'eggs', 'meat', 'fish',
+    'shellfish', 'honey', 'sesame',
+]
+FLAG_BITS = {flag: 1 << index for index, flag in enumerate(KNOWN_FLAGS)}
+
+# Preference -> flags a recipe must NOT contain
+PREFERENCE_EXCLUDES = {
+    'vegan': {'dairy', 'eggs', 'meat', 'fish', 'shellfish', 'honey'},
+    'vegetarian': {'meat', 'fish', 'shellfish'},
+    'pescatarian': {'meat'},
+    'gluten-free': {'gluten'},
+    'dairy-free': {'dairy'},
+    'nut-free': {'nuts'},
+    'egg-free': {'eggs'},
+    'soy-free': {'soy'},
+    'shellfish-free': {'shellfish'},
+    'sesame-free': {'sesame'},
+}
+
+
+def flags_to_mask(flags):
+    """['dairy', 'eggs'] -> bitmask. Unknown flags are ignored."""
+    mask = 0
+    for flag in flags:
+        mask |= FLAG_BITS.get(flag.strip().lower(), 0)
+    return mask
+
+
+def mask_to_flags(mask):
+    """Bitmask -> sorted list of flag names."""
+    return [flag for flag in KNOWN_FLAGS if mask & FLAG_BITS[flag]]
+
+
+def excluded_flags(preferences):
+    """['vegan', 'nut-free'] -> {'dairy', 'eggs', ..., 'nuts'}"""
+    excluded = set()
+    for preference in preferences:
+        excluded |= PREFERENCE_EXCLUDES.get(preference.strip().lower(), set())
+    return excluded
+
+
+def excluded_mask(preferences):
+    """Bitmask of every flag the given preferences rule out."""
+    return flags_to_mask(excluded_flags(preferences))
@@ -0,0 +1,236 @@
+"""
+Personalised home feed.
+
+Each active user's feed is materialised in the cache as a bounded,
+ranked list of recipe ids, together with what we learned about them
+(tags and authors they like, dietary exclusions). Serving a page is one
+cache read plus one batch fetch of the recipes on that page.
+
+Ranking is "affinity x recency": a recipe's score halves every
+RECENCY_HALF_LIFE_DAYS. Stored as a log, that becomes
+
+    rank = log2(1 + affinity) + created_day / RECENCY_HALF_LIFE_DAYS
+
+which does not depend on "now" - so a new recipe can be slotted into an
+existing feed (see add_recipe_to_feeds) without rescoring everything.
+Recipes made private or deleted are taken out the same way
+(remove_recipes_from_feeds).
+"""
+import bisect
+import math
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from social.models import Rating, UserLikes
+from tags.models import RecipeTag
+from .dietary import excluded_mask
+from .models import Recipe
+
+
+FEED_SIZE = 200
+CANDIDATE_POOL = 2000
+FEED_TTL = 60 * 60 * 24 * 2
+ACTIVE_DAYS = 14
+RECENCY_HALF_LIFE_DAYS = 7
+LOVED_RATING = 4
+
+TAG_WEIGHT = 0.6
+AUTHOR_WEIGHT = 1.0
+MAX_TAG_SCORE = 3.0
+
+
+def feed_cache_key(user_id):
+    return f'feed:user:{user_id}'
+
+
+def _build_affinity(user_id):
+    """What a user has shown they like, plus what they must not see."""
+    liked = set(UserLikes.objects.filter(
+        user_id=user_id).values_list('recipe_id', flat=True))
+    loved = set(Rating.objects.filter(
+        user_id=user_id, rating_value__gte=LOVED_RATING
+    ).values_list('recipe_id', flat=True))
+    sources = liked | loved
+
+    tag_counts = Counter(RecipeTag.objects.filter(
+        recipe_id__in=sources).values_list('tag_id', flat=True))
+    author_counts = Counter(Recipe.objects.filter(
+        id__in=sources).exclude(user_id=user_id).values_list(
+        'user_id', flat=True))
+
+    def normalise(counts):
+        top = max(counts.values(), default=0)
+        return {key: count / top for key, count in counts.items()}
+
+    profile = UserProfile.objects.filter(user_id=user_id).first()
+    preferences = profile.get_dietary_preferences() if profile else []
+    return {
+        'tags': normalise(tag_counts),
+        'authors': normalise(author_counts),
+        'excluded_mask': excluded_mask(preferences),
+        'hidden': liked,
+    }
+
+
+def _candidate_features(queryset):
+    """
+    (id, author, created_at, dietary mask, tag ids, like count) for each
+    recipe in ``queryset``, using three queries for the whole batch.
+    """
+    rows = list(queryset.values_list('id', 'user_id', 'created_at',
+                                     'nutrition__dietary_mask'))
+    recipe_ids = [row[0] for row in rows]
+    tags = defaultdict(list)
+    for recipe_id, tag_id in RecipeTag.objects.filter(
+            recipe_id__in=recipe_ids).values_list('recipe_id', 'tag_id'):
+        tags[recipe_id].append(tag_id)
+    likes = Counter(UserLikes.objects.filter(
+        recipe_id__in=recipe_ids, user__is_active=True,
+    ).values_list('recipe_id', flat=True))
+    return [
+        (recipe_id, author_id, created_at, mask, tags[recipe_id],
+         likes[recipe_id])
+        for recipe_id, author_id, created_at, mask in rows
+    ]
+
+
+def _rank(user_id, affinity, features):
+    """
+    Time-invariant rank for one recipe, or None if it mustn't be shown:
+    the user's own recipes, ones they already liked, and ones that clash
+    with their dietary preferences (or whose ingredients aren't known
+    yet, when they have preferences).
+    """
+    recipe_id, author_id, created_at, mask, tag_ids, like_count = features
+    if author_id == user_id or recipe_id in affinity['hidden']:
+        return None
+    if affinity['excluded_mask'] and (
+            mask is None or mask & affinity['excluded_mask']):
+        return None
+
+    tag_score = min(sum(affinity['tags'].get(tag_id, 0)
+                        for tag_id in tag_ids), MAX_TAG_SCORE)
+    score = (1 + TAG_WEIGHT * tag_score
+             + AUTHOR_WEIGHT * affinity['authors'].get(author_id, 0)
+             + math.log1p(like_count) / 10)
+    created_days = created_at.timestamp() / 86400
+    return math.log2(score) + created_days / RECENCY_HALF_LIFE_DAYS
+
+
+def rebuild_user_feed(user_id):
+    """Score the newest public recipes for one user and cache the feed."""
+    affinity = _build_affinity(user_id)
+    candidates = _candidate_features(
+        Recipe.objects.public().order_by('-created_at')[:CANDIDATE_POOL]
+    )
+    ranked = []
+    for features in candidates:
+        rank = _rank(user_id, affinity, features)
+        if rank is not None:
+            ranked.append((rank, features[0]))
+    ranked.sort(reverse=True)
+
+    entry = {
+        'version': uuid.uuid4().hex,
+        'ranks': [rank for rank, _ in ranked[:FEED_SIZE]],
+        'recipe_ids': [recipe_id for _, recipe_id in ranked[:FEED_SIZE]],
+        'affinity': affinity,
+    }
+    cache.set(feed_cache_key(user_id), entry, FEED_TTL)
+    return entry
+
+
+def get_feed(user_id):
+    """The cached feed entry, building it on a cache miss."""
+    return cache.get(feed_cache_key(user_id)) or rebuild_user_feed(user_id)
+
+
+def active_user_ids():
+    """Users who logged in recently enough to deserve a materialised feed."""
+    since = timezone.now() - timedelta(days=ACTIVE_DAYS)
+    return User.objects.filter(
+        is_active=True, last_login__gte=since
+    ).order_by('id').values_list('id', flat=True)
+
+
+def _insert(entry, recipe_id, rank):
+    """Put a recipe into a feed entry at its rank, keeping it bounded."""
+    if recipe_id in entry['recipe_ids']:
+        index = entry['recipe_ids'].index(recipe_id)
+        del entry['recipe_ids'][index]
+        del entry['ranks'][index]
+    # ranks are sorted high -> low; bisect works on the negated values
+    index = bisect.bisect_left([-r for r in entry['ranks']], -rank)
+    if index >= FEED_SIZE:
+        return False
+    entry['ranks'].insert(index, rank)
+    entry['recipe_ids'].insert(index, recipe_id)
+    del entry['ranks'][FEED_SIZE:]
+    del entry['recipe_ids'][FEED_SIZE:]
+    entry['version'] = uuid.uuid4().hex
+    return True
+
+
+def add_recipe_to_feeds(recipe_id, chunk_size=500):
+    """
+    Slot a newly public recipe into every materialised feed it belongs
+    in - no rebuilds, just one get_many/set_many per chunk of users.
+    Returns how many feeds changed.
+    """
+    features = _candidate_features(
+        Recipe.objects.public().filter(pk=recipe_id))
+    if not features:
+        return 0
+    features = features[0]
+
+    changed = 0
+    user_ids = list(active_user_ids())
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        entries = cache.get_many([feed_cache_key(uid) for uid in chunk])
+        updates = {}
+        for user_id in chunk:
+            entry = entries.get(feed_cache_key(user_id))
+            if entry is None:
+                continue  # built fresh (and so including it) on next visit
+            rank = _rank(user_id, entry['affinity'], features)
+            if rank is not None and _insert(entry, recipe_id, rank):
+                updates[feed_cache_key(user_id)] = entry
+        cache.set_many(updates, FEED_TTL)
+        changed += len(updates)
+    return changed
+
+
+def remove_recipes_from_feeds(recipe_ids, chunk_size=500):
+    """
+    Take recipes that were hidden or deleted out of every materialised
+    feed, so feed pages stay full and "has more" stays right. Returns
+    how many feeds changed.
+    """
+    recipe_ids = set(recipe_ids)
+    changed = 0
+    user_ids = list(active_user_ids())
+    for start in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[start:start + chunk_size]
+        entries = cache.get_many([feed_cache_key(uid) for uid in chunk])
+        updates = {}
+        for key, entry in entries.items():
+            keep = [index for index, recipe_id
+                    in enumerate(entry['recipe_ids'])
+                    if recipe_id not in recipe_ids]
+            if len(keep) == len(entry['recipe_ids']):
+                continue
+            entry['ranks'] = [entry['ranks'][index] for index in keep]
+            entry['recipe_ids'] = [entry['recipe_ids'][index]
+                                   for index in keep]
+            entry['version'] = uuid.uuid4().hex
+            updates[key] = entry
+        cache.set_many(updates, FEED_TTL)
+        changed += len(updates)
+    return changed
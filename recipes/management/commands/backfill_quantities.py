@@ -0,0 +1,71 @@
+"""
+Parse every RecipeIngredient quantity and store canonical grams/ml.
+
+    python manage.py backfill_quantities --batch-size 2000
+
+Walks the table in primary key order, one chunk at a time, so memory use
+and transaction length stay small however big the table gets. Only rows
+whose values actually change are written. Afterwards the nutrition of the
+affected recipes is recomputed (skip with --skip-nutrition).
+
+Rows count as unedited, so the quantity and unit already stored are
+kept; the display text only fills in a missing unit.
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import RecipeIngredient
+from recipes.nutrition import refresh_nutrition
+from recipes.quantities import (CANONICAL_FIELDS, QUANTITY_FIELDS,
+                                canonicalize_rows)
+
+
+class Command(BaseCommand):
+    help = 'Backfill canonical grams/ml for existing recipe ingredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='resume after this RecipeIngredient id')
+        parser.add_argument('--skip-nutrition', action='store_true',
+                            help="don't refresh RecipeNutrition afterwards")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = options['start_after']
+        scanned = updated = 0
+        touched_recipes = set()
+
+        while True:
+            rows = list(
+                RecipeIngredient.objects.filter(id__gt=last_id)
+                .order_by('id').select_related('ingredient')[:batch_size]
+            )
+            if not rows:
+                break
+            names = {row.ingredient_id: row.ingredient.name for row in rows}
+            # As stored, so what admins entered is kept - only blanks
+            # and the grams/ml columns are filled in
+            stored = {row.pk: {name: getattr(row, name)
+                               for name in QUANTITY_FIELDS} for row in rows}
+            changed = canonicalize_rows(rows, names, stored)
+            if changed:
+                with transaction.atomic():
+                    RecipeIngredient.objects.bulk_update(
+                        changed, CANONICAL_FIELDS)
+                touched_recipes.update(row.recipe_id for row in changed)
+
+            scanned += len(rows)
+            updated += len(changed)
+            last_id = rows[-1].id
+            self.stdout.write(
+                f"...{scanned} rows scanned, {updated} updated "
+                f"(last id {last_id})"
+            )
+
+        if touched_recipes and not options['skip_nutrition']:
+            refresh_nutrition(sorted(touched_recipes))
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {updated} of {scanned} rows updated, "
+            f"{len(touched_recipes)} recipes affected"
+        ))
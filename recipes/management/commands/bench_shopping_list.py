@@ -0,0 +1,115 @@
+"""
+Benchmark the shopping list aggregator over large meal plans.
+
+    python manage.py bench_shopping_list --recipes 50 --repeat 20
+
+Uses existing recipes when there are enough. Otherwise it creates
+throwaway synthetic recipes inside a transaction that is rolled back at
+the end, so the database is left untouched.
+"""
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from recipes import masterdata
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from recipes.shopping import build_shopping_list
+
+
+UNITS = ['g', 'kg', 'ml', 'l', 'tsp', 'tbsp', 'cup', 'pieces']
+CATEGORIES = ['produce', 'dairy', 'meat', 'baking', 'spices', 'tins']
+
+
+class Rollback(Exception):
+    """Raised to throw away the synthetic benchmark data."""
+
+
+class Command(BaseCommand):
+    help = 'Time build_shopping_list() for N-recipe meal plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=50,
+                            help='recipes per meal plan (default 50)')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='how many timed runs (default 20)')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=12,
+                            help='only used for synthetic recipes')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                recipe_ids = self._recipe_ids(options)
+                self._run(recipe_ids, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _recipe_ids(self, options):
+        wanted = options['recipes']
+        recipe_ids = list(
+            Recipe.objects.order_by('?').values_list('id', flat=True)[:wanted]
+        )
+        if len(recipe_ids) < wanted:
+            self.stdout.write(
+                f"Only {len(recipe_ids)} recipes found - creating "
+                f"{wanted - len(recipe_ids)} synthetic ones (rolled back)"
+            )
+            recipe_ids += self._create_recipes(
+                wanted - len(recipe_ids), options['ingredients_per_recipe']
+            )
+        return recipe_ids
+
+    def _create_recipes(self, count, per_recipe):
+        user, _ = User.objects.get_or_create(username='bench_shopping_user')
+        ingredients = Ingredient.objects.bulk_create([
+            Ingredient(name=f'bench ingredient {i}',
+                       category=CATEGORIES[i % len(CATEGORIES)],
+                       common_unit=random.choice(['g', 'ml', 'pieces']))
+            for i in range(200)
+        ])
+        masterdata.bump_version(Ingredient)
+        recipes = Recipe.objects.bulk_create([
+            Recipe(user=user, title=f'Bench recipe {i}', prep_time=10,
+                   cook_time=20, base_servings=random.randint(1, 8),
+                   difficulty_level='Easy')
+            for i in range(count)
+        ])
+        rows = []
+        for recipe in recipes:
+            for order, ingredient in enumerate(
+                    random.sample(ingredients, per_recipe)):
+                quantity = round(random.uniform(0.25, 500), 2)
+                rows.append(RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient,
+                    quantity_numeric=quantity,
+                    quantity_display=str(quantity),
+                    unit=random.choice(UNITS), display_order=order,
+                ))
+        RecipeIngredient.objects.bulk_create(rows)
+        return [recipe.pk for recipe in recipes]
+
+    def _run(self, recipe_ids, options):
+        plan = [(recipe_id, random.randint(1, 6)) for recipe_id in recipe_ids]
+        build_shopping_list(plan)  # warm up
+
+        timings = []
+        for _ in range(options['repeat']):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                result = build_shopping_list(plan)
+                timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        lines = sum(len(category['items']) for category in result)
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(plan)} recipes -> {lines} lines in "
+            f"{len(result)} categories, {len(queries)} queries per run\n"
+            f"min {timings[0]:.1f} ms | median "
+            f"{statistics.median(timings):.1f} ms | p95 {p95:.1f} ms"
+        ))
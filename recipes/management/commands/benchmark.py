@@ -0,0 +1,138 @@
+"""
+Benchmark the key endpoints and service functions.
+
+    python manage.py benchmark                        # everything
+    python manage.py benchmark --only api. --iterations 500
+    python manage.py benchmark --compare benchmarks/<earlier run>.json
+    python manage.py benchmark --list
+
+Each scenario (see recipes.benchmarks) reports throughput, p50/p95/p99
+latency and queries per call. Results are written as JSON, named after
+the time and git commit, so runs can be compared across commits with
+--compare. Fill the database first with generate_data.
+"""
+import json
+import platform
+import subprocess
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from recipes.benchmarks import SCENARIOS, BenchmarkContext, run_scenario
+from recipes.models import Recipe, RecipeIngredient
+
+
+DEFAULT_OUTPUT_DIR = Path(settings.BASE_DIR) / 'benchmarks'
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+class Command(BaseCommand):
+    help = 'Time key endpoints and services (p50/p95/p99, queries)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', action='append', default=[],
+                            help='scenario name prefix (repeatable)')
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output',
+                            help='JSON file to write (default: '
+                                 'benchmarks/<time>-<commit>.json)')
+        parser.add_argument('--compare',
+                            help='earlier results JSON to compare against')
+        parser.add_argument('--list', action='store_true',
+                            help='list the scenarios and exit')
+
+    def handle(self, *args, **options):
+        names = [name for name in SCENARIOS
+                 if not options['only']
+                 or any(name.startswith(prefix)
+                        for prefix in options['only'])]
+        if options['list']:
+            self.stdout.write('\n'.join(names))
+            return
+        if not names:
+            raise CommandError("No scenarios match --only")
+        try:
+            ctx = BenchmarkContext(seed=options['seed'])
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        commit = _git_commit()
+        results = {}
+        self.stdout.write(f"{'scenario':32} {'req/s':>8} {'p50':>8} "
+                          f"{'p95':>8} {'p99':>8} {'queries':>8}")
+        try:
+            for name in names:
+                stats = run_scenario(SCENARIOS[name], ctx,
+                                     iterations=options['iterations'],
+                                     warmup=options['warmup'])
+                results[name] = stats
+                self.stdout.write(
+                    f"{name:32} {stats['throughput_per_s']:8.1f} "
+                    f"{stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} "
+                    f"{stats['p99_ms']:8.2f} {stats['queries_mean']:8.1f}")
+        finally:
+            ctx.close()
+
+        run = {
+            'meta': {
+                'commit': commit,
+                'started_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+                'data': {
+                    'users': User.objects.count(),
+                    'recipes': Recipe.objects.count(),
+                    'recipe_ingredients': RecipeIngredient.objects.count(),
+                },
+            },
+            'results': results,
+        }
+        output = Path(options['output'] or DEFAULT_OUTPUT_DIR / (
+            f"{timezone.now():%Y%m%d-%H%M%S}-{commit}.json"))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(run, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if options['compare']:
+            self._compare(json.loads(Path(options['compare']).read_text()),
+                          run)
+
+    def _compare(self, before, after):
+        """Print the change in p50/p95 and queries per scenario."""
+        self.stdout.write(
+            f"\nCompared with {before['meta'].get('commit')} "
+            f"({before['meta'].get('started_at')}):")
+        for name, stats in after['results'].items():
+            old = before['results'].get(name)
+            if old is None:
+                self.stdout.write(f"{name:32} (new)")
+                continue
+            changes = []
+            for key in ('p50_ms', 'p95_ms'):
+                change = ((stats[key] - old[key]) / old[key] * 100
+                          if old[key] else 0)
+                changes.append(f"{key[:3]} {old[key]:.2f} -> "
+                               f"{stats[key]:.2f} ({change:+.0f}%)")
+            changes.append(f"queries {old['queries_mean']:g} -> "
+                           f"{stats['queries_mean']:g}")
+            self.stdout.write(f"{name:32} " + ' | '.join(changes))
@@ -0,0 +1,32 @@
+"""
+Compute the "similar recipes" shown on recipe pages (see recipes.similar).
+
+    python manage.py build_similar              # fold in changed recipes
+    python manage.py build_similar --rebuild    # recompute everything
+
+The fold_in_similar job keeps the neighbours current as recipes are
+edited; use --rebuild after first installing this, or after changing
+the weighting in recipes.similar.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.similar import changed_recipes, fold_in, rebuild_similar
+
+
+class Command(BaseCommand):
+    help = 'Compute the similar recipes shown on recipe pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='recompute every recipe, changed or not')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            def progress(done, total):
+                self.stderr.write(f"...{done}/{total} recipes")
+            count = rebuild_similar(progress)
+            self.stdout.write(self.style.SUCCESS(
+                f"Found similar recipes for {count} recipes"))
+            return
+        count = fold_in(changed_recipes())
+        self.stdout.write(self.style.SUCCESS(f"Folded in {count} recipes"))
@@ -0,0 +1,58 @@
+"""
+Check the recipe cards (the read model list pages use) against the
+recipes they come from, a chunk of recipes at a time.
+
+    python manage.py check_cards             # report only
+    python manage.py check_cards --fix       # rebuild the bad ones
+    python manage.py check_cards --rebuild   # rebuild every card
+
+Safe to run on a live site: each chunk is a handful of queries and only
+cards that are missing, stale or orphaned are rewritten.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.cards import CHUNK_SIZE, check_cards, refresh_cards
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Find (and optionally fix) recipe cards that have drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='rebuild the cards that are wrong')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='rebuild every card without comparing')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if options['rebuild']:
+            written, removed = refresh_cards(
+                Recipe.all_objects.order_by('id').values_list(
+                    'id', flat=True),
+                batch_size=chunk_size)
+            self.stdout.write(self.style.SUCCESS(
+                f"Rebuilt {written} cards, removed {removed}"))
+            return
+
+        def progress(report):
+            self.stdout.write(f"...{report['checked']} recipes checked")
+
+        report = check_cards(chunk_size=chunk_size, fix=options['fix'],
+                             progress=progress)
+        for problem in ('missing', 'stale', 'orphaned'):
+            ids = report[problem]
+            if ids:
+                sample = ', '.join(map(str, ids[:10]))
+                more = f" (+{len(ids) - 10} more)" if len(ids) > 10 else ''
+                self.stdout.write(f"{problem}: {len(ids)} - {sample}{more}")
+        bad = sum(len(report[problem])
+                  for problem in ('missing', 'stale', 'orphaned'))
+        if not bad:
+            message = f"All {report['checked']} recipes' cards are correct"
+        elif options['fix']:
+            message = f"Fixed {bad} cards"
+        else:
+            message = f"{bad} cards need fixing - run with --fix"
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,67 @@
+"""
+Report clusters of near-duplicate recipes.
+
+    python manage.py find_duplicates                 # use stored signatures
+    python manage.py find_duplicates --rebuild       # recompute them first
+    python manage.py find_duplicates --threshold 0.8 --json
+
+Signatures are normally kept up to date by the refresh_recipe job; use
+--rebuild after first installing this (or after changing the shingling
+in recipes.dedupe). The rebuild walks recipes in id order in batches, so
+it can be resumed with --start-after.
+"""
+import json
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from recipes.dedupe import (
+    DUPLICATE_THRESHOLD, find_duplicate_clusters, rebuild_signatures,
+)
+from recipes.models import Recipe
+from recipes.tasks import DUPLICATE_REPORT_KEY
+
+
+class Command(BaseCommand):
+    help = 'Find clusters of near-duplicate recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='recompute every signature first')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--start-after', type=int, default=0,
+                            help='resume a rebuild after this recipe id')
+        parser.add_argument('--threshold', type=float,
+                            default=DUPLICATE_THRESHOLD)
+        parser.add_argument('--json', action='store_true',
+                            help='print the clusters as JSON')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            def progress(scanned, last_id):
+                self.stderr.write(f"...{scanned} recipes signed "
+                                  f"(last id {last_id})")
+            rebuild_signatures(options['batch_size'],
+                               options['start_after'], progress)
+
+        clusters = find_duplicate_clusters(options['threshold'])
+        if options['threshold'] == DUPLICATE_THRESHOLD:
+            # Same settings as the admin page - share the result with it
+            cache.set(DUPLICATE_REPORT_KEY, clusters, None)
+
+        if options['json']:
+            self.stdout.write(json.dumps(clusters, indent=2))
+            return
+
+        titles = dict(Recipe.objects.filter(id__in={
+            recipe_id for cluster in clusters
+            for recipe_id in cluster['recipe_ids']
+        }).values_list('id', 'title'))
+        for cluster in clusters:
+            self.stdout.write(
+                f"{len(cluster['recipe_ids'])} recipes "
+                f"(similarity >= {cluster['similarity']:.2f}):")
+            for recipe_id in cluster['recipe_ids']:
+                self.stdout.write(f"  #{recipe_id} {titles.get(recipe_id)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(clusters)} duplicate clusters found"))
@@ -0,0 +1,71 @@
+"""
+Fill the database with realistic synthetic data for benchmarking.
+
+    python manage.py generate_data --scale 1          # 200 users, 1k recipes
+    python manage.py generate_data --scale 100        # 20k users, 100k recipes
+    python manage.py generate_data --users 50 --recipes 5000 --seed 7
+
+Rows are added alongside whatever is already there (synthetic users are
+named synthetic_<n>), so don't run this against production. The same
+--seed gives the same data. See recipes.synthetic for what is generated.
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.synthetic import SyntheticDataGenerator
+
+
+USERS_PER_SCALE = 200
+RECIPES_PER_SCALE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic users, recipes and activity for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1,
+                            help=f'{USERS_PER_SCALE} users and '
+                                 f'{RECIPES_PER_SCALE} recipes per unit')
+        parser.add_argument('--users', type=int,
+                            help='override the number of users')
+        parser.add_argument('--recipes', type=int,
+                            help='override the number of recipes')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='recipes inserted per transaction')
+        parser.add_argument('--skip-derived', action='store_true',
+                            help="don't compute nutrition and duplicate "
+                                 "signatures")
+        parser.add_argument('--force', action='store_true',
+                            help='allow running with DEBUG off')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['force']:
+            raise CommandError(
+                "DEBUG is off - this may be a production database. "
+                "Re-run with --force if you really mean it.")
+
+        users = options['users']
+        if users is None:
+            users = int(options['scale'] * USERS_PER_SCALE)
+        recipes = options['recipes']
+        if recipes is None:
+            recipes = int(options['scale'] * RECIPES_PER_SCALE)
+
+        started = time.perf_counter()
+        counts = SyntheticDataGenerator(
+            users, recipes, seed=options['seed'],
+            batch_size=options['batch_size'],
+            derived=not options['skip_derived'],
+            progress=self.stderr.write,
+        ).run()
+        elapsed = time.perf_counter() - started
+
+        total = sum(counts.values())
+        for name, count in counts.items():
+            self.stdout.write(f"  {name}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {total} rows in {elapsed:.1f}s "
+            f"({total / elapsed:.0f} rows/s)"))
@@ -0,0 +1,55 @@
+"""
+Render public recipe and tag pages to static files for anonymous
+visitors (see recipes.prerender). Needs PRERENDER_PAGES=True.
+
+    python manage.py prerender_pages            # only missing/stale pages
+    python manage.py prerender_pages --all      # every page
+    python manage.py prerender_pages --clear    # remove every stored page
+
+Incremental by default: a page is only rendered when it is missing or
+its recipe (or one of the tag's recipes) changed since it was written,
+and pages of recipes that were hidden or deleted are removed. Once the
+pages exist the refresh_recipe job keeps them current, so this is for
+the first run and for catching up after the worker was down.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes import prerender
+from recipes.models import Recipe
+from tags.models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Pre-render public recipe and tag pages to static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='render every page, changed or not')
+        parser.add_argument('--clear', action='store_true',
+                            help='remove every stored page')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            prerender.clear_pages()
+            self.stdout.write(self.style.SUCCESS("Removed every page"))
+            return
+        if not prerender.enabled():
+            raise CommandError("Set PRERENDER_PAGES=True first")
+
+        if options['all']:
+            recipe_ids = list(Recipe.objects.public().values_list(
+                'id', flat=True))
+            tag_ids = list(Tag.objects.values_list('id', flat=True))
+        else:
+            recipe_ids, tag_ids = prerender.stale_pages()
+        self.stdout.write(f"{len(recipe_ids)} recipe pages and "
+                          f"{len(tag_ids)} tag pages to render")
+
+        orphans = prerender.orphaned_pages()
+        for path in orphans:
+            prerender.remove_page(path)
+        written, _ = prerender.prerender_recipes(recipe_ids, with_tags=False)
+        tags_written, _ = prerender.prerender_tags(tag_ids)
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {written + tags_written} pages, "
+            f"removed {len(orphans)}"))
@@ -0,0 +1,182 @@
+"""
+Measure how long a fresh web process takes to start, and which imports
+that time goes on.
+
+    python manage.py profile_startup                 # 5 cold starts
+    python manage.py profile_startup --runs 20 --top 40
+    python manage.py profile_startup --project       # only our modules
+    python manage.py profile_startup --compare benchmarks/startup-<...>.json
+
+Every run is a new Python process that does what a gunicorn worker does
+before its first request: load the WSGI application and the URLconf
+(which imports every view). Timings are the median over --runs. One
+extra run with ``python -X importtime`` gives the per-module import
+cost, listed slowest first and summed per top-level package.
+
+Results are written as JSON next to the benchmark command's, so cold
+starts can be compared across commits.
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from .benchmark import DEFAULT_OUTPUT_DIR, _git_commit
+
+
+# Runs in the child process; prints its timings as JSON
+STARTUP_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import only_pans.wsgi
+application = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+ready = time.perf_counter()
+print(json.dumps({
+    'application_ms': (application - start) * 1000,
+    'ready_ms': (ready - start) * 1000,
+}))
+"""
+
+
+def parse_importtime(output):
+    """
+    Parse ``-X importtime`` output into [(module, self_us, cumulative_us)]
+    in import order.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # the header line
+        modules.append((parts[2].strip(), int(parts[0]), int(parts[1])))
+    return modules
+
+
+def project_packages():
+    """Top-level packages that belong to this project."""
+    base = Path(settings.BASE_DIR)
+    return {path.parent.name for path in base.glob('*/__init__.py')}
+
+
+class Command(BaseCommand):
+    help = 'Time cold starts and list the most expensive imports'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help='cold starts to time (default 5)')
+        parser.add_argument('--top', type=int, default=25,
+                            help='how many modules to list (default 25)')
+        parser.add_argument('--project', action='store_true',
+                            help="list only this project's modules")
+        parser.add_argument('--output',
+                            help='JSON file to write (default: benchmarks/'
+                                 'startup-<time>-<commit>.json)')
+        parser.add_argument('--compare',
+                            help='earlier results JSON to compare against')
+
+    def _start(self, *flags):
+        """Start a fresh interpreter; returns (stdout data, stderr, ms)."""
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, *flags, '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result.returncode:
+            raise CommandError(f"Startup failed:\n{result.stderr}")
+        return json.loads(result.stdout.splitlines()[-1]), result.stderr, \
+            elapsed
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be at least 1")
+
+        timings = defaultdict(list)
+        for run in range(options['runs']):
+            data, _, process_ms = self._start()
+            timings['process_ms'].append(process_ms)
+            for key, value in data.items():
+                timings[key].append(value)
+            self.stdout.write(f"  run {run + 1}: {process_ms:.0f} ms")
+        medians = {key: round(statistics.median(values), 1)
+                   for key, values in timings.items()}
+        self.stdout.write(
+            f"\nCold start (median of {options['runs']}): "
+            f"application loaded {medians['application_ms']:.0f} ms, "
+            f"ready to serve {medians['ready_ms']:.0f} ms, "
+            f"whole process {medians['process_ms']:.0f} ms")
+
+        _, stderr, _ = self._start('-X', 'importtime')
+        modules = parse_importtime(stderr)
+        ours = project_packages()
+        per_package = defaultdict(int)
+        for name, self_us, _ in modules:
+            per_package[name.split('.')[0]] += self_us
+
+        listed = [module for module in modules
+                  if not options['project']
+                  or module[0].split('.')[0] in ours]
+        listed.sort(key=lambda module: -module[2])
+        self.stdout.write(f"\n{'cumulative':>10} {'self':>8}  module")
+        for name, self_us, cumulative_us in listed[:options['top']]:
+            self.stdout.write(f"{cumulative_us / 1000:8.1f}ms "
+                              f"{self_us / 1000:6.1f}ms  {name}")
+
+        packages = sorted(per_package.items(), key=lambda item: -item[1])
+        self.stdout.write(f"\n{'total':>10}  package")
+        for package, self_us in packages[:options['top']]:
+            marker = '  *' if package in ours else ''
+            self.stdout.write(f"{self_us / 1000:8.1f}ms  {package}{marker}")
+        self.stdout.write("(* this project)")
+
+        commit = _git_commit()
+        result = {
+            'meta': {
+                'commit': commit,
+                'started_at': timezone.now().isoformat(),
+                'python': sys.version.split()[0],
+                'runs': options['runs'],
+            },
+            'cold_start': medians,
+            'packages_ms': {package: round(self_us / 1000, 2)
+                            for package, self_us in packages},
+        }
+        output = Path(options['output'] or DEFAULT_OUTPUT_DIR / (
+            f"startup-{timezone.now():%Y%m%d-%H%M%S}-{commit}.json"))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(result, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+        if options['compare']:
+            self._compare(json.loads(Path(options['compare']).read_text()),
+                          result)
+
+    def _compare(self, before, after):
+        """Print the change in cold start times and per-package cost."""
+        self.stdout.write(f"\nCompared with {before['meta'].get('commit')} "
+                          f"({before['meta'].get('started_at')}):")
+        for key, value in after['cold_start'].items():
+            old = before['cold_start'].get(key)
+            if old:
+                self.stdout.write(f"  {key:16} {old:8.1f} -> {value:8.1f} "
+                                  f"({(value - old) / old * 100:+.0f}%)")
+        old_packages = before.get('packages_ms', {})
+        changed = sorted(
+            set(old_packages) | set(after['packages_ms']),
+            key=lambda name: -abs(after['packages_ms'].get(name, 0)
+                                  - old_packages.get(name, 0)))
+        for package in changed[:10]:
+            old = old_packages.get(package, 0)
+            new = after['packages_ms'].get(package, 0)
+            if old != new:
+                self.stdout.write(f"  {package:16} {old:8.1f} -> {new:8.1f}")
@@ -0,0 +1,31 @@
+"""
+Really delete soft-deleted recipes and users.
+
+    python manage.py purge_deleted               # deleted over 7 days ago
+    python manage.py purge_deleted --older-than-days 0
+
+Normally the purge_deleted background job does this once the grace
+period is up; this command is for catching up by hand. See
+recipes.deletion for how the purge keeps batches small.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from recipes.deletion import PURGE_GRACE, purge_deleted
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted recipes and users past the grace period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=float,
+                            default=PURGE_GRACE.days,
+                            help='only purge rows deleted this long ago')
+
+    def handle(self, *args, **options):
+        counts = purge_deleted(timedelta(days=options['older_than_days']))
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"  {label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {sum(counts.values())} rows"))
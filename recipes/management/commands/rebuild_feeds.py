@@ -0,0 +1,23 @@
+"""
+Materialise the personalised feed of every recently active user.
+
+    python manage.py rebuild_feeds
+
+New recipes are slotted into existing feeds incrementally by the
+fan_out_recipe job, so this is only needed after a deploy that changes
+the ranking, or to warm an empty cache.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.feed import active_user_ids, rebuild_user_feed
+
+
+class Command(BaseCommand):
+    help = "Rebuild cached personalised feeds for active users"
+
+    def handle(self, *args, **options):
+        count = 0
+        for user_id in active_user_ids().iterator():
+            rebuild_user_feed(user_id)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} feeds"))
@@ -0,0 +1,37 @@
+"""
+Rebuild the "top cooks" leaderboards (see recipes.authors).
+
+    python manage.py rebuild_leaderboards            # boards only
+    python manage.py rebuild_leaderboards --stats    # recount authors first
+
+The refresh_leaderboards job rebuilds the boards after stats change, but
+the last-30-days board also moves as old activity drops out of the
+window, so run this daily (from cron or similar). Use --stats after
+first installing this, to fill in every author's stats.
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.authors import rebuild_leaderboards, refresh_author_stats
+from recipes.models import Recipe
+
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the "top cooks" leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stats', action='store_true',
+                            help="recount every author's stats first")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            user_ids = list(Recipe.objects.order_by('user_id')
+                            .values_list('user_id', flat=True).distinct())
+            for start in range(0, len(user_ids), CHUNK_SIZE):
+                refresh_author_stats(user_ids[start:start + CHUNK_SIZE])
+            self.stdout.write(f"Recounted {len(user_ids)} authors")
+        sizes = rebuild_leaderboards()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f"{board}: {entries} entries"
+                      for board, entries in sizes.items())))
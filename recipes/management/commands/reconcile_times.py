@@ -0,0 +1,67 @@
+"""
+Check recipe step times against total times, and assign time tags.
+
+    python manage.py reconcile_times               # list mismatches
+    python manage.py reconcile_times --fix         # raise totals that
+                                                   # are shorter than
+                                                   # their steps
+    python manage.py reconcile_times --tags        # (re)assign every
+                                                   # recipe's time tags
+
+Time tags are the tags with tag_type 'time' whose names read as a limit,
+e.g. "Under 30 min" or "Over 1 hour" (see recipes.timing).
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.timing import (
+    CHUNK_SIZE, STEP_TOLERANCE, assign_time_tags, fix_understated_times,
+    step_time_mismatches, time_tag_ranges,
+)
+from tags.models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Reconcile step times with total times and assign time tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='raise cook_time where the steps take '
+                                 'longer than the whole recipe')
+        parser.add_argument('--tolerance', type=float,
+                            default=STEP_TOLERANCE,
+                            help='how far short fully timed steps may fall '
+                                 f'(default {STEP_TOLERANCE})')
+        parser.add_argument('--tags', action='store_true',
+                            help='assign time tags to every recipe')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        mismatches = list(step_time_mismatches(options['tolerance']))
+        understated = []
+        for row in mismatches:
+            if row['step_minutes'] > row['total_minutes']:
+                understated.append(row['id'])
+                problem = 'steps take longer than the total'
+            else:
+                problem = 'steps fall short of the total'
+            self.stdout.write(
+                f"#{row['id']} {row['title']}: total "
+                f"{row['total_minutes']} min, steps {row['step_minutes']} "
+                f"min ({problem})")
+        message = f"{len(mismatches)} recipes with mismatched step times"
+        if options['fix'] and understated:
+            fixed = fix_understated_times(understated)
+            message += f", raised the total of {fixed}"
+        self.stdout.write(self.style.SUCCESS(message))
+
+        if options['tags']:
+            names = Tag.objects.filter(
+                id__in=list(time_tag_ranges())).values_list('name', flat=True)
+            if not names:
+                self.stdout.write("No time tags with a limit in their name")
+                return
+            self.stdout.write(f"Time tags: {', '.join(sorted(names))}")
+            added, removed = assign_time_tags(
+                chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Time tags: {added} added, {removed} removed"))
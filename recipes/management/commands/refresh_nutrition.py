@@ -0,0 +1,26 @@
+"""
+Recompute RecipeNutrition for every recipe (or just some).
+
+    python manage.py refresh_nutrition
+    python manage.py refresh_nutrition --recipe 12 --recipe 15
+"""
+from django.core.management.base import BaseCommand
+
+from recipes.nutrition import refresh_nutrition
+
+
+class Command(BaseCommand):
+    help = 'Recompute per-serving recipe nutrition from ingredient data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipe', type=int, action='append',
+                            dest='recipe_ids',
+                            help='only refresh this recipe id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        written = refresh_nutrition(options['recipe_ids'],
+                                    batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed nutrition for {written} recipes"
+        ))
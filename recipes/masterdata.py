@@ -0,0 +1,168 @@
+"""
+Per-process cache of the small, rarely changed "master" tables - tags
+and ingredients - so showing a tag's colour or an ingredient's name is a
+dict lookup instead of a join.
+
+Each process keeps the whole table in memory as read-only records,
+indexed by id and by (lower-case) name, with an ingredient's
+dietary_flags already parsed. It is only trusted while the table's
+version stamp matches:
+
+- every write to a Tag or Ingredient bumps the table's version in the
+  shared cache (bump_version(), from the signal handlers)
+- a process reads the stamp at most once per request - the first time
+  the table is used - and reloads the table if it moved on
+
+So after an admin edit every worker picks the change up by its next
+request that needs the table. Outside requests (the job worker, the
+shell) the stamp is read on every use.
+
+The version stamps are shared with search.fuzzy, whose in-process
+trigram indexes are rebuilt the same way, and with the meal planner's
+nutrition catalogue (recipes.meal_plan).
+
+Writes that skip signals - bulk_create(), bulk_update(),
+queryset.update(), raw SQL - must call bump_version() straight after,
+or processes that already hold the table keep serving the old one.
+"""
+import threading
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+from tags.models import Tag
+from .dietary import flags_to_mask
+from .models import Ingredient
+
+
+# ---------------------------------------------------------------------------
+# Version stamps
+# ---------------------------------------------------------------------------
+
+_local = threading.local()
+
+
+def version_key(model):
+    """Cache key holding the current version of a model's data."""
+    return f'version:{model._meta.label_lower}'
+
+
+def current_version(model):
+    return cache.get(version_key(model), 0)
+
+
+def bump_version(model):
+    """Mark every process's in-memory copy of ``model`` as stale."""
+    key = version_key(model)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:  # expired between add() and incr()
+            cache.add(key, 1, None)
+    # Later lookups in this same request must see the change too
+    getattr(_local, 'checked', set()).discard(model)
+
+
+def request_started():
+    """Called at the start of each request: check stamps again once."""
+    _local.checked = set()
+
+
+def request_finished():
+    """Outside a request every lookup checks the stamp."""
+    _local.__dict__.pop('checked', None)
+
+
+# ---------------------------------------------------------------------------
+# Cached tables
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class TagInfo:
+    id: int
+    name: str
+    tag_type: str
+    color: str
+    icon_url: str
+
+    def as_dict(self):
+        """The shape recipe cards and the API use for a tag."""
+        return {'id': self.id, 'name': self.name,
+                'tag_type': self.tag_type, 'color': self.color}
+
+
+@dataclass(frozen=True)
+class IngredientInfo:
+    id: int
+    name: str
+    category: str
+    common_unit: str
+    dietary_flags: tuple
+    dietary_mask: int
+
+
+@dataclass(frozen=True)
+class Lookup:
+    """A loaded table: ``by_id`` and ``by_name`` (lower-case) dicts."""
+    version: int
+    by_id: dict
+    by_name: dict
+
+
+def _load_tags():
+    return [
+        TagInfo(id=row['id'], name=row['name'], tag_type=row['tag_type'],
+                color=row['color'], icon_url=row['icon_url'] or '')
+        for row in Tag.objects.values('id', 'name', 'tag_type', 'color',
+                                      'icon_url')
+    ]
+
+
+def _load_ingredients():
+    infos = []
+    for row in Ingredient.objects.values('id', 'name', 'category',
+                                         'common_unit', 'dietary_flags'):
+        flags = tuple(
+            Ingredient(dietary_flags=row['dietary_flags']).get_dietary_flags())
+        infos.append(IngredientInfo(
+            id=row['id'], name=row['name'], category=row['category'],
+            common_unit=row['common_unit'], dietary_flags=flags,
+            dietary_mask=flags_to_mask(flags)))
+    return infos
+
+
+_loaders = {Tag: _load_tags, Ingredient: _load_ingredients}
+_tables = {}
+_lock = threading.Lock()
+
+
+def _table(model):
+    """This process's copy of ``model``'s table, reloaded if stale."""
+    table = _tables.get(model)
+    checked = getattr(_local, 'checked', None)
+    if table is not None and checked is not None and model in checked:
+        return table
+    version = current_version(model)
+    if table is None or table.version != version:
+        with _lock:
+            table = _tables.get(model)
+            if table is None or table.version != version:
+                records = _loaders[model]()
+                table = _tables[model] = Lookup(
+                    version=version,
+                    by_id={record.id: record for record in records},
+                    by_name={record.name.lower(): record
+                             for record in records})
+    if checked is not None:
+        checked.add(model)
+    return table
+
+
+def tags():
+    """Every tag: ``tags().by_id[3]``, ``tags().by_name['italian']``."""
+    return _table(Tag)
+
+
+def ingredients():
+    """Every ingredient, with dietary_flags parsed and as a bitmask."""
+    return _table(Ingredient)
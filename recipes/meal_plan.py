@@ -0,0 +1,259 @@
+"""
+Nutrition-target meal plan generator.
+
+The catalogue of per-serving nutrient vectors (from RecipeNutrition) is
+loaded once per process into contiguous numpy arrays:
+
+    recipe_ids  int64[n]
+    nutrients   float64[n, 5]   calories, protein, carbs, fat, sodium
+    masks       int64[n]        dietary flag bitmask (recipes.dietary)
+
+Planning is a greedy fill followed by a local-improvement pass. Every
+step scores the WHOLE catalogue with a few vectorised numpy operations,
+so a week of 21 meals over 100k recipes takes well under a second.
+"""
+import threading
+
+import numpy as np
+
+from .dietary import excluded_mask
+from .masterdata import current_version
+from .models import Recipe, RecipeNutrition
+from .nutrition import NUTRIENTS
+
+
+CALORIES, PROTEIN, CARBS, FAT, SODIUM = range(len(NUTRIENTS))
+# Nutrients we try to hit exactly - sodium is only an upper limit
+TARGETED = [CALORIES, PROTEIN, CARBS, FAT]
+# Calories matter most, then protein
+WEIGHTS = np.array([4.0, 2.0, 1.0, 1.0])
+
+MIN_SERVINGS = 0.5
+MAX_SERVINGS = 3.0
+SERVING_STEP = 0.25
+IMPROVEMENT_PASSES = 2
+
+DEFAULT_TARGETS = {
+    'calories': 2000,
+    'protein_g': 75,
+    'carbs_g': 250,
+    'fat_g': 70,
+    'sodium_mg': 2300,
+}
+
+
+class NutritionCatalogue:
+    """
+    Every plannable recipe's per-serving nutrients held in numpy arrays.
+    """
+
+    def __init__(self, recipe_ids, nutrients, masks, version=None):
+        self.recipe_ids = np.ascontiguousarray(recipe_ids, dtype=np.int64)
+        self.nutrients = np.ascontiguousarray(nutrients, dtype=np.float64)
+        self.masks = np.ascontiguousarray(masks, dtype=np.int64)
+        self.version = version
+
+    def __len__(self):
+        return len(self.recipe_ids)
+
+    @classmethod
+    def from_database(cls, version=None):
+        """Load complete nutrition rows for public recipes."""
+        rows = RecipeNutrition.objects.filter(
+            recipe__is_public=True, recipe__is_deleted=False,
+            is_complete=True, calories__gt=0,
+        ).order_by('recipe_id').values_list(
+            'recipe_id', *NUTRIENTS, 'dietary_mask')
+        data = np.array(list(rows), dtype=np.float64).reshape(
+            -1, len(NUTRIENTS) + 2)
+        return cls(data[:, 0], data[:, 1:-1], data[:, -1], version=version)
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def _catalogue_version():
+    """
+    The shared version stamps (see recipes.masterdata) of the nutrition
+    rows - bumped by refresh_nutrition() - and of the recipes, which
+    covers recipes being hidden, deleted or restored. Two cache reads,
+    no query.
+    """
+    return (current_version(RecipeNutrition), current_version(Recipe))
+
+
+def get_catalogue():
+    """
+    Return the process-wide catalogue, reloading it only when
+    RecipeNutrition has changed since it was built.
+    """
+    global _catalogue
+    version = _catalogue_version()
+    if _catalogue is None or _catalogue.version != version:
+        with _catalogue_lock:
+            if _catalogue is None or _catalogue.version != version:
+                _catalogue = NutritionCatalogue.from_database(version)
+    return _catalogue
+
+
+def _target_vector(targets):
+    merged = {**DEFAULT_TARGETS, **{k: v for k, v in targets.items() if v}}
+    return np.array([float(merged[name]) for name in NUTRIENTS])
+
+
+def _servings_for(calories, wanted_calories):
+    """Servings that best hit the calorie goal, in quarter steps."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        servings = wanted_calories / calories
+    servings = np.round(servings / SERVING_STEP) * SERVING_STEP
+    return np.clip(np.nan_to_num(servings, nan=1.0), MIN_SERVINGS,
+                   MAX_SERVINGS)
+
+
+def _score_candidates(nutrients, wanted, sodium_left, daily):
+    """
+    Score every candidate for one meal slot (lower is better).
+
+    ``wanted`` is what this meal should ideally add; the score is the
+    weighted squared relative miss on calories/protein/carbs/fat plus a
+    penalty for any sodium beyond what's left of today's allowance.
+    Returns (scores, servings).
+    """
+    servings = _servings_for(nutrients[:, CALORIES], wanted[CALORIES])
+    provided = nutrients * servings[:, None]
+    miss = (provided[:, TARGETED] - wanted[TARGETED]) / daily[TARGETED]
+    scores = (miss * miss) @ WEIGHTS
+    over = np.maximum(provided[:, SODIUM] - sodium_left, 0) / daily[SODIUM]
+    return scores + 4.0 * over * over, servings
+
+
+def _day_error(totals, daily):
+    miss = (totals[TARGETED] - daily[TARGETED]) / daily[TARGETED]
+    over = max(totals[SODIUM] - daily[SODIUM], 0) / daily[SODIUM]
+    return float((miss * miss) @ WEIGHTS + 4.0 * over * over)
+
+
+def _plan_day(nutrients, daily, meals_per_day, used, rng):
+    """Greedy fill of one day, then try to improve each slot in turn."""
+    picks = []  # (catalogue index, servings)
+    totals = np.zeros(len(NUTRIENTS))
+
+    for slot in range(meals_per_day):
+        wanted = (daily - totals) / (meals_per_day - slot)
+        scores, servings = _score_candidates(
+            nutrients, wanted, daily[SODIUM] - totals[SODIUM], daily)
+        scores[used] = np.inf
+        index = _pick(scores, rng)
+        picks.append((index, servings[index]))
+        used[index] = True
+        totals += nutrients[index] * servings[index]
+
+    for _ in range(IMPROVEMENT_PASSES):
+        improved = False
+        for slot, (current, current_servings) in enumerate(picks):
+            others = totals - nutrients[current] * current_servings
+            scores, servings = _score_candidates(
+                nutrients, daily - others, daily[SODIUM] - others[SODIUM],
+                daily)
+            scores[used] = np.inf
+            index = int(np.argmin(scores))
+            candidate = others + nutrients[index] * servings[index]
+            if (np.isfinite(scores[index])
+                    and _day_error(candidate, daily) < _day_error(totals,
+                                                                  daily)):
+                used[current] = False
+                used[index] = True
+                picks[slot] = (index, servings[index])
+                totals = candidate
+                improved = True
+        if not improved:
+            break
+    return picks, totals
+
+
+def _pick(scores, rng, top_k=5):
+    """
+    Best candidate, or - when an rng is given - a random one among the
+    best few, so repeated plans don't all look the same.
+    """
+    if rng is None:
+        return int(np.argmin(scores))
+    top_k = min(top_k, int(np.isfinite(scores).sum()) or 1)
+    best = np.argpartition(scores, top_k - 1)[:top_k]
+    return int(rng.choice(best))
+
+
+def quality_report(days, daily):
+    """
+    How close the plan gets: per-day % deviation from each target and a
+    summary across the whole plan.
+    """
+    deviations = []
+    for day in days:
+        totals = np.array([day['totals'][name] for name in NUTRIENTS])
+        deviation = (totals - daily) / daily * 100
+        day['deviation_pct'] = {
+            NUTRIENTS[i]: round(float(deviation[i]), 1) for i in TARGETED
+        }
+        day['sodium_ok'] = bool(totals[SODIUM] <= daily[SODIUM])
+        deviations.append(deviation)
+
+    deviations = np.abs(np.array(deviations))
+    return {
+        'mean_abs_deviation_pct': {
+            NUTRIENTS[i]: round(float(deviations[:, i].mean()), 1)
+            for i in TARGETED
+        },
+        'max_calorie_deviation_pct':
+            round(float(deviations[:, CALORIES].max()), 1),
+        'days_within_10pct_calories':
+            int((deviations[:, CALORIES] <= 10).sum()),
+        'days_within_sodium_limit':
+            sum(1 for day in days if day['sodium_ok']),
+    }
+
+
+def generate_meal_plan(targets=None, preferences=(), days=7,
+                       meals_per_day=3, catalogue=None, seed=None):
+    """
+    Build a meal plan that fits daily nutrition targets.
+
+    - targets: daily {'calories', 'protein_g', 'carbs_g', 'fat_g',
+      'sodium_mg'}; anything missing falls back to DEFAULT_TARGETS and
+      sodium is treated as a limit, not a goal
+    - preferences: UserProfile.get_dietary_preferences() style list
+    - seed: pass an int for a varied (but repeatable) plan; None always
+      returns the single best plan
+
+    Returns {'days': [...], 'report': {...}} or None if fewer recipes fit
+    the preferences than there are meals to fill.
+    """
+    catalogue = catalogue if catalogue is not None else get_catalogue()
+    daily = _target_vector(targets or {})
+
+    allowed = (catalogue.masks & excluded_mask(preferences)) == 0
+    recipe_ids = catalogue.recipe_ids[allowed]
+    nutrients = catalogue.nutrients[allowed]
+    if len(recipe_ids) < days * meals_per_day:
+        return None
+
+    rng = np.random.default_rng(seed) if seed is not None else None
+    used = np.zeros(len(recipe_ids), dtype=bool)
+    plan = []
+    for day_number in range(1, days + 1):
+        picks, totals = _plan_day(nutrients, daily, meals_per_day, used, rng)
+        plan.append({
+            'day': day_number,
+            'meals': [{
+                'recipe_id': int(recipe_ids[index]),
+                'servings': float(servings),
+                'nutrition': {
+                    name: round(float(value), 1) for name, value
+                    in zip(NUTRIENTS, nutrients[index] * servings)
+                },
+            } for index, servings in picks],
+            'totals': {name: round(float(value), 1)
+                       for name, value in zip(NUTRIENTS, totals)},
+        })
+    return {'days': plan, 'report': quality_report(plan, daily)}
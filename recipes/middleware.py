@@ -0,0 +1,46 @@
+"""
+Serve pre-rendered pages (see recipes.prerender) to anonymous visitors.
+
+Sits straight after WhiteNoiseMiddleware, before sessions are loaded.
+A GET or HEAD without a query string and without a session or messages
+cookie can't be from a logged-in user and can't be personalised, so if
+a pre-rendered file exists for its path it is served by WhiteNoise's
+file responder - picking the gzip or brotli copy the browser accepts
+and answering If-Modified-Since / If-None-Match with 304. Everything
+else falls through to the normal views.
+"""
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.base import WhiteNoise
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .prerender import enabled
+
+
+# Browsers may keep a page this long before checking it again
+PAGE_MAX_AGE = 60
+
+
+class PrerenderedPageMiddleware:
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookies = {settings.SESSION_COOKIE_NAME, 'messages'}
+        # Looks files up on each request (autorefresh), as pages are
+        # written while the site is running
+        self.pages = WhiteNoise(None, autorefresh=True, index_file=True,
+                                max_age=PAGE_MAX_AGE,
+                                allow_all_origins=False)
+        self.pages.add_files(settings.PRERENDER_ROOT)
+
+    def __call__(self, request):
+        if (request.method in ('GET', 'HEAD')
+                and request.path_info.endswith('/')
+                and not request.META.get('QUERY_STRING')
+                and not self.cookies & request.COOKIES.keys()):
+            page = self.pages.find_file(request.path_info)
+            if page is not None:
+                return WhiteNoiseMiddleware.serve(page, request)
+        return self.get_response(request)
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_ingredient_fibre_per_100g_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['is_public', 'updated_at'], name='recipes_rec_is_publ_3d0e59_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_recipes_rec_is_publ_3d0e59_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeNutrition',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='recipes.recipe')),
+                ('calories', models.FloatField(default=0)),
+                ('protein_g', models.FloatField(default=0)),
+                ('carbs_g', models.FloatField(default=0)),
+                ('fat_g', models.FloatField(default=0)),
+                ('sodium_mg', models.FloatField(default=0)),
+                ('dietary_mask', models.IntegerField(default=0, help_text='bitmask of the dietary flags the ingredients contain')),
+                ('is_complete', models.BooleanField(default=True, help_text='false if some ingredients could not be converted to grams')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Recipe nutrition',
+            },
+        ),
+    ]
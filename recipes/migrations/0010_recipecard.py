@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_deleted_at_recipe_is_deleted'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeCard',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='card', serialize=False, to='recipes.recipe')),
+                ('author', models.CharField(help_text="author's username", max_length=150)),
+                ('title', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('image_url', models.CharField(blank=True, max_length=500)),
+                ('total_time', models.IntegerField(help_text='minutes')),
+                ('difficulty_level', models.CharField(max_length=20)),
+                ('average_rating', models.FloatField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('like_count', models.IntegerField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('primary_tags', models.TextField(blank=True, help_text='JSON array of the first few tags: [{"id": 1, "name": "Italian", "tag_type": "cuisine", "color": "#ff0000"}]')),
+                ('created_at', models.DateTimeField()),
+                ('source_updated_at', models.DateTimeField()),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-recipe'], name='recipes_rec_user_id_668e1d_idx'), models.Index(fields=['refreshed_at'], name='recipes_rec_refresh_1c8c50_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:32
+
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipecard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='total_minutes',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('prep_time'), '+', models.F('cook_time')), output_field=models.IntegerField(), verbose_name='total time'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['is_public', 'total_minutes'], name='recipes_rec_is_publ_18ef58_idx'),
+        ),
+    ]
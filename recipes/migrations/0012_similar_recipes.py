@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_total_minutes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeTermVector',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='term_vector', serialize=False, to='recipes.recipe')),
+                ('terms', models.BinaryField(help_text='packed uint32 hashed term ids')),
+                ('counts', models.BinaryField(help_text='packed float32 weighted counts')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='cosine similarity, 0 to 1')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_recipes', to='recipes.recipe')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_of', to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipe', '-score'], name='recipes_sim_recipe__f61591_idx')],
+                'constraints': [models.UniqueConstraint(fields=('recipe', 'similar'), name='one_score_per_recipe_pair')],
+            },
+        ),
+    ]
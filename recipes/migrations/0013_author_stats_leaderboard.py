@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0012_similar_recipes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='author_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('public_recipe_count', models.IntegerField(default=0)),
+                ('like_count', models.IntegerField(default=0, help_text='likes received')),
+                ('rating_count', models.IntegerField(default=0, help_text='ratings received')),
+                ('average_rating', models.FloatField(default=0)),
+                ('comment_count', models.IntegerField(default=0, help_text='comments received')),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(choices=[('all_time', 'All time'), ('last_30_days', 'Last 30 days')], max_length=20)),
+                ('rank', models.PositiveIntegerField()),
+                ('author', models.CharField(help_text="author's username", max_length=150)),
+                ('score', models.IntegerField(help_text='likes + ratings + comments received')),
+                ('like_count', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('average_rating', models.FloatField(default=0)),
+                ('comment_count', models.IntegerField(default=0)),
+                ('built_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('board', 'rank'), name='one_author_per_rank')],
+            },
+        ),
+    ]
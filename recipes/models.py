@@ -1,9 +1,39 @@
 from django.contrib.auth.models import User
 from cloudinary.models import CloudinaryField
 from django.db import models
+from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 import json
 
+from .quantities import QUANTITY_FIELDS, canonicalize_row
+
+
+class RecipeQuerySet(models.QuerySet):
+    """
+    Shared filters for recipes so every view agrees on what is visible.
+    """
+
+    def public(self):
+        """Recipes anyone is allowed to see"""
+        return self.filter(is_public=True, is_deleted=False)
+
+    def quicker_than(self, minutes):
+        """Recipes ready in at most ``minutes`` (prep + cook)"""
+        return self.filter(total_minutes__lte=minutes)
+
+    def quickest_first(self):
+        return self.order_by('total_minutes', 'id')
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """
+    The default manager hides soft-deleted recipes, so they disappear
+    everywhere at once. Use Recipe.all_objects to see them too.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
 
 class Recipe(models.Model):
     """
@@ -26,6 +56,14 @@ class Recipe(models.Model):
         help_text='minutes',
         validators=[MinValueValidator(0)]
     )
+    # prep_time + cook_time, worked out by the database itself so "under
+    # 30 minutes" and "quickest first" are plain indexed SQL
+    total_minutes = models.GeneratedField(
+        expression=models.F('prep_time') + models.F('cook_time'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+        verbose_name='total time',
+    )
     base_servings = models.IntegerField(
         help_text='original recipe servings - used for scaling calculations'
     )
@@ -36,10 +74,28 @@ class Recipe(models.Model):
                                     help_text='true/false for privacy')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Soft delete: hidden straight away, really removed later by a
+    # background purge (see recipes.deletion)
+    is_deleted = models.BooleanField(default=False, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = RecipeManager()
+    all_objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # "what changed most recently" for conditional GET and feeds
+            models.Index(fields=['is_public', 'updated_at']),
+            # time filters and quickest-first sorting
+            models.Index(fields=['is_public', 'total_minutes']),
+        ]
 
     def __str__(self):
         return self.title
 
+    def get_absolute_url(self):
+        return reverse('recipe_detail', args=[self.pk])
+
     def total_time(self):
         """Calculate total cooking time"""
         return self.prep_time + self.cook_time
@@ -156,12 +212,50 @@ class RecipeIngredient(models.Model):
                              help_text='optional: sifted, room temp, etc')
     display_order = models.IntegerField(help_text='order in ingredient list')
 
+    # Canonical amounts worked out from the quantity on every save
+    # (see recipes.quantities) - blank when they can't be worked out
+    quantity_grams = models.DecimalField(max_digits=12,
+                                         decimal_places=3,
+                                         null=True,
+                                         blank=True,
+                                         editable=False)
+    quantity_ml = models.DecimalField(max_digits=12,
+                                      decimal_places=3,
+                                      null=True,
+                                      blank=True,
+                                      editable=False)
+
     class Meta:
         ordering = ['display_order']
 
     def __str__(self):
         return f"{self.quantity_display} {self.ingredient.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        row = super().from_db(db, field_names, values)
+        # What was stored, so save() can tell which side was edited
+        row._stored_quantity = {
+            name: value for name, value in zip(field_names, values)
+            if name in QUANTITY_FIELDS}
+        return row
+
+    def save(self, *args, **kwargs):
+        """
+        Keep quantity_display, quantity_numeric and unit consistent and
+        store the canonical grams/ml before writing.
+        """
+        stored = getattr(self, '_stored_quantity', None)
+        if stored is not None and len(stored) < len(QUANTITY_FIELDS):
+            stored = None  # deferred fields - treat the row as new
+        fields = canonicalize_row(self, self.ingredient.name, stored)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = (set(kwargs['update_fields'])
+                                       | set(fields))
+        super().save(*args, **kwargs)
+        self._stored_quantity = {name: getattr(self, name)
+                                 for name in QUANTITY_FIELDS}
+
 
 class RecipeStep(models.Model):
     """
@@ -203,3 +297,242 @@ class StepImage(models.Model):
 
     def __str__(self):
         return f"Image for {self.step}"
+
+
+class RecipeNutrition(models.Model):
+    """
+    Per-serving nutrition for a recipe, worked out from its ingredients.
+    This is derived data - it is rebuilt by recipes.nutrition and never
+    edited by hand.
+    """
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='nutrition')
+    calories = models.FloatField(default=0)
+    protein_g = models.FloatField(default=0)
+    carbs_g = models.FloatField(default=0)
+    fat_g = models.FloatField(default=0)
+    sodium_mg = models.FloatField(default=0)
+    dietary_mask = models.IntegerField(
+        default=0,
+        help_text='bitmask of the dietary flags the ingredients contain'
+    )
+    is_complete = models.BooleanField(
+        default=True,
+        help_text='false if some ingredients could not be converted to grams'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Recipe nutrition"
+
+    def __str__(self):
+        return f"{self.recipe_id}: {self.calories:.0f} kcal per serving"
+
+
+class RecipeSignature(models.Model):
+    """
+    MinHash signature of a recipe's ingredients, title and steps, used to
+    spot near-duplicate recipes (see recipes.dedupe). Derived data.
+    """
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='signature')
+    minhash = models.BinaryField(help_text='packed uint32 MinHash values')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Signature for recipe {self.recipe_id}"
+
+
+class RecipeLSHBucket(models.Model):
+    """
+    One locality-sensitive-hashing bucket per band of a recipe's
+    signature. Recipes sharing any (band, bucket) pair are duplicate
+    candidates, found with an index lookup instead of comparing every pair.
+    """
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='lsh_buckets')
+    band = models.PositiveSmallIntegerField()
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'band'],
+                                    name='one_bucket_per_recipe_band'),
+        ]
+        indexes = [
+            models.Index(fields=['band', 'bucket']),
+        ]
+
+    def __str__(self):
+        return f"Recipe {self.recipe_id} band {self.band}"
+
+
+class RecipeCard(models.Model):
+    """
+    Everything a recipe card in a list or grid shows, in one row per
+    public recipe - title, image, times, rating and counts, the first few
+    tags and the author's name - so a page of cards is one indexed query
+    instead of joins and aggregates across five apps.
+
+    Derived data, kept up to date by recipes.cards (from the same
+    background refresh as nutrition). `manage.py check_cards` finds and
+    fixes any rows that have drifted.
+    """
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='card')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    author = models.CharField(max_length=150, help_text="author's username")
+    title = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    image_url = models.CharField(max_length=500, blank=True)
+    total_time = models.IntegerField(help_text='minutes')
+    difficulty_level = models.CharField(max_length=20)
+    average_rating = models.FloatField(default=0)
+    rating_count = models.IntegerField(default=0)
+    like_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    primary_tags = models.TextField(
+        blank=True,
+        help_text='JSON array of the first few tags: '
+                  '[{"id": 1, "name": "Italian", "tag_type": "cuisine", '
+                  '"color": "#ff0000"}]'
+    )
+    # the recipe's own timestamps, copied when the card was built
+    created_at = models.DateTimeField()
+    source_updated_at = models.DateTimeField()
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # a user's recipes, newest first (profile pages)
+            models.Index(fields=['user', '-recipe']),
+            # newest card change, for list ETags
+            models.Index(fields=['refreshed_at']),
+        ]
+
+    def __str__(self):
+        return f"Card for {self.title}"
+
+    def get_primary_tags(self):
+        """Convert JSON string to Python list"""
+        if self.primary_tags:
+            try:
+                return json.loads(self.primary_tags)
+            except json.JSONDecodeError:
+                return []
+        return []
+
+
+class RecipeTermVector(models.Model):
+    """
+    The words of a recipe's title, description, steps, ingredients and
+    tags, counted - one row of the TF-IDF model behind "similar recipes"
+    (see recipes.similar). Derived data.
+    """
+    recipe = models.OneToOneField(Recipe,
+                                  on_delete=models.CASCADE,
+                                  primary_key=True,
+                                  related_name='term_vector')
+    terms = models.BinaryField(help_text='packed uint32 hashed term ids')
+    counts = models.BinaryField(help_text='packed float32 weighted counts')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Term vector for recipe {self.recipe_id}"
+
+
+class SimilarRecipe(models.Model):
+    """
+    One of a recipe's most similar recipes by TF-IDF cosine similarity,
+    precomputed so the "similar recipes" panel is one indexed lookup.
+    """
+    recipe = models.ForeignKey(Recipe,
+                               on_delete=models.CASCADE,
+                               related_name='similar_recipes')
+    similar = models.ForeignKey(Recipe,
+                                on_delete=models.CASCADE,
+                                related_name='similar_of')
+    score = models.FloatField(help_text='cosine similarity, 0 to 1')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'similar'],
+                                    name='one_score_per_recipe_pair'),
+        ]
+        indexes = [
+            # a recipe's neighbours, most similar first
+            models.Index(fields=['recipe', '-score']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe_id} ~ {self.similar_id} ({self.score:.2f})"
+
+
+class AuthorStats(models.Model):
+    """
+    The numbers on an author's profile: how many recipes they have, and
+    the likes, ratings and comments their public recipes received.
+
+    Derived data, summed from the author's recipe cards (see
+    recipes.authors) whenever one of their cards is refreshed or removed,
+    so a profile page never aggregates ratings, likes and comments.
+    """
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='author_stats')
+    recipe_count = models.IntegerField(default=0)
+    public_recipe_count = models.IntegerField(default=0)
+    like_count = models.IntegerField(default=0, help_text='likes received')
+    rating_count = models.IntegerField(default=0,
+                                       help_text='ratings received')
+    average_rating = models.FloatField(default=0)
+    comment_count = models.IntegerField(default=0,
+                                        help_text='comments received')
+    refreshed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    One place on a "top cooks" leaderboard. Each board is rebuilt as a
+    whole by a batch job (recipes.authors.rebuild_leaderboards), so
+    showing it is one indexed query in rank order.
+    """
+    ALL_TIME = 'all_time'
+    LAST_30_DAYS = 'last_30_days'
+    BOARD_CHOICES = [
+        (ALL_TIME, 'All time'),
+        (LAST_30_DAYS, 'Last 30 days'),
+    ]
+
+    board = models.CharField(max_length=20, choices=BOARD_CHOICES)
+    rank = models.PositiveIntegerField()
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    author = models.CharField(max_length=150, help_text="author's username")
+    score = models.IntegerField(
+        help_text='likes + ratings + comments received')
+    like_count = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    average_rating = models.FloatField(default=0)
+    comment_count = models.IntegerField(default=0)
+    built_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            # also the index a board is read by, in rank order
+            models.UniqueConstraint(fields=['board', 'rank'],
+                                    name='one_author_per_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.board} #{self.rank}: {self.author}"
@@ -0,0 +1,96 @@
+"""
+Per-serving nutrition for recipes.
+
+Ingredient nutrients are stored per 100g, so each RecipeIngredient's
+canonical grams (RecipeIngredient.quantity_grams, see recipes.quantities)
+are scaled, summed and divided by base_servings. The results are stored
+in RecipeNutrition so nothing has to do this maths at read time.
+"""
+from . import masterdata
+from .models import Recipe, RecipeIngredient, RecipeNutrition
+
+
+# RecipeNutrition field -> Ingredient per-100g field
+NUTRIENT_SOURCES = {
+    'calories': 'calories_per_100g',
+    'protein_g': 'protein_per_100g',
+    'carbs_g': 'carbs_per_100g',
+    'fat_g': 'fat_per_100g',
+    'sodium_mg': 'sodium_mg_per_100g',
+}
+NUTRIENTS = list(NUTRIENT_SOURCES)
+
+
+def compute_nutrition(recipe_ids):
+    """
+    Work out per-serving nutrition for the given recipes.
+    Returns {recipe_id: RecipeNutrition (unsaved)} using two queries.
+    """
+    servings = dict(Recipe.objects.filter(
+        id__in=recipe_ids
+    ).values_list('id', 'base_servings'))
+    results = {
+        recipe_id: RecipeNutrition(recipe_id=recipe_id, is_complete=False)
+        for recipe_id in servings
+    }
+    # Dietary flags come parsed from the in-process ingredient cache
+    ingredients = masterdata.ingredients().by_id
+
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=servings
+    ).values_list(
+        'recipe_id', 'quantity_grams', 'ingredient_id',
+        *[f'ingredient__{source}' for source in NUTRIENT_SOURCES.values()]
+    )
+    seen = set()
+    for recipe_id, grams, ingredient_id, *per_100g in rows:
+        nutrition = results[recipe_id]
+        if recipe_id not in seen:
+            seen.add(recipe_id)
+            nutrition.is_complete = True
+
+        if ingredient_id in ingredients:
+            nutrition.dietary_mask |= ingredients[ingredient_id].dietary_mask
+
+        if grams is None:
+            nutrition.is_complete = False
+            continue
+        for field, value in zip(NUTRIENTS, per_100g):
+            if value is not None:
+                setattr(nutrition, field,
+                        getattr(nutrition, field)
+                        + float(grams) * float(value) / 100)
+
+    for recipe_id, nutrition in results.items():
+        portions = servings[recipe_id] or 1
+        for field in NUTRIENTS:
+            setattr(nutrition, field,
+                    round(getattr(nutrition, field) / portions, 2))
+    return results
+
+
+def refresh_nutrition(recipe_ids=None, batch_size=500):
+    """
+    Recompute and store RecipeNutrition, in batches of ``batch_size``.
+    Pass recipe_ids to refresh just those; None refreshes every recipe.
+    Returns how many recipes were written.
+    """
+    if recipe_ids is None:
+        recipe_ids = Recipe.objects.order_by('id').values_list('id', flat=True)
+    recipe_ids = list(recipe_ids)
+
+    written = 0
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = compute_nutrition(recipe_ids[start:start + batch_size])
+        RecipeNutrition.objects.bulk_create(
+            batch.values(),
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=NUTRIENTS + ['dietary_mask', 'is_complete',
+                                       'updated_at'],
+        )
+        written += len(batch)
+    if written:
+        # The meal planner's in-process catalogue (recipes.meal_plan)
+        masterdata.bump_version(RecipeNutrition)
+    return written
@@ -0,0 +1,226 @@
+"""
+Pre-rendered recipe and tag pages, for anonymous readers.
+
+With settings.PRERENDER_PAGES on, public recipe pages (/recipes/<id>/)
+and tag pages (/tags/<id>/) are rendered ahead of time to
+settings.PRERENDER_ROOT as <path>/index.html, next to gzip (and brotli,
+if the brotli package is installed) copies. PrerenderedPageMiddleware
+(recipes.middleware) then hands them to anonymous visitors the way
+WhiteNoise serves static files - no view, no database.
+
+Pages are rendered by calling the normal view with an anonymous request,
+so they are exactly what a logged-out visitor would get. They are kept
+current incrementally: the refresh_recipe job re-renders a recipe's page
+and its tags' pages after every change, hiding or deleting a recipe
+removes its page straight away, and `manage.py prerender_pages` renders
+whatever is missing or older than its data.
+
+The rendering process (the job worker) and the web processes must share
+PRERENDER_ROOT - the same machine, or a shared volume.
+"""
+import os
+import shutil
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Max
+from django.http import HttpRequest
+from django.urls import resolve, reverse
+from whitenoise.compress import Compressor, brotli_installed
+
+from tags.models import RecipeTag, Tag
+from .cards import public_cards
+from .models import Recipe
+
+
+def enabled():
+    return getattr(settings, 'PRERENDER_PAGES', False)
+
+
+def page_file(path):
+    """Where the page for URL ``path`` ("/recipes/3/") is stored."""
+    return os.path.join(settings.PRERENDER_ROOT, path.strip('/'),
+                        'index.html')
+
+
+def _anonymous_request(path):
+    request = HttpRequest()
+    request.method = 'GET'
+    request.path = request.path_info = path
+    request.META = {'SERVER_NAME': 'localhost', 'SERVER_PORT': '80'}
+    request.user = AnonymousUser()
+    return request
+
+
+def render_page(path):
+    """The page an anonymous visitor gets for ``path``, or None."""
+    match = resolve(path)
+    response = match.func(_anonymous_request(path), *match.args,
+                          **match.kwargs)
+    if response.status_code != 200:
+        return None
+    return response.content
+
+
+def _write(filename, data):
+    """Write via a temporary file, so a page is never served half done."""
+    temporary = f'{filename}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(data)
+    os.replace(temporary, filename)
+
+
+def _remove(filename):
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def write_page(path, content):
+    """
+    Store a page and its compressed copies. The copies go first, and a
+    copy that wouldn't be smaller is removed rather than left stale.
+    """
+    filename = page_file(path)
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    variants = [('.gz', Compressor.compress_gzip)]
+    if brotli_installed:
+        variants.append(('.br', Compressor.compress_brotli))
+    for suffix, compress in variants:
+        data = compress(content)
+        if len(data) < len(content) * 0.95:
+            _write(filename + suffix, data)
+        else:
+            _remove(filename + suffix)
+    _write(filename, content)
+
+
+def remove_page(path):
+    filename = page_file(path)
+    for suffix in ('.br', '.gz', ''):
+        _remove(filename + suffix)
+
+
+def _recipe_path(recipe_id):
+    return reverse('recipe_detail', args=[recipe_id])
+
+
+def _tag_path(tag_id):
+    return reverse('tag_recipes', args=[tag_id])
+
+
+def remove_recipe_pages(recipe_ids):
+    """Take pages down now (recipes hidden or deleted)."""
+    if enabled():
+        for recipe_id in recipe_ids:
+            remove_page(_recipe_path(recipe_id))
+
+
+def prerender_recipes(recipe_ids, with_tags=True):
+    """
+    Render the pages of whichever ``recipe_ids`` are public and remove
+    the others' - and, with ``with_tags``, re-render the pages of their
+    tags, which list them. Returns (pages written, pages removed).
+    """
+    if not enabled():
+        return 0, 0
+    recipe_ids = list(recipe_ids)
+    public = set(Recipe.objects.public().filter(id__in=recipe_ids)
+                 .values_list('id', flat=True))
+    written = removed = 0
+    for recipe_id in recipe_ids:
+        path = _recipe_path(recipe_id)
+        content = render_page(path) if recipe_id in public else None
+        if content is None:
+            remove_page(path)
+            removed += 1
+        else:
+            write_page(path, content)
+            written += 1
+    if with_tags:
+        tag_ids = set(RecipeTag.objects.filter(recipe_id__in=recipe_ids)
+                      .values_list('tag_id', flat=True))
+        tags_written, tags_removed = prerender_tags(tag_ids)
+        written += tags_written
+        removed += tags_removed
+    return written, removed
+
+
+def prerender_tags(tag_ids):
+    """Render the first page of each tag. Returns (written, removed)."""
+    if not enabled():
+        return 0, 0
+    written = removed = 0
+    existing = set(Tag.objects.filter(id__in=list(tag_ids))
+                   .values_list('id', flat=True))
+    for tag_id in tag_ids:
+        path = _tag_path(tag_id)
+        content = render_page(path) if tag_id in existing else None
+        if content is None:
+            remove_page(path)
+            removed += 1
+        else:
+            write_page(path, content)
+            written += 1
+    return written, removed
+
+
+def _rendered_at(path):
+    try:
+        return os.stat(page_file(path)).st_mtime
+    except FileNotFoundError:
+        return None
+
+
+def stale_pages():
+    """
+    (recipe ids, tag ids) whose page is missing or older than the data
+    on it. Every change to a recipe - its steps, tags, comments, likes -
+    rebuilds its card (see recipes.tasks.refresh_recipe), so a page
+    rendered before its card's refreshed_at is out of date. One query
+    for the recipes and one for the tags.
+    """
+    refreshed = dict(public_cards().values_list('recipe_id', 'refreshed_at'))
+    recipes = []
+    for recipe_id in Recipe.objects.public().values_list('id', flat=True):
+        rendered = _rendered_at(_recipe_path(recipe_id))
+        newest = refreshed.get(recipe_id)
+        if rendered is None or (newest and newest.timestamp() > rendered):
+            recipes.append(recipe_id)
+
+    # A tag page shows the newest cards with that tag
+    newest_card = dict(
+        public_cards().values('recipe__recipetag__tag')
+        .annotate(newest=Max('refreshed_at'))
+        .values_list('recipe__recipetag__tag', 'newest'))
+    tags = []
+    for tag_id in Tag.objects.values_list('id', flat=True):
+        rendered = _rendered_at(_tag_path(tag_id))
+        newest = newest_card.get(tag_id)
+        if rendered is None or (newest and newest.timestamp() > rendered):
+            tags.append(tag_id)
+    return recipes, tags
+
+
+def orphaned_pages():
+    """Stored pages whose recipe or tag is gone or no longer public."""
+    root = settings.PRERENDER_ROOT
+    orphans = []
+    public = set(Recipe.objects.public().values_list('id', flat=True))
+    for kind, ids in [
+        ('recipes', public),
+        ('tags', set(Tag.objects.values_list('id', flat=True))),
+    ]:
+        directory = os.path.join(root, kind)
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            if not name.isdecimal() or int(name) not in ids:
+                orphans.append(f'/{kind}/{name}/')
+    return orphans
+
+
+def clear_pages():
+    """Remove every stored page."""
+    shutil.rmtree(settings.PRERENDER_ROOT, ignore_errors=True)
@@ -0,0 +1,347 @@
+"""
+Quantity parsing and canonical amounts for RecipeIngredient.
+
+People type quantities like "1 1/2 cups", "½ tsp", "2-3 tbsp" or "250g".
+parse_quantity() turns that text into numbers and a canonical unit, and
+canonical_amounts() converts it to grams and millilitres using a small
+density / piece-weight table. Both are pure functions with an LRU cache,
+so parsing the same strings over and over (as a backfill does) is cheap.
+
+RecipeIngredient.save() runs this on every write, and
+canonicalize_rows() does the same for bulk writes, so nutrition and
+scaling code can just read quantity_grams / quantity_ml.
+"""
+import re
+import unicodedata
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+
+from .units import COUNT, MASS, UNITS, VOLUME, normalize_unit
+
+
+# Grams per millilitre. Matched against ingredient names as whole words,
+# longest phrase first, so "brown sugar" wins over "sugar".
+DENSITIES = {
+    'water': 1.0, 'stock': 1.0, 'broth': 1.0, 'wine': 0.99,
+    'milk': 1.03, 'buttermilk': 1.03, 'cream': 1.0, 'yogurt': 1.03,
+    'yoghurt': 1.03, 'vinegar': 1.01, 'soy sauce': 1.15, 'juice': 1.04,
+    'oil': 0.92, 'olive oil': 0.91, 'butter': 0.911, 'peanut butter': 1.08,
+    'honey': 1.42, 'syrup': 1.37, 'maple syrup': 1.32, 'jam': 1.33,
+    'flour': 0.53, 'cornflour': 0.54, 'cornstarch': 0.54,
+    'sugar': 0.85, 'brown sugar': 0.93, 'icing sugar': 0.56,
+    'powdered sugar': 0.56, 'caster sugar': 0.81,
+    'salt': 1.2, 'baking powder': 0.9, 'baking soda': 0.96,
+    'bicarbonate of soda': 0.96, 'cocoa': 0.42, 'cocoa powder': 0.42,
+    'rice': 0.85, 'oats': 0.41, 'lentils': 0.85, 'breadcrumbs': 0.45,
+    'parmesan': 0.4, 'cheese': 0.45, 'almonds': 0.6, 'nuts': 0.6,
+}
+
+# Typical grams for one piece of an ingredient ("2 eggs", "1 onion")
+PIECE_WEIGHTS = {
+    'egg': 50, 'garlic': 5, 'onion': 150, 'red onion': 150, 'shallot': 40,
+    'carrot': 60, 'potato': 170, 'sweet potato': 130, 'tomato': 120,
+    'cherry tomato': 15, 'lemon': 100, 'lime': 65, 'orange': 130,
+    'apple': 180, 'banana': 120, 'avocado': 170, 'pepper': 150,
+    'bell pepper': 150, 'chilli': 15, 'courgette': 200, 'zucchini': 200,
+    'cucumber': 300, 'aubergine': 300, 'eggplant': 300,
+    'chicken breast': 170, 'chicken thigh': 110, 'tortilla': 45,
+}
+
+# Units that are a fixed weight whatever the ingredient
+UNIT_WEIGHTS = {'can': 400, 'tin': 400, 'stick': 113, 'slice': 30}
+# Units that just mean "one of the ingredient" ("2 cloves garlic")
+PIECE_WORDS = {'clove', 'medium', 'large', 'small', 'head'}
+DEFAULT_DENSITY = 1.0
+
+NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5,
+    'six': 6, 'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'eleven': 11,
+    'twelve': 12, 'half': 0.5, 'quarter': 0.25, 'dozen': 12,
+}
+
+_AMOUNT = r'(?:\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|\.\d+)'
+_QUANTITY_RE = re.compile(
+    rf'^\s*(?P<low>{_AMOUNT})'
+    rf'(?:\s*(?:-|–|—|to|or)\s*(?P<high>{_AMOUNT}))?'
+    r'\s*(?P<rest>.*)$',
+    re.IGNORECASE,
+)
+_WORD_RE = re.compile(r"[a-zA-Z][a-zA-Z.']*")
+_LEADING_NOISE_RE = re.compile(r'^(?:\([^)]*\)\s*|(?:a|an)\s+)+',
+                               re.IGNORECASE)
+_REMAINDER_RE = re.compile(r'^[\s.,]*(?:of\s+)?', re.IGNORECASE)
+
+
+class ParsedQuantity:
+    """
+    Result of parse_quantity().
+    ``amount`` is the number to calculate with (the middle of a range),
+    ``unit`` the canonical unit (see recipes.units) or the word as typed
+    when it isn't a measurement ("clove", "tin"), or '' if none.
+    """
+    __slots__ = ('amount', 'low', 'high', 'unit', 'remainder')
+
+    def __init__(self, low, high=None, unit='', remainder=''):
+        self.low = low
+        self.high = high
+        self.amount = (low + high) / 2 if high is not None else low
+        self.unit = unit
+        self.remainder = remainder
+
+    def __repr__(self):
+        return (f"ParsedQuantity(amount={self.amount!r}, unit={self.unit!r}, "
+                f"remainder={self.remainder!r})")
+
+
+def _replace_vulgar_fractions(text):
+    """'1½' -> '1 1/2', '¾' -> '3/4', '1⁄2' -> '1/2'."""
+    out = []
+    for char in text.replace('⁄', '/'):
+        if unicodedata.category(char) == 'No':
+            try:
+                value = Fraction(unicodedata.numeric(char))
+                value = value.limit_denominator(16)
+            except (TypeError, ValueError):
+                out.append(char)
+                continue
+            out.append(f' {value.numerator}/{value.denominator}')
+        else:
+            out.append(char)
+    return ''.join(out).strip()
+
+
+def _to_number(text):
+    """'1 1/2' -> 1.5, '3/4' -> 0.75, '2.5' -> 2.5"""
+    total = 0.0
+    for part in text.split():
+        if '/' in part:
+            numerator, denominator = part.split('/')
+            if int(denominator) == 0:
+                raise ValueError(part)
+            total += int(numerator) / int(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def _split_unit(rest):
+    """
+    Peel a unit off the start of the text after the number.
+    Tries two-word units ("fl oz") before one-word units ("cups").
+    Returns (unit, remainder).
+    """
+    # "1 (400g) tin", "half a cup", "2 cans of beans"
+    rest = _LEADING_NOISE_RE.sub('', rest.strip())
+    words = _WORD_RE.findall(rest[:40])
+    if not words:
+        return '', rest
+    for size in (2, 1):
+        if len(words) < size:
+            continue
+        canonical = normalize_unit(' '.join(words[:size]))
+        if canonical:
+            end = rest.find(words[size - 1]) + len(words[size - 1])
+            return canonical, _REMAINDER_RE.sub('', rest[end:])
+    word = words[0].lower().rstrip('.')
+    singular = word.rstrip('s')
+    if singular in UNIT_WEIGHTS or singular in PIECE_WORDS:
+        end = rest.find(words[0]) + len(words[0])
+        return singular, _REMAINDER_RE.sub('', rest[end:])
+    return '', rest
+
+
+@lru_cache(maxsize=4096)
+def parse_quantity(text):
+    """
+    Parse free-text quantities. Returns a ParsedQuantity, or None when
+    there's no number in it ("to taste", "some").
+
+        "1 1/2 cups"  -> amount 1.5,  unit 'cup'
+        "½ tsp"       -> amount 0.5,  unit 'tsp'
+        "2-3 tbsp"    -> amount 2.5,  unit 'tbsp' (low 2, high 3)
+        "250g"        -> amount 250,  unit 'g'
+        "1,5 kg"      -> amount 1.5,  unit 'kg'
+        "a pinch"     -> amount 1,    unit 'pinch'
+    """
+    if not text:
+        return None
+    cleaned = _replace_vulgar_fractions(text)
+    # "1,500" is a thousands separator, "1,5" a European decimal point
+    cleaned = re.sub(r'(?<=\d),(?=\d{3}\b)', '', cleaned)
+    cleaned = re.sub(r'(?<=\d),(?=\d{1,2}\b)', '.', cleaned)
+
+    match = _QUANTITY_RE.match(cleaned)
+    if match:
+        try:
+            low = _to_number(match.group('low'))
+            high = (_to_number(match.group('high'))
+                    if match.group('high') else None)
+        except ValueError:
+            return None
+        rest = match.group('rest')
+    else:
+        first, _, rest = cleaned.partition(' ')
+        if first.lower() not in NUMBER_WORDS:
+            return None
+        low, high = float(NUMBER_WORDS[first.lower()]), None
+
+    unit, remainder = _split_unit(rest)
+    return ParsedQuantity(low, high, unit, remainder)
+
+
+def _keyword_patterns(table):
+    """Compile whole-word patterns, longest keyword first."""
+    return [
+        (re.compile(rf'\b{re.escape(keyword)}(?:e?s)?\b'), value)
+        for keyword, value in sorted(table.items(),
+                                     key=lambda item: -len(item[0]))
+    ]
+
+
+_DENSITY_PATTERNS = _keyword_patterns(DENSITIES)
+_PIECE_PATTERNS = _keyword_patterns(PIECE_WEIGHTS)
+
+
+@lru_cache(maxsize=4096)
+def density_for(ingredient_name):
+    """Grams per ml for an ingredient name, or None if unknown."""
+    name = (ingredient_name or '').lower()
+    for pattern, value in _DENSITY_PATTERNS:
+        if pattern.search(name):
+            return value
+    return None
+
+
+@lru_cache(maxsize=4096)
+def piece_weight_for(ingredient_name):
+    """Grams for one piece of an ingredient, or None if unknown."""
+    name = (ingredient_name or '').lower()
+    for pattern, value in _PIECE_PATTERNS:
+        if pattern.search(name):
+            return value
+    return None
+
+
+def canonical_amounts(amount, unit, ingredient_name=''):
+    """
+    Convert an amount to (grams, millilitres). Either can be None when
+    it can't be worked out - e.g. "2 sprigs" has neither, and "200g
+    flour" has grams plus ml from flour's density.
+    Volumes without a known density are assumed to weigh like water.
+    """
+    if amount is None:
+        return None, None
+    amount = float(amount)
+    canonical = normalize_unit(unit)
+    word = (unit or '').strip().lower()
+
+    if canonical:
+        dimension, factor = UNITS[canonical]
+        if dimension == MASS:
+            grams = amount * factor
+            density = density_for(ingredient_name)
+            return grams, (grams / density if density else None)
+        if dimension == VOLUME:
+            ml = amount * factor
+            density = density_for(ingredient_name) or DEFAULT_DENSITY
+            return ml * density, ml
+        if dimension == COUNT:
+            amount *= factor
+        else:
+            return None, None
+    elif word in UNIT_WEIGHTS:
+        return amount * UNIT_WEIGHTS[word], None
+    elif word and word not in PIECE_WORDS:
+        return None, None
+
+    weight = piece_weight_for(ingredient_name)
+    return (amount * weight if weight else None), None
+
+
+# The largest values RecipeIngredient's decimal columns hold
+# (max_digits=10 / 12, decimal_places=3)
+MAX_QUANTITY = 10 ** 7 - 0.001
+MAX_CANONICAL = 10 ** 9 - 0.001
+
+
+def _decimal(value, limit=MAX_CANONICAL):
+    """A 3-place Decimal, or None if there is none or it doesn't fit."""
+    if value is None or not abs(value) <= limit:
+        return None
+    return Decimal(str(round(value, 3)))
+
+
+def format_quantity(amount, unit):
+    """2.0, 'cup' -> '2 cup' (used when only numbers were entered)."""
+    number = f"{float(amount):g}"
+    return f"{number} {unit}".strip()
+
+
+def canonicalize_row(row, ingredient_name, before=None):
+    """
+    Make a RecipeIngredient consistent before it is written.
+
+    ``before`` is the row's stored quantity_display, quantity_numeric
+    and unit (a dict), or None for a new row. Whichever side the editor
+    changed wins:
+    - a new or changed quantity_display that can be parsed fills in
+      quantity_numeric and unit - except that a size word ("2 large")
+      only fills an empty unit
+    - otherwise a blank quantity_numeric or unit is filled from it
+    - changed numbers with an unchanged display (or an empty display)
+      regenerate quantity_display from quantity_numeric + unit
+    - quantity_grams / quantity_ml are always recalculated
+    Returns the list of fields that may have changed.
+    """
+    display_changed = (before is None or row.quantity_display
+                       != before['quantity_display'])
+    numbers_changed = before is not None and (
+        row.quantity_numeric != before['quantity_numeric']
+        or row.unit != before['unit'])
+    parsed = parse_quantity(row.quantity_display)
+    if parsed is not None and _decimal(parsed.amount, MAX_QUANTITY) is None:
+        parsed = None  # "99999999999 g" - too big to store, so ignored
+    if parsed is not None and (display_changed
+                               or row.quantity_numeric is None):
+        row.quantity_numeric = _decimal(parsed.amount, MAX_QUANTITY)
+    if parsed is not None and parsed.unit and (
+            not row.unit
+            or display_changed and parsed.unit not in PIECE_WORDS):
+        row.unit = parsed.unit
+    if row.quantity_numeric is not None and (
+            not row.quantity_display
+            or numbers_changed and not display_changed):
+        row.quantity_display = format_quantity(row.quantity_numeric,
+                                               row.unit)
+
+    grams, ml = canonical_amounts(row.quantity_numeric, row.unit,
+                                  ingredient_name)
+    row.quantity_grams = _decimal(grams)
+    row.quantity_ml = _decimal(ml)
+    return CANONICAL_FIELDS
+
+
+CANONICAL_FIELDS = ['quantity_numeric', 'quantity_display', 'unit',
+                    'quantity_grams', 'quantity_ml']
+# The fields an editor types in - ``before`` for canonicalize_row()
+QUANTITY_FIELDS = ['quantity_display', 'quantity_numeric', 'unit']
+
+
+def canonicalize_rows(rows, ingredient_names, stored=None):
+    """
+    Bulk version of canonicalize_row() for rows about to go through
+    bulk_create / bulk_update. ``ingredient_names`` maps ingredient_id to
+    name and ``stored`` maps the id of each saved row to its ``before``
+    dict (rows missing from it count as new). Returns the rows whose
+    stored values actually changed.
+    """
+    stored = stored or {}
+    changed = []
+    for row in rows:
+        before = tuple(getattr(row, field) for field in CANONICAL_FIELDS)
+        canonicalize_row(row, ingredient_names.get(row.ingredient_id, ''),
+                         stored.get(row.pk))
+        if tuple(getattr(row, field) for field in CANONICAL_FIELDS) != before:
+            changed.append(row)
+    return changed
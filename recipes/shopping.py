@@ -0,0 +1,111 @@
+"""
+Combined shopping list for a meal plan.
+
+Give it (recipe, servings) pairs and it:
+1. scales every RecipeIngredient by servings / recipe.base_servings
+2. merges the same Ingredient across recipes, converting g/kg, ml/l,
+   tsp/tbsp/cup etc. to the ingredient's common_unit where possible
+3. groups the lines by Ingredient.category
+
+Everything comes from ONE query, however many recipes are in the plan
+(ingredient details come from recipes.masterdata).
+"""
+from collections import defaultdict
+
+from . import masterdata
+from .models import Recipe, RecipeIngredient
+from .units import BASE_UNITS, convert, normalize_unit, unit_dimension
+
+
+def _combine_plan(plan):
+    """
+    Sum servings per recipe id - the same recipe on Monday and Thursday
+    is just twice the servings.
+    """
+    servings_by_recipe = defaultdict(float)
+    for recipe, servings in plan:
+        recipe_id = recipe.pk if isinstance(recipe, Recipe) else int(recipe)
+        servings_by_recipe[recipe_id] += float(servings)
+    return servings_by_recipe
+
+
+def _round(quantity):
+    """Shopping quantities don't need more than 2 decimal places."""
+    return round(quantity, 2)
+
+
+def build_shopping_list(plan):
+    """
+    Build a shopping list for ``plan``, an iterable of (recipe, servings)
+    pairs where recipe is a Recipe or a recipe id.
+
+    Returns a list of categories sorted by name:
+        [{'category': 'dairy',
+          'items': [{'ingredient_id': 3, 'name': 'milk',
+                     'quantity': 750.0, 'unit': 'ml',
+                     'recipe_ids': [1, 4]}, ...]},
+         ...]
+
+    Amounts that can't be converted to the ingredient's common_unit
+    (e.g. "2 pieces" of something bought in grams) get their own line
+    per unit dimension instead of being silently dropped.
+    """
+    servings_by_recipe = _combine_plan(plan)
+    if not servings_by_recipe:
+        return []
+
+    rows = RecipeIngredient.objects.filter(
+        recipe_id__in=servings_by_recipe
+    ).values_list(
+        'recipe_id', 'recipe__base_servings', 'ingredient_id',
+        'quantity_numeric', 'unit',
+    )
+    # Names, categories and units from the in-process ingredient cache
+    ingredients = masterdata.ingredients().by_id
+
+    # (ingredient_id, unit) -> line being built
+    lines = {}
+    for recipe_id, base_servings, ingredient_id, quantity, unit in rows:
+        ingredient = ingredients.get(ingredient_id)
+        if ingredient is None:
+            continue
+        common_unit = ingredient.common_unit
+        scale = servings_by_recipe[recipe_id] / (base_servings or 1)
+        amount = float(quantity) * scale
+
+        # Prefer the ingredient's own unit, then the base unit of the
+        # row's dimension (g / ml / piece), then the unit exactly as typed
+        converted = convert(amount, unit, common_unit)
+        if converted is not None:
+            amount, line_unit = converted, normalize_unit(common_unit)
+        elif unit_dimension(unit):
+            line_unit = BASE_UNITS[unit_dimension(unit)]
+            amount = convert(amount, unit, line_unit)
+        else:
+            line_unit = unit.strip().lower()
+
+        key = (ingredient_id, line_unit)
+        line = lines.get(key)
+        if line is None:
+            line = lines[key] = {
+                'ingredient_id': ingredient_id,
+                'name': ingredient.name,
+                'category': ingredient.category or 'other',
+                'quantity': 0.0,
+                'unit': line_unit,
+                'recipe_ids': set(),
+            }
+        line['quantity'] += amount
+        line['recipe_ids'].add(recipe_id)
+
+    by_category = defaultdict(list)
+    for line in lines.values():
+        line['quantity'] = _round(line['quantity'])
+        line['recipe_ids'] = sorted(line['recipe_ids'])
+        by_category[line.pop('category')].append(line)
+
+    return [
+        {'category': category,
+         'items': sorted(items, key=lambda item: (item['name'], item['unit']))}
+        for category, items in sorted(by_category.items())
+    ]
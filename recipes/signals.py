@@ -0,0 +1,113 @@
+"""
+Signal handlers for the recipes app.
+
+Ingredients, steps and step images have no timestamp of their own, so
+any change to them bumps the parent recipe's ``updated_at``. That keeps
+one column the source of truth for "has this recipe changed?" (see
+``recipes.conditional``).
+
+Anything expensive (nutrition and other derived data) is NOT done here -
+it is queued as a background job (see ``recipes.tasks``) so saving stays
+fast.
+
+Bulk edits (``recipes.authoring``) send no per-row signals; they send
+``recipe_changed`` once for the whole edit instead.
+"""
+from django.contrib.auth.models import User
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .models import (
+    Ingredient, Recipe, RecipeCard, RecipeIngredient, RecipeStep, StepImage,
+)
+from . import masterdata
+from .prerender import remove_recipe_pages
+from .tasks import (drop_from_feeds, fan_out_recipe,
+                    refresh_ingredient_recipes, refresh_recipe)
+
+
+# Sent once after a recipe's ingredients or steps were saved in bulk.
+# Arguments: recipe_id
+recipe_changed = Signal()
+
+
+def touch_recipe(recipe_id):
+    """Mark a recipe as changed without loading or re-saving it."""
+    Recipe.objects.filter(pk=recipe_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    refresh_recipe.enqueue(recipe_id=instance.pk)
+    if instance.is_public:
+        fan_out_recipe.enqueue(recipe_id=instance.pk)
+    else:
+        # Don't keep serving its pre-rendered page until the job runs
+        remove_recipe_pages([instance.pk])
+        drop_from_feeds.enqueue(recipe_ids=[instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    touch_recipe(instance.recipe_id)
+    refresh_recipe.enqueue(recipe_id=instance.recipe_id)
+
+
+@receiver(post_save, sender=RecipeStep)
+@receiver(post_delete, sender=RecipeStep)
+def recipe_step_changed(sender, instance, **kwargs):
+    touch_recipe(instance.recipe_id)
+    refresh_recipe.enqueue(recipe_id=instance.recipe_id)
+
+
+@receiver(recipe_changed)
+def recipe_contents_changed(sender, recipe_id, **kwargs):
+    touch_recipe(recipe_id)
+    refresh_recipe.enqueue(recipe_id=recipe_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        refresh_ingredient_recipes.enqueue(ingredient_id=instance.pk)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    # Every process reloads its cached ingredients (and search index)
+    masterdata.bump_version(Ingredient)
+
+
+@receiver(request_started)
+def request_started_handler(sender, **kwargs):
+    masterdata.request_started()
+
+
+@receiver(request_finished)
+def request_finished_handler(sender, **kwargs):
+    masterdata.request_finished()
+
+
+@receiver(post_save, sender=StepImage)
+@receiver(post_delete, sender=StepImage)
+def step_image_changed(sender, instance, **kwargs):
+    recipe_id = (RecipeStep.objects.filter(pk=instance.step_id)
+                 .values_list('recipe_id', flat=True).first())
+    if recipe_id:
+        touch_recipe(recipe_id)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Recipe cards show the author's username (logins only touch last_login)
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    if RecipeCard.objects.filter(user=instance).exclude(
+            author=instance.username).update(author=instance.username):
+        masterdata.bump_version(RecipeCard)
+    # ...and the sitemap's user URLs do (see recipes.sitemaps)
+    masterdata.bump_version(User)
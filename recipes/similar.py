@@ -0,0 +1,341 @@
+"""
+"Similar recipes": TF-IDF vectors of recipe text and their nearest
+neighbours by cosine similarity.
+
+Each public recipe's words - title, description, steps, ingredient and
+tag names, with the title, ingredients and tags counting extra - are
+counted and stored as a sparse vector (RecipeTermVector). Words are
+hashed into N_FEATURES ids, so there is no vocabulary to keep in sync.
+
+TfIdfIndex loads every stored vector into one sparse matrix held as
+plain numpy arrays: rows (CSR) to read a recipe's terms, and columns
+(CSC, i.e. an inverted index) to find every recipe sharing a term.
+Scoring one recipe against all the others gathers the postings of its
+terms and sums them with np.bincount - only recipes sharing a word are
+touched.
+
+The TOP_K neighbours of each recipe are stored in SimilarRecipe, so the
+panel on a recipe page is one indexed lookup. rebuild_similar() redoes
+everything; fold_in() updates just the recipes that changed - their own
+lists, and the lists of other recipes they now belong in.
+"""
+import re
+import zlib
+from collections import Counter, defaultdict
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+
+from tags.models import RecipeTag
+from .models import (
+    Recipe, RecipeIngredient, RecipeStep, RecipeTermVector, SimilarRecipe,
+)
+
+
+TOP_K = 8
+# Neighbours less similar than this aren't worth showing
+MIN_SCORE = 0.05
+N_FEATURES = 2 ** 20
+CHUNK_SIZE = 1000
+# How much a word counts, by where it appears
+TITLE_WEIGHT = 3
+INGREDIENT_WEIGHT = 2
+TAG_WEIGHT = 2
+
+_WORD = re.compile(r'[a-z]{2,}')
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'into', 'is', 'it', 'of', 'on', 'or', 'the', 'then', 'to', 'until',
+    'with', 'your', 'you', 'this', 'that', 'over', 'add', 'min', 'mins',
+    'minutes',
+}
+
+
+def _terms(text, weight, counts):
+    for word in _WORD.findall(text.lower()):
+        if word not in STOP_WORDS:
+            counts[zlib.crc32(word.encode()) % N_FEATURES] += weight
+
+
+def load_documents(recipe_ids):
+    """{recipe_id: Counter(term id: weighted count)}, four queries."""
+    documents = {}
+    for recipe_id, title, description in Recipe.objects.public().filter(
+            id__in=recipe_ids).values_list('id', 'title', 'description'):
+        counts = documents[recipe_id] = Counter()
+        _terms(title, TITLE_WEIGHT, counts)
+        _terms(description, 1, counts)
+    for recipe_id, name in RecipeIngredient.objects.filter(
+            recipe_id__in=documents).values_list('recipe_id',
+                                                 'ingredient__name'):
+        _terms(name, INGREDIENT_WEIGHT, documents[recipe_id])
+    for recipe_id, name in RecipeTag.objects.filter(
+            recipe_id__in=documents).values_list('recipe_id', 'tag__name'):
+        _terms(name, TAG_WEIGHT, documents[recipe_id])
+    for recipe_id, instruction in RecipeStep.objects.filter(
+            recipe_id__in=documents).values_list('recipe_id', 'instruction'):
+        _terms(instruction, 1, documents[recipe_id])
+    return documents
+
+
+def update_vectors(recipe_ids):
+    """
+    Store the term vectors of whichever ``recipe_ids`` are public and
+    drop the others'. Returns how many vectors were written.
+    """
+    recipe_ids = list(recipe_ids)
+    documents = {recipe_id: counts for recipe_id, counts in
+                 load_documents(recipe_ids).items() if counts}
+    vectors = []
+    for recipe_id, counts in documents.items():
+        terms = np.array(sorted(counts), dtype='<u4')
+        weights = np.array([counts[term] for term in terms], dtype='<f4')
+        vectors.append(RecipeTermVector(recipe_id=recipe_id,
+                                        terms=terms.tobytes(),
+                                        counts=weights.tobytes()))
+    with transaction.atomic():
+        RecipeTermVector.objects.filter(
+            recipe_id__in=set(recipe_ids) - set(documents)).delete()
+        RecipeTermVector.objects.bulk_create(
+            vectors,
+            update_conflicts=True,
+            unique_fields=['recipe'],
+            update_fields=['terms', 'counts', 'updated_at'],
+        )
+    return len(vectors)
+
+
+class TfIdfIndex:
+    """
+    Every public recipe's TF-IDF vector, as one sparse matrix.
+
+    Rows are L2-normalised, so the dot product of two rows is their
+    cosine similarity. ``ids[row]`` is the recipe id of a row.
+    """
+
+    def __init__(self, ids, lengths, terms, counts):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.row_of = {int(recipe_id): row
+                       for row, recipe_id in enumerate(self.ids)}
+        n = len(self.ids)
+        # CSR: the terms of row r are entries indptr[r]:indptr[r + 1]
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        # Renumber the hashed ids 0..V-1 for the columns
+        _, self.columns = np.unique(terms, return_inverse=True)
+        self.df = np.bincount(self.columns)
+        idf = np.log((1 + n) / (1 + self.df)) + 1
+        weights = (1 + np.log(counts)) * idf[self.columns]
+        rows = np.repeat(np.arange(n), lengths)
+        norms = np.sqrt(np.bincount(rows, weights ** 2, minlength=n))
+        self.weights = weights / norms[rows]
+
+        # CSC: the rows containing column c are postings[colptr[c]:...]
+        order = np.argsort(self.columns, kind='stable')
+        self.colptr = np.concatenate([[0], np.cumsum(self.df)])
+        self.posting_rows = rows[order]
+        self.posting_weights = self.weights[order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def scores(self, row):
+        """Cosine similarity of ``row`` with every row (itself is 0)."""
+        start, end = self.indptr[row], self.indptr[row + 1]
+        columns = self.columns[start:end]
+        lengths = self.df[columns]
+        # Positions of every posting of every one of the row's columns
+        offsets = self.colptr[columns] - (np.cumsum(lengths) - lengths)
+        positions = np.repeat(offsets, lengths) + np.arange(lengths.sum())
+        products = (self.posting_weights[positions]
+                    * np.repeat(self.weights[start:end], lengths))
+        scores = np.bincount(self.posting_rows[positions], products,
+                             minlength=len(self))
+        scores[row] = 0
+        return scores
+
+    def neighbours(self, row, k=TOP_K, scores=None):
+        """[(recipe_id, score)] of the ``k`` most similar rows."""
+        if scores is None:
+            scores = self.scores(row)
+        if len(scores) > k:
+            top = np.argpartition(-scores, k)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(self.ids[other]), float(scores[other]))
+                for other in top if scores[other] >= MIN_SCORE]
+
+
+def _unpack(data, dtype):
+    return np.frombuffer(bytes(data), dtype=dtype)
+
+
+def load_index():
+    """Build a TfIdfIndex from every stored public recipe's vector."""
+    ids, lengths, terms, counts = [], [], [], []
+    rows = (RecipeTermVector.objects
+            .filter(recipe__is_public=True, recipe__is_deleted=False)
+            .order_by('recipe_id')
+            .values_list('recipe_id', 'terms', 'counts')
+            .iterator(chunk_size=CHUNK_SIZE))
+    for recipe_id, packed_terms, packed_counts in rows:
+        ids.append(recipe_id)
+        terms.append(_unpack(packed_terms, '<u4'))
+        counts.append(_unpack(packed_counts, '<f4'))
+        lengths.append(len(terms[-1]))
+    if not ids:
+        return TfIdfIndex([], [], np.empty(0, np.uint32),
+                          np.empty(0, np.float32))
+    return TfIdfIndex(ids, lengths, np.concatenate(terms),
+                      np.concatenate(counts).astype(np.float64))
+
+
+def _chunks(ids, size=CHUNK_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+def rebuild_similar(progress=None):
+    """
+    Recompute every vector and every recipe's neighbours from scratch.
+    Returns how many recipes have neighbours.
+    """
+    for chunk in _chunks(Recipe.all_objects.order_by('id')
+                         .values_list('id', flat=True)):
+        update_vectors(chunk)
+    index = load_index()
+    for chunk in _chunks(range(len(index))):
+        links = [SimilarRecipe(recipe_id=int(index.ids[row]),
+                               similar_id=similar_id, score=score)
+                 for row in chunk
+                 for similar_id, score in index.neighbours(row)]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=[int(index.ids[row]) for row in chunk]).delete()
+            SimilarRecipe.objects.bulk_create(links, batch_size=5000)
+        if progress:
+            progress(chunk[-1] + 1, len(index))
+    # Recipes that are no longer public
+    SimilarRecipe.objects.exclude(
+        recipe__is_public=True, recipe__is_deleted=False).delete()
+    SimilarRecipe.objects.exclude(
+        similar__is_public=True, similar__is_deleted=False).delete()
+    return len(index)
+
+
+def changed_recipes():
+    """
+    Ids whose vector is out of date: public recipes edited since their
+    vector was stored (or without one), and vectors of recipes that
+    aren't public any more.
+    """
+    edited = Recipe.objects.public().filter(
+        Q(term_vector__isnull=True)
+        | Q(updated_at__gt=F('term_vector__updated_at'))
+    ).values_list('id', flat=True)
+    hidden = RecipeTermVector.objects.exclude(
+        recipe__is_public=True, recipe__is_deleted=False,
+    ).values_list('recipe_id', flat=True)
+    return set(edited) | set(hidden)
+
+
+def fold_in(recipe_ids):
+    """
+    Bring the neighbours up to date after ``recipe_ids`` changed, without
+    a full rebuild: refresh their vectors, recompute their own lists, and
+    add them to (or update them in) other recipes' lists where they now
+    rank in the top TOP_K; lists they fall out of are recomputed. Recipes
+    that aren't public any more are taken out of every list.
+
+    Other recipes' scores are not redone for the small shift in word
+    weights (IDF) an edit causes - a rebuild now and then catches up.
+    Returns how many recipes were folded in.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+    update_vectors(recipe_ids)
+    index = load_index()
+    gone = [recipe_id for recipe_id in recipe_ids
+            if recipe_id not in index.row_of]
+    if gone:
+        # Lists that showed a hidden recipe are worked out again
+        _recompute(set(SimilarRecipe.objects.filter(similar_id__in=gone)
+                       .values_list('recipe_id', flat=True)), index, gone)
+
+    # Each list's length and weakest score, to see where a recipe fits
+    lists = {row['recipe_id']: (row['n'], row['lowest']) for row in
+             SimilarRecipe.objects.values('recipe_id')
+             .annotate(n=Count('id'), lowest=Min('score'))}
+    folded = 0
+    for recipe_id in recipe_ids:
+        row = index.row_of.get(recipe_id)
+        if row is None:
+            continue
+        scores = index.scores(row)
+        own = [SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                             score=score)
+               for similar_id, score in index.neighbours(row, scores=scores)]
+        # Lists it should be in now: the score is the same both ways
+        holders = set()
+        for other in np.flatnonzero(scores >= MIN_SCORE):
+            other_id = int(index.ids[other])
+            count, lowest = lists.get(other_id, (0, 0))
+            if count < TOP_K or scores[other] > lowest:
+                holders.add(other_id)
+        links = [SimilarRecipe(recipe_id=other_id, similar_id=recipe_id,
+                               score=float(scores[index.row_of[other_id]]))
+                 for other_id in holders]
+        # Lists it drops out of have a free place - work those out again
+        dropped = set(SimilarRecipe.objects.filter(similar_id=recipe_id)
+                      .values_list('recipe_id', flat=True)) - holders
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)).delete()
+            SimilarRecipe.objects.bulk_create(own + links)
+            _trim(holders)
+            _recompute(dropped, index)
+        folded += 1
+    return folded
+
+
+def _recompute(recipe_ids, index, gone=()):
+    """
+    Replace the lists of ``recipe_ids`` with freshly scored ones, and
+    drop every row involving the ``gone`` recipes.
+    """
+    links = [SimilarRecipe(recipe_id=recipe_id, similar_id=similar_id,
+                           score=score)
+             for recipe_id in recipe_ids if recipe_id in index.row_of
+             for similar_id, score
+             in index.neighbours(index.row_of[recipe_id])]
+    with transaction.atomic():
+        SimilarRecipe.objects.filter(
+            Q(recipe_id__in=recipe_ids) | Q(recipe_id__in=gone)
+            | Q(similar_id__in=gone)).delete()
+        SimilarRecipe.objects.bulk_create(links)
+
+
+def _trim(recipe_ids, k=TOP_K):
+    """Cut the lists of ``recipe_ids`` back to their ``k`` best."""
+    extra = defaultdict(list)
+    rows = (SimilarRecipe.objects.filter(recipe_id__in=recipe_ids)
+            .order_by('recipe_id', '-score', 'similar_id')
+            .values_list('recipe_id', 'id'))
+    seen = Counter()
+    for recipe_id, link_id in rows:
+        seen[recipe_id] += 1
+        if seen[recipe_id] > k:
+            extra[recipe_id].append(link_id)
+    doomed = [link_id for ids in extra.values() for link_id in ids]
+    if doomed:
+        SimilarRecipe.objects.filter(id__in=doomed).delete()
+
+
+def similar_recipe_ids(recipe_id, limit=TOP_K):
+    """The stored neighbours of one recipe, most similar first."""
+    return list(SimilarRecipe.objects.filter(recipe_id=recipe_id)
+                .order_by('-score').values_list('similar_id', flat=True)
+                [:limit])
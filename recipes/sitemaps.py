@@ -0,0 +1,246 @@
+"""
+XML sitemaps for search engines: an index (/sitemap.xml) pointing at
+segments of recipes, tag pages and user profile pages.
+
+Segments are fixed ranges of ids - recipes segment 0 is ids 0-4999,
+segment 1 is 5000-9999 and so on - so a segment never shifts when rows
+are added or removed elsewhere. Each one has a stamp: the newest
+updated_at of the recipes behind it, how many pages it lists and, for
+the users section, the User version stamp (usernames are in the URLs;
+recipes.signals bumps it when a user is saved).
+That is one aggregate over an id range, so answering "has this segment
+changed?" is cheap:
+
+- A crawler whose copy is current gets 304 Not Modified. The ETag is
+  made from the whole stamp; Last-Modified is only the stamp's time,
+  which doesn't move when a page is removed, so crawlers that send
+  If-None-Match get the more exact answer.
+- Otherwise the cached XML is served if its stamp still matches, and
+  only a changed segment is rebuilt - streamed out of the database in
+  keyset order, CHUNK_SIZE rows at a time. Cached segments also expire
+  after SEGMENT_TTL, for changes no stamp sees.
+
+The index is one grouped query per section, cached for INDEX_TTL.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import timezone
+from xml.sax.saxutils import escape
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Count, F, Max
+from django.http import Http404, HttpResponse
+from django.urls import reverse
+from django.views.decorators.http import condition
+
+from tags.models import RecipeTag
+from .masterdata import current_version
+from .models import Recipe
+
+
+SEGMENT_SIZE = 5000
+CHUNK_SIZE = 1000
+INDEX_TTL = 60 * 10
+SEGMENT_TTL = 60 * 60 * 24
+CONTENT_TYPE = 'application/xml; charset=utf-8'
+XMLNS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+@dataclass(frozen=True)
+class Section:
+    """
+    One kind of page in the sitemap. ``rows`` returns the source rows
+    (one or more per page), ``key`` is the id each page is grouped and
+    segmented by, ``lastmod`` the timestamp whose newest value is the
+    page's last change, and ``loc`` turns a grouped row into a URL path.
+    ``version``, if given, returns a version stamp for changes the
+    lastmod timestamps miss.
+    """
+    name: str
+    rows: object
+    key: str
+    lastmod: str
+    extra: tuple
+    loc: object
+    version: object = None
+
+    def pages(self, segment):
+        """
+        The segment's pages as dicts (key, lastmod and ``extra``),
+        in key order, fetched CHUNK_SIZE at a time.
+        """
+        start, end = segment * SEGMENT_SIZE, (segment + 1) * SEGMENT_SIZE
+        last = start - 1
+        while True:
+            chunk = list(
+                self.rows().filter(**{f'{self.key}__gt': last,
+                                      f'{self.key}__lt': end})
+                .values(self.key, *self.extra)
+                .annotate(last_modified=Max(self.lastmod))
+                .order_by(self.key)[:CHUNK_SIZE])
+            yield from chunk
+            if len(chunk) < CHUNK_SIZE:
+                return
+            last = chunk[-1][self.key]
+
+    def stamp(self, segment):
+        """
+        (newest lastmod, page count, version) of one segment, or None if
+        it is empty.
+        """
+        start = segment * SEGMENT_SIZE
+        row = self.rows().filter(**{
+            f'{self.key}__gte': start,
+            f'{self.key}__lt': start + SEGMENT_SIZE,
+        }).aggregate(last_modified=Max(self.lastmod),
+                     pages=Count(self.key, distinct=True))
+        if not row['pages']:
+            return None
+        version = self.version() if self.version else None
+        return row['last_modified'], row['pages'], version
+
+    def segments(self):
+        """[(segment, newest lastmod)] for every segment with pages."""
+        return list(
+            self.rows().annotate(segment=F(self.key) / SEGMENT_SIZE)
+            .values('segment').annotate(last_modified=Max(self.lastmod))
+            .order_by('segment').values_list('segment', 'last_modified'))
+
+
+SECTIONS = {section.name: section for section in [
+    Section(
+        name='recipes',
+        rows=lambda: Recipe.objects.public(),
+        key='id',
+        lastmod='updated_at',
+        extra=(),
+        loc=lambda row: reverse('recipe_detail', args=[row['id']]),
+    ),
+    Section(
+        name='tags',
+        rows=lambda: RecipeTag.objects.filter(recipe__is_public=True,
+                                              recipe__is_deleted=False),
+        key='tag_id',
+        lastmod='recipe__updated_at',
+        extra=(),
+        loc=lambda row: reverse('tag_recipes', args=[row['tag_id']]),
+    ),
+    Section(
+        name='users',
+        rows=lambda: Recipe.objects.public().filter(user__is_active=True),
+        key='user_id',
+        lastmod='updated_at',
+        extra=('user__username',),
+        loc=lambda row: reverse('user_recipes',
+                                args=[row['user__username']]),
+        version=lambda: current_version(User),
+    ),
+]}
+
+
+def _w3c(moment):
+    return moment.astimezone(timezone.utc).strftime(
+        '%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def build_segment(base_url, section, segment):
+    """A segment's <urlset> document."""
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n'
+             f'<urlset xmlns="{XMLNS}">\n']
+    for row in section.pages(segment):
+        parts.append(
+            f'<url><loc>{escape(base_url + section.loc(row))}</loc>'
+            f'<lastmod>{_w3c(row["last_modified"])}</lastmod></url>\n')
+    parts.append('</urlset>\n')
+    return ''.join(parts)
+
+
+def build_index(base_url):
+    """
+    (<sitemapindex> document, newest lastmod of all segments) - one
+    grouped query per section.
+    """
+    parts = [f'<?xml version="1.0" encoding="UTF-8"?>\n'
+             f'<sitemapindex xmlns="{XMLNS}">\n']
+    newest = None
+    for section in SECTIONS.values():
+        for segment, last_modified in section.segments():
+            loc = reverse('sitemap_segment', args=[section.name, segment])
+            parts.append(
+                f'<sitemap><loc>{escape(base_url + loc)}</loc>'
+                f'<lastmod>{_w3c(last_modified)}</lastmod></sitemap>\n')
+            newest = max(newest or last_modified, last_modified)
+    parts.append('</sitemapindex>\n')
+    return ''.join(parts), newest
+
+
+# ---------------------------------------------------------------------------
+# Views
+# ---------------------------------------------------------------------------
+
+def _base_url(request):
+    return f'{request.scheme}://{request.get_host()}'
+
+
+def _index(request):
+    """The cached index for this host, memoised on the request."""
+    if not hasattr(request, '_sitemap_index'):
+        key = f'sitemap:index:{_base_url(request)}'
+        index = cache.get(key)
+        if index is None:
+            index = build_index(_base_url(request))
+            cache.set(key, index, INDEX_TTL)
+        request._sitemap_index = index
+    return request._sitemap_index
+
+
+def _segment_stamp(request, section, segment):
+    if not hasattr(request, '_sitemap_stamp'):
+        if section not in SECTIONS:
+            raise Http404('No such sitemap')
+        request._sitemap_stamp = SECTIONS[section].stamp(segment)
+    return request._sitemap_stamp
+
+
+def index_last_modified(request):
+    return _index(request)[1]
+
+
+def segment_last_modified(request, section, segment):
+    stamp = _segment_stamp(request, section, segment)
+    return stamp[0] if stamp else None
+
+
+def segment_etag(request, section, segment):
+    stamp = _segment_stamp(request, section, segment)
+    if not stamp:
+        return None
+    text = ':'.join(str(part) for part in (section, segment, *stamp))
+    return f'"{hashlib.md5(text.encode()).hexdigest()}"'
+
+
+@condition(last_modified_func=index_last_modified)
+def sitemap_index_view(request):
+    """GET /sitemap.xml - lists every segment and when it last changed."""
+    return HttpResponse(_index(request)[0], content_type=CONTENT_TYPE)
+
+
+@condition(etag_func=segment_etag,
+           last_modified_func=segment_last_modified)
+def sitemap_segment_view(request, section, segment):
+    """
+    GET /sitemap-<section>-<segment>.xml - one segment of recipes, tags
+    or users. Rebuilt only when its stamp changed since it was cached.
+    """
+    stamp = _segment_stamp(request, section, segment)
+    if stamp is None:
+        raise Http404('No such sitemap')
+    key = f'sitemap:{_base_url(request)}:{section}:{segment}'
+    cached = cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        xml = cached[1]
+    else:
+        xml = build_segment(_base_url(request), SECTIONS[section], segment)
+        cache.set(key, (stamp, xml), SEGMENT_TTL)
+    return HttpResponse(xml, content_type=CONTENT_TYPE)
@@ -0,0 +1,417 @@
+"""
+Synthetic data for benchmarks and load tests (see the generate_data
+command).
+
+Builds users with profiles, recipes with ingredients, steps, step images
+and tags, plus ratings, likes, threaded comments and search history -
+all with bulk inserts, one batch of recipes at a time, so millions of
+rows take minutes rather than hours. The same seed always produces the
+same data.
+
+Derived data is filled in as the real app would: canonical grams/ml are
+worked out before the ingredient rows are inserted, activity events are
+written alongside the social rows, and nutrition and duplicate
+signatures are computed per batch (bulk inserts skip the save() methods
+and signal handlers that normally take care of those).
+"""
+import json
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import UserProfile
+from search.cache import invalidate_all as invalidate_search_cache
+from search.models import SearchHistory
+from social.models import ActivityEvent, Comment, Rating, UserLikes
+from tags.models import RecipeTag, Tag
+from . import masterdata
+from .cards import refresh_cards
+from .dedupe import update_signatures
+from .models import (
+    Ingredient, Recipe, RecipeIngredient, RecipeStep, StepImage,
+)
+from .nutrition import refresh_nutrition
+from .quantities import canonicalize_row
+from .timing import assign_time_tags
+
+
+# name, category, dietary flags, per 100g: kcal, protein, carbs, fat,
+# sodium mg, and how it's usually measured
+INGREDIENTS = [
+    ('flour', 'baking', ['gluten'], 364, 10, 76, 1, 2, 'g'),
+    ('sugar', 'baking', [], 387, 0, 100, 0, 1, 'g'),
+    ('butter', 'dairy', ['dairy'], 717, 1, 0, 81, 11, 'g'),
+    ('milk', 'dairy', ['dairy'], 42, 3.4, 5, 1, 44, 'ml'),
+    ('egg', 'dairy', ['eggs'], 155, 13, 1, 11, 124, 'pieces'),
+    ('parmesan', 'dairy', ['dairy'], 431, 38, 4, 29, 1529, 'g'),
+    ('cheddar', 'dairy', ['dairy'], 403, 25, 1, 33, 621, 'g'),
+    ('yoghurt', 'dairy', ['dairy'], 61, 3.5, 4.7, 3.3, 46, 'ml'),
+    ('chicken breast', 'meat', ['meat'], 165, 31, 0, 3.6, 74, 'g'),
+    ('beef mince', 'meat', ['meat'], 250, 26, 0, 15, 72, 'g'),
+    ('bacon', 'meat', ['meat'], 541, 37, 1.4, 42, 1717, 'g'),
+    ('salmon', 'fish', ['fish'], 208, 20, 0, 13, 59, 'g'),
+    ('prawns', 'fish', ['shellfish'], 99, 24, 0.2, 0.3, 111, 'g'),
+    ('tofu', 'protein', ['soy'], 76, 8, 1.9, 4.8, 7, 'g'),
+    ('chickpeas', 'tins', [], 164, 8.9, 27, 2.6, 7, 'g'),
+    ('lentils', 'dry goods', [], 116, 9, 20, 0.4, 2, 'g'),
+    ('rice', 'dry goods', [], 130, 2.7, 28, 0.3, 1, 'g'),
+    ('pasta', 'dry goods', ['gluten'], 131, 5, 25, 1.1, 6, 'g'),
+    ('bread', 'bakery', ['gluten'], 265, 9, 49, 3.2, 491, 'slices'),
+    ('oats', 'dry goods', ['gluten'], 389, 17, 66, 7, 2, 'g'),
+    ('onion', 'produce', [], 40, 1.1, 9, 0.1, 4, 'pieces'),
+    ('garlic', 'produce', [], 149, 6.4, 33, 0.5, 17, 'cloves'),
+    ('tomato', 'produce', [], 18, 0.9, 3.9, 0.2, 5, 'pieces'),
+    ('zucchini', 'produce', [], 17, 1.2, 3.1, 0.3, 8, 'pieces'),
+    ('carrot', 'produce', [], 41, 0.9, 10, 0.2, 69, 'pieces'),
+    ('potato', 'produce', [], 77, 2, 17, 0.1, 6, 'g'),
+    ('spinach', 'produce', [], 23, 2.9, 3.6, 0.4, 79, 'g'),
+    ('mushrooms', 'produce', [], 22, 3.1, 3.3, 0.3, 5, 'g'),
+    ('red pepper', 'produce', [], 31, 1, 6, 0.3, 4, 'pieces'),
+    ('lemon', 'produce', [], 29, 1.1, 9, 0.3, 2, 'pieces'),
+    ('banana', 'produce', [], 89, 1.1, 23, 0.3, 1, 'pieces'),
+    ('apple', 'produce', [], 52, 0.3, 14, 0.2, 1, 'pieces'),
+    ('basil', 'herbs', [], 23, 3.2, 2.7, 0.6, 4, 'g'),
+    ('parsley', 'herbs', [], 36, 3, 6, 0.8, 56, 'g'),
+    ('olive oil', 'oils', [], 884, 0, 0, 100, 2, 'tbsp'),
+    ('soy sauce', 'condiments', ['soy', 'gluten'], 53, 8, 4.9, 0.6, 5493,
+     'tbsp'),
+    ('honey', 'condiments', ['honey'], 304, 0.3, 82, 0, 4, 'tbsp'),
+    ('peanut butter', 'condiments', ['nuts'], 588, 25, 20, 50, 426, 'tbsp'),
+    ('almonds', 'nuts', ['nuts'], 579, 21, 22, 50, 1, 'g'),
+    ('sesame seeds', 'seeds', ['sesame'], 573, 18, 23, 50, 11, 'tsp'),
+    ('salt', 'spices', [], 0, 0, 0, 0, 38758, 'tsp'),
+    ('black pepper', 'spices', [], 251, 10, 64, 3.3, 20, 'tsp'),
+    ('paprika', 'spices', [], 282, 14, 54, 13, 68, 'tsp'),
+    ('cumin', 'spices', [], 375, 18, 44, 22, 168, 'tsp'),
+    ('coconut milk', 'tins', [], 230, 2.3, 6, 24, 15, 'ml'),
+    ('chopped tomatoes', 'tins', [], 21, 1, 3.9, 0.2, 140, 'g'),
+    ('stock', 'tins', [], 7, 0.5, 0.8, 0.2, 343, 'ml'),
+]
+# Variants multiply the catalogue so it looks like a real shared one
+VARIANTS = ['', 'organic', 'smoked', 'fresh', 'dried', 'frozen', 'wholemeal',
+            'free-range', 'low-fat', 'baby']
+
+AMOUNTS = {
+    'g': [25, 50, 100, 150, 200, 250, 400, 500],
+    'ml': [50, 100, 150, 200, 250, 400],
+    'pieces': ['1', '2', '3', '4', '1/2'],
+    'slices': ['2', '4', '6'],
+    'cloves': ['1', '2', '3', '4'],
+    'tbsp': ['1', '2', '3', '1 1/2'],
+    'tsp': ['1/4', '1/2', '1', '2'],
+}
+
+TITLE_ADJECTIVES = ['Easy', 'Quick', 'Creamy', 'Spicy', 'Classic', 'Smoky',
+                    'Crispy', 'Healthy', 'Cheesy', 'Zesty', 'Rustic',
+                    "Grandma's", 'Weeknight', 'One-pot', 'Roasted']
+DISHES = ['pasta', 'curry', 'stew', 'salad', 'soup', 'bake', 'stir fry',
+          'risotto', 'tacos', 'pie', 'traybake', 'bowl', 'frittata',
+          'pancakes', 'muffins', 'bread', 'burgers', 'skewers']
+STEP_VERBS = ['Chop', 'Dice', 'Slice', 'Fry', 'Simmer', 'Roast', 'Whisk',
+              'Stir in', 'Season', 'Bake', 'Grate', 'Mix', 'Toast',
+              'Blend', 'Fold in']
+STEP_ENDINGS = ['until golden', 'for 5 minutes', 'over a medium heat',
+                'until soft', 'and set aside', 'until combined',
+                'for 20 minutes', 'until bubbling', 'to taste',
+                'in a large bowl']
+COMMENTS = ['Loved this!', 'Made it twice this week.',
+            'Needed more salt for me.', 'Kids ate every bite.',
+            'Swapped the butter for oil and it was fine.',
+            'Can this be frozen?', 'Took longer than it says.',
+            'Best version I have tried.', 'A bit bland.',
+            'Great weeknight dinner.']
+REPLIES = ['Thanks!', 'Yes, it freezes well.', 'Agreed!',
+           'Try adding lemon.', 'Same here.']
+TAGS = [
+    ('Italian', 'cuisine'), ('Indian', 'cuisine'), ('Mexican', 'cuisine'),
+    ('Chinese', 'cuisine'), ('British', 'cuisine'), ('Thai', 'cuisine'),
+    ('Breakfast', 'meal_type'), ('Lunch', 'meal_type'),
+    ('Dinner', 'meal_type'), ('Snack', 'meal_type'),
+    ('Vegetarian', 'dietary'), ('Vegan', 'dietary'),
+    ('Gluten Free', 'dietary'), ('Baked', 'cooking_method'),
+    ('Grilled', 'cooking_method'), ('Slow Cooked', 'cooking_method'),
+    ('Under 30 Minutes', 'time'), ('Dessert', 'course'),
+    ('Main', 'course'), ('Side', 'course'),
+]
+TAG_COLOURS = ['#e74c3c', '#3498db', '#2ecc71', '#f1c40f', '#9b59b6']
+DIET_CHOICES = ['vegan', 'vegetarian', 'gluten-free', 'dairy-free',
+                'nut-free', 'pescatarian']
+
+HISTORY_DAYS = 365
+SYNTHETIC_PREFIX = 'synthetic'
+
+
+@contextmanager
+def manual_timestamps(*models):
+    """
+    Let us write our own created_at / updated_at values: auto_now and
+    auto_now_add would otherwise stamp every row with the same time.
+    """
+    switched = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            for flag in ('auto_now', 'auto_now_add'):
+                if getattr(field, flag, False):
+                    setattr(field, flag, False)
+                    switched.append((field, flag))
+    try:
+        yield
+    finally:
+        for field, flag in switched:
+            setattr(field, flag, True)
+
+
+class SyntheticDataGenerator:
+    """
+    Generates ``users`` users and ``recipes`` recipes plus everything
+    that hangs off them. Averages per recipe: ~9 ingredients, ~6 steps,
+    ~1 step image, ~2 tags, ~4 ratings, ~6 likes and ~3 comments.
+    """
+
+    def __init__(self, users, recipes, seed=0, batch_size=500,
+                 derived=True, progress=None):
+        self.user_count = users
+        self.recipe_count = recipes
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.derived = derived
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+        self.counts = {}
+
+    def _count(self, name, rows):
+        self.counts[name] = self.counts.get(name, 0) + len(rows)
+
+    def _past(self, days=HISTORY_DAYS, after=None):
+        """A random moment in the last ``days`` days (and after ``after``)."""
+        start = after or self.now - timedelta(days=days)
+        seconds = max(int((self.now - start).total_seconds()), 1)
+        return start + timedelta(seconds=self.random.randrange(seconds))
+
+    def run(self):
+        models = [User, UserProfile, Recipe, RecipeIngredient, RecipeStep,
+                  StepImage, RecipeTag, Rating, UserLikes, Comment,
+                  SearchHistory]
+        with manual_timestamps(*models):
+            self.ingredients = self._ingredients()
+            self.tags = self._tags()
+            self.user_ids = self._users()
+            for start in range(0, self.recipe_count, self.batch_size):
+                count = min(self.batch_size, self.recipe_count - start)
+                with transaction.atomic():
+                    recipe_ids = self._recipe_batch(count)
+                if self.derived:
+                    refresh_nutrition(recipe_ids)
+                    update_signatures(recipe_ids)
+                    assign_time_tags(recipe_ids)
+                    refresh_cards(recipe_ids)
+                self.progress(f"...{start + count} recipes")
+            self._search_history()
+        invalidate_search_cache()
+        return self.counts
+
+    def _ingredients(self):
+        """The shared ingredient catalogue (created once, then reused)."""
+        wanted = []
+        for variant in VARIANTS:
+            for (name, category, flags, kcal, protein, carbs, fat, sodium,
+                 unit) in INGREDIENTS:
+                full_name = f'{variant} {name}'.strip()
+                wanted.append(Ingredient(
+                    name=full_name, category=category, common_unit=unit,
+                    dietary_flags=json.dumps(flags),
+                    calories_per_100g=kcal, protein_per_100g=protein,
+                    carbs_per_100g=carbs, fat_per_100g=fat,
+                    sodium_mg_per_100g=sodium,
+                ))
+        Ingredient.objects.bulk_create(wanted, ignore_conflicts=True)
+        masterdata.bump_version(Ingredient)
+        return list(Ingredient.objects.filter(
+            name__in=[ingredient.name for ingredient in wanted]
+        ).values_list('id', 'name', 'common_unit'))
+
+    def _tags(self):
+        Tag.objects.bulk_create([
+            Tag(name=name, tag_type=tag_type,
+                color=TAG_COLOURS[index % len(TAG_COLOURS)])
+            for index, (name, tag_type) in enumerate(TAGS)
+        ], ignore_conflicts=True)
+        masterdata.bump_version(Tag)
+        return list(Tag.objects.filter(
+            name__in=[name for name, _ in TAGS]).values_list('id', flat=True))
+
+    def _users(self):
+        """New users (numbered after any earlier synthetic ones)."""
+        first = User.objects.filter(
+            username__startswith=f'{SYNTHETIC_PREFIX}_').count()
+        password = make_password(None)  # unusable - nobody logs in as them
+        user_ids = []
+        for start in range(0, self.user_count, self.batch_size):
+            count = min(self.batch_size, self.user_count - start)
+            users = []
+            for number in range(first + start, first + start + count):
+                joined = self._past()
+                users.append(User(
+                    username=f'{SYNTHETIC_PREFIX}_{number}',
+                    email=f'{SYNTHETIC_PREFIX}_{number}@example.com',
+                    password=password, date_joined=joined,
+                    last_login=self._past(after=joined),
+                ))
+            with transaction.atomic():
+                users = User.objects.bulk_create(users)
+                profiles = []
+                for user in users:
+                    profile = UserProfile(
+                        user=user, bio='Home cook.',
+                        created_at=user.date_joined,
+                        updated_at=user.date_joined)
+                    if self.random.random() < 0.2:
+                        profile.set_dietary_preferences(
+                            self.random.sample(DIET_CHOICES, 1))
+                    profiles.append(profile)
+                UserProfile.objects.bulk_create(profiles)
+            self._count('users', users)
+            self._count('profiles', profiles)
+            user_ids.extend(user.pk for user in users)
+        return user_ids or list(User.objects.values_list('id', flat=True))
+
+    def _recipe_batch(self, count):
+        rnd = self.random
+        recipes = []
+        for _ in range(count):
+            created = self._past()
+            main = rnd.choice(self.ingredients)[1]
+            recipes.append(Recipe(
+                user_id=rnd.choice(self.user_ids),
+                title=(f'{rnd.choice(TITLE_ADJECTIVES)} {main} '
+                       f'{rnd.choice(DISHES)}'),
+                description=f'A {rnd.choice(DISHES)} built around {main}.',
+                prep_time=rnd.choice([5, 10, 15, 20, 30]),
+                cook_time=rnd.choice([0, 10, 20, 30, 45, 60, 90]),
+                base_servings=rnd.choice([1, 2, 4, 4, 6, 8]),
+                difficulty_level=rnd.choice(['Easy', 'Easy', 'Medium',
+                                             'Hard']),
+                is_public=rnd.random() < 0.9,
+                created_at=created,
+                updated_at=self._past(after=created),
+            ))
+        recipes = Recipe.objects.bulk_create(recipes)
+        self._count('recipes', recipes)
+
+        rows = {name: [] for name in ['ingredients', 'steps', 'tags',
+                                      'ratings', 'likes', 'comments']}
+        for recipe in recipes:
+            self._recipe_children(recipe, rows)
+
+        RecipeIngredient.objects.bulk_create(rows['ingredients'])
+        steps = RecipeStep.objects.bulk_create(rows['steps'])
+        images = [
+            StepImage(step=step, image_url='placeholder',
+                      alt_text=f'Step {step.step_number}', display_order=1,
+                      uploaded_at=step.created_at)
+            for step in steps if rnd.random() < 0.2
+        ]
+        StepImage.objects.bulk_create(images)
+        RecipeTag.objects.bulk_create(rows['tags'])
+        Rating.objects.bulk_create(rows['ratings'])
+        UserLikes.objects.bulk_create(rows['likes'])
+        comments = Comment.objects.bulk_create(rows['comments'])
+        replies = []
+        for parent in comments:
+            if rnd.random() < 0.3:
+                replied_at = self._past(after=parent.created_at)
+                replies.append(Comment(
+                    recipe_id=parent.recipe_id,
+                    user_id=rnd.choice(self.user_ids),
+                    comment_text=rnd.choice(REPLIES),
+                    parent_comment=parent,
+                    created_at=replied_at, updated_at=replied_at,
+                ))
+        Comment.objects.bulk_create(replies)
+        # Bulk inserts skip save(), so write the activity stream here
+        ActivityEvent.objects.bulk_create([
+            ActivityEvent.for_source(row)
+            for row in rows['ratings'] + rows['likes'] + comments + replies
+        ])
+
+        for name, created in [('ingredients', rows['ingredients']),
+                              ('steps', steps), ('step images', images),
+                              ('tags', rows['tags']),
+                              ('ratings', rows['ratings']),
+                              ('likes', rows['likes']),
+                              ('comments', comments + replies)]:
+            self._count(name, created)
+        return [recipe.pk for recipe in recipes]
+
+    def _recipe_children(self, recipe, rows):
+        """Ingredients, steps, tags and social rows for one recipe."""
+        rnd = self.random
+        chosen = rnd.sample(self.ingredients, rnd.randint(4, 14))
+        for order, (ingredient_id, name, unit) in enumerate(chosen, 1):
+            amount = rnd.choice(AMOUNTS.get(unit, AMOUNTS['g']))
+            row = RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id,
+                quantity_display=f'{amount} {unit}', quantity_numeric=0,
+                unit=unit, display_order=order,
+            )
+            canonicalize_row(row, name)
+            rows['ingredients'].append(row)
+
+        for number in range(1, rnd.randint(3, 9) + 1):
+            subject = rnd.choice(chosen)[1]
+            rows['steps'].append(RecipeStep(
+                recipe=recipe, step_number=number,
+                instruction=(f'{rnd.choice(STEP_VERBS)} the {subject} '
+                             f'{rnd.choice(STEP_ENDINGS)}.'),
+                estimated_time=rnd.choice([None, 2, 5, 10, 15, 20]),
+                created_at=recipe.created_at,
+            ))
+
+        for tag_id in rnd.sample(self.tags, rnd.randint(0, 4)):
+            rows['tags'].append(RecipeTag(recipe=recipe, tag_id=tag_id,
+                                          created_at=recipe.created_at))
+
+        # Popularity is skewed: most recipes get a little attention
+        audience = min(len(self.user_ids), int(rnd.paretovariate(1.5) * 4))
+        fans = rnd.sample(self.user_ids, audience)
+        for user_id in fans[:audience // 2 + 1]:
+            rated_at = self._past(after=recipe.created_at)
+            rows['ratings'].append(Rating(
+                recipe=recipe, user_id=user_id,
+                rating_value=rnd.choice([3, 4, 4, 5, 5, 2, 1]),
+                created_at=rated_at, updated_at=rated_at,
+            ))
+        for user_id in fans:
+            rows['likes'].append(UserLikes(
+                recipe=recipe, user_id=user_id,
+                created_at=self._past(after=recipe.created_at)))
+        for user_id in fans[:rnd.randint(0, 5)]:
+            commented_at = self._past(after=recipe.created_at)
+            rows['comments'].append(Comment(
+                recipe=recipe, user_id=user_id,
+                comment_text=rnd.choice(COMMENTS),
+                created_at=commented_at, updated_at=commented_at,
+            ))
+
+    def _search_history(self):
+        """About two searches per user, some of them misspelt."""
+        words = [ingredient[0] for ingredient in INGREDIENTS] + DISHES
+        searches = []
+        for _ in range(len(self.user_ids) * 2):
+            query = self.random.choice(words)
+            if self.random.random() < 0.2 and len(query) > 4:
+                cut = self.random.randrange(1, len(query) - 1)
+                query = query[:cut] + query[cut + 1:]  # drop a letter
+            searches.append(SearchHistory(
+                user_id=self.random.choice(self.user_ids + [None]),
+                search_query=query,
+                results_count=self.random.randint(0, 50),
+                created_at=self._past(),
+            ))
+        SearchHistory.objects.bulk_create(searches, batch_size=5000)
+        self._count('searches', searches)
@@ -0,0 +1,142 @@
+"""
+Background tasks for the recipes app (run by `manage.py run_worker`).
+
+This module is imported by every web process (the signal handlers queue
+these tasks), so anything heavy that only a task needs - numpy, via
+recipes.dedupe - is imported inside the task instead of up here.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from jobs.queue import task
+from . import deletion
+from .authors import LEADERBOARD_DELAY, rebuild_leaderboards
+from .cards import refresh_cards
+from .feed import (add_recipe_to_feeds, rebuild_user_feed,
+                   remove_recipes_from_feeds)
+from .models import RecipeIngredient
+from .nutrition import refresh_nutrition
+from .prerender import prerender_recipes, prerender_tags
+from .timing import assign_time_tags
+
+
+@task(priority=5, delay=2)
+def refresh_recipe(recipe_id):
+    """
+    Recompute the data derived from one recipe. Queued by signal handlers
+    whenever a recipe or anything hanging off it changes; the short delay
+    lets a burst of edits collapse into a single run.
+    """
+    from .dedupe import update_signatures
+    refresh_nutrition([recipe_id])
+    update_signatures([recipe_id])
+    assign_time_tags([recipe_id])
+    refresh_cards([recipe_id])
+    prerender_recipes([recipe_id])
+    fold_in_similar.enqueue()
+
+
+@task(priority=1, delay=10)
+def refresh_ingredient_recipes(ingredient_id):
+    """An ingredient's nutrients or flags changed - redo its recipes."""
+    recipe_ids = (RecipeIngredient.objects.filter(ingredient_id=ingredient_id)
+                  .values_list('recipe_id', flat=True).distinct())
+    refresh_nutrition(recipe_ids)
+
+
+@task(priority=1, delay=10)
+def retag_by_time():
+    """A time tag was added or renamed - reassign time tags everywhere."""
+    assign_time_tags()
+
+
+@task(priority=1, delay=10)
+def refresh_tag_cards(tag_id):
+    """
+    A tag was renamed or recoloured - redo the cards and pre-rendered
+    pages showing it.
+    """
+    from tags.models import RecipeTag
+    recipe_ids = list(RecipeTag.objects.filter(tag_id=tag_id)
+                      .values_list('recipe_id', flat=True))
+    refresh_cards(recipe_ids)
+    prerender_recipes(recipe_ids, with_tags=False)
+    prerender_tags([tag_id])
+
+
+@task(priority=1, delay=10)
+def refresh_activity_recipes(user_id):
+    """
+    A user was deleted or restored - redo the cards and pre-rendered
+    pages of the recipes they liked, rated or commented on.
+    """
+    from social.models import Comment, Rating, UserLikes
+    recipe_ids = set()
+    for model in (Rating, UserLikes, Comment):
+        recipe_ids.update(model.objects.filter(user_id=user_id)
+                          .values_list('recipe_id', flat=True))
+    refresh_cards(recipe_ids)
+    prerender_recipes(recipe_ids)
+
+
+@task(priority=3, delay=5)
+def rebuild_feed(user_id):
+    """A user's likes, ratings or preferences changed - rebuild their feed."""
+    rebuild_user_feed(user_id)
+
+
+@task(priority=2, delay=30)
+def fan_out_recipe(recipe_id):
+    """A recipe became (or stayed) public - slot it into active feeds."""
+    add_recipe_to_feeds(recipe_id)
+
+
+@task(priority=3)
+def drop_from_feeds(recipe_ids):
+    """Recipes were made private or deleted - take them out of feeds."""
+    remove_recipes_from_feeds(recipe_ids)
+
+
+DUPLICATE_REPORT_KEY = 'dedupe:clusters'
+
+
+@task(priority=0)
+def report_duplicates():
+    """Find near-duplicate clusters and keep the report for the admin."""
+    from .dedupe import find_duplicate_clusters
+    cache.set(DUPLICATE_REPORT_KEY, find_duplicate_clusters(), None)
+
+
+@task(priority=0, delay=60)
+def fold_in_similar():
+    """
+    Bring "similar recipes" up to date with the recipes edited, hidden or
+    deleted since the last run. One job for every recipe changed in the
+    last minute, as it loads the whole TF-IDF index.
+    """
+    from .similar import changed_recipes, fold_in
+    fold_in(changed_recipes())
+
+
+@task(priority=0, delay=LEADERBOARD_DELAY)
+def refresh_leaderboards():
+    """
+    Author stats changed - rebuild the "top cooks" boards. Queued after
+    every stats refresh, so the boards are at most LEADERBOARD_DELAY
+    behind while anything is happening.
+    """
+    rebuild_leaderboards()
+
+
+@task(priority=0)
+def purge_deleted():
+    """
+    Really delete recipes and users soft-deleted long enough ago. Later
+    deletes merged into this job, so it queues itself again for the
+    ones still inside the grace period.
+    """
+    deletion.purge_deleted()
+    delay = deletion.next_purge_in()
+    # JOBS_EAGER runs jobs at once, ignoring the delay - it would spin
+    if delay is not None and not getattr(settings, 'JOBS_EAGER', False):
+        purge_deleted.enqueue(delay=delay)
@@ -1,3 +1,666 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from social.models import Rating, UserLikes
+from tags.models import Tag
+from . import dedupe, masterdata, prerender, similar
+from .cards import refresh_cards
+from .feed import get_feed
+from .deletion import (PURGE_GRACE, restore_user, soft_delete_recipes,
+                       soft_delete_user)
+from .authoring import (INGREDIENT_FIELDS, STEP_FIELDS,
+                        save_recipe_contents)
+from .authors import author_stats, leaderboard, rebuild_leaderboards
+from .meal_plan import get_catalogue
+from .models import (Ingredient, LeaderboardEntry, Recipe, RecipeCard,
+                     RecipeIngredient, RecipeNutrition, RecipeSignature,
+                     RecipeStep, StepImage)
+from .synthetic import SyntheticDataGenerator
+
+
+def make_recipe(user, **fields):
+    return Recipe.objects.create(
+        user=user, title=fields.pop('title', 'Toast'), prep_time=1,
+        cook_time=2, base_servings=1, difficulty_level='Easy', **fields)
+
+
+class MasterDataTests(TestCase):
+    """The in-process tag/ingredient cache (recipes.masterdata)."""
+
+    def test_bulk_created_tags_reach_a_warm_cache(self):
+        # Load the tag table into this process before the data exists
+        self.assertEqual(
+            self.client.get(reverse('tag_recipes', args=[999999])).status_code,
+            404)
+
+        SyntheticDataGenerator(users=3, recipes=5).run()
+
+        tag = Tag.objects.get(name='Italian')
+        response = self.client.get(reverse('tag_recipes', args=[tag.pk]))
+        self.assertEqual(response.status_code, 200)
+        recipe = Recipe.objects.public().first()
+        name = recipe.recipeingredient_set.first().ingredient.name
+        response = self.client.get(reverse('recipe_detail',
+                                           args=[recipe.pk]))
+        self.assertContains(response, name)
+
+
+@override_settings(JOBS_EAGER=True)
+class UserDeletionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook')
+        self.fan = User.objects.create_user('fan')
+
+    def test_restore_keeps_recipes_deleted_beforehand(self):
+        kept = make_recipe(self.user)
+        binned = make_recipe(self.user, title='Burnt toast')
+        soft_delete_recipes([binned.pk])
+
+        soft_delete_user(self.user)
+        restore_user(self.user)
+
+        self.assertTrue(Recipe.objects.filter(pk=kept.pk).exists())
+        self.assertFalse(Recipe.objects.filter(pk=binned.pk).exists())
+
+    def test_deleted_users_likes_stop_counting(self):
+        recipe = make_recipe(self.user)
+        UserLikes.objects.create(user=self.fan, recipe=recipe)
+        refresh_cards([recipe.pk])
+        url = reverse('recipe_detail', args=[recipe.pk])
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            soft_delete_user(self.fan)
+        self.assertEqual(RecipeCard.objects.get(pk=recipe.pk).like_count, 0)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            restore_user(self.fan)
+        self.assertEqual(RecipeCard.objects.get(pk=recipe.pk).like_count, 1)
+
+
+@override_settings(JOBS_EAGER=False)
+class PurgeTests(TestCase):
+
+    def test_purge_queues_itself_for_later_deletes(self):
+        from jobs.models import Job
+        from .tasks import purge_deleted
+        user = User.objects.create_user('cook')
+        old, new = make_recipe(user), make_recipe(user, title='Jam')
+        soft_delete_recipes([old.pk])
+        Recipe.all_objects.filter(pk=old.pk).update(
+            deleted_at=timezone.now() - PURGE_GRACE - timedelta(hours=1))
+        soft_delete_recipes([new.pk])
+        Job.objects.all().delete()
+
+        purge_deleted()
+        self.assertFalse(Recipe.all_objects.filter(pk=old.pk).exists())
+        self.assertTrue(Recipe.all_objects.filter(pk=new.pk).exists())
+        job = Job.objects.get(name=purge_deleted.task_name)
+        self.assertGreater(job.run_after,
+                           timezone.now() + PURGE_GRACE - timedelta(hours=1))
+
+
+class MealPlanCatalogueTests(TestCase):
+
+    def test_deleted_recipes_leave_the_catalogue(self):
+        recipe = make_recipe(User.objects.create_user('cook'))
+        RecipeNutrition.objects.create(recipe=recipe, calories=500)
+        masterdata.bump_version(RecipeNutrition)
+        self.assertIn(recipe.pk, get_catalogue().recipe_ids)
+
+        soft_delete_recipes([recipe.pk])
+        self.assertNotIn(recipe.pk, get_catalogue().recipe_ids)
+
+
+class QuantityEditTests(TestCase):
+    """Editing either side of a quantity must not be undone on save."""
+
+    def setUp(self):
+        recipe = make_recipe(User.objects.create_user('cook'))
+        self.ingredient = Ingredient.objects.create(name='Flour')
+        self.row = RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.ingredient,
+            quantity_display='2 cups', quantity_numeric=0, unit='',
+            display_order=1)
+
+    def submit(self, **changes):
+        """Save the row the way the admin does, with ``changes``."""
+        values = {'id': self.row.pk,
+                  **{name: getattr(self.row, name)
+                     for name in INGREDIENT_FIELDS},
+                  **changes}
+        save_recipe_contents(self.row.recipe, ingredients=[values])
+        self.row.refresh_from_db()
+
+    def test_new_row_is_parsed_from_the_display_text(self):
+        self.assertEqual(self.row.quantity_numeric, 2)
+        self.assertEqual(self.row.unit, 'cup')
+
+    def test_editing_the_numbers_rewrites_the_display_text(self):
+        self.submit(quantity_numeric=3, unit='g')
+        self.assertEqual(self.row.quantity_numeric, 3)
+        self.assertEqual(self.row.unit, 'g')
+        self.assertEqual(self.row.quantity_display, '3 g')
+        self.assertEqual(self.row.quantity_grams, 3)
+
+    def test_editing_the_display_text_updates_the_numbers(self):
+        self.submit(quantity_display='250g')
+        self.assertEqual(self.row.quantity_numeric, 250)
+        self.assertEqual(self.row.unit, 'g')
+
+    def test_size_words_do_not_replace_a_unit(self):
+        self.submit(quantity_display='2 large')
+        self.assertEqual(self.row.unit, 'cup')
+
+    def test_model_save_keeps_an_edited_unit(self):
+        row = RecipeIngredient.objects.get(pk=self.row.pk)
+        row.quantity_numeric = 100
+        row.unit = 'ml'
+        row.save()
+        row.refresh_from_db()
+        self.assertEqual((row.quantity_numeric, row.unit,
+                          row.quantity_display), (100, 'ml', '100 ml'))
+
+    def test_backfill_keeps_stored_numbers(self):
+        # Written without save(), as rows from before canonical amounts
+        RecipeIngredient.objects.filter(pk=self.row.pk).update(
+            quantity_display='2 large', quantity_numeric=300, unit='g',
+            quantity_grams=None)
+        call_command('backfill_quantities', skip_nutrition=True,
+                     stdout=io.StringIO())
+        self.row.refresh_from_db()
+        self.assertEqual((self.row.quantity_numeric, self.row.unit,
+                          self.row.quantity_grams), (300, 'g', 300))
+
+    def test_amounts_too_big_to_store_are_ignored(self):
+        self.submit(quantity_display='99999999999 kg')
+        self.assertEqual(self.row.quantity_numeric, 2)
+        self.assertIsNotNone(self.row.quantity_grams)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook')
+        self.recipe = make_recipe(self.user)
+        self.url = reverse('recipe_detail', args=[self.recipe.pk])
+
+    def test_recipe_etag_follows_tags_and_author(self):
+        tag = Tag.objects.create(name='Breakfast', tag_type='meal_type')
+        etag = self.client.get(self.url)['ETag']
+
+        tag.color = '#123456'
+        tag.save()
+        renamed_tag = self.client.get(self.url)['ETag']
+        self.assertNotEqual(renamed_tag, etag)
+
+        User.objects.filter(pk=self.user.pk).update(username='chef')
+        self.assertNotEqual(self.client.get(self.url)['ETag'], renamed_tag)
+
+    def test_catalogue_changes_on_delete_without_last_modified(self):
+        make_recipe(self.user, title='Jam')
+        refresh_cards(Recipe.objects.values_list('id', flat=True))
+        response = self.client.get('/api/recipes/')
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        soft_delete_recipes([self.recipe.pk])
+        response = self.client.get('/api/recipes/',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_catalogue_revalidates_without_queries(self):
+        refresh_cards([self.recipe.pk])
+        etag = self.client.get('/api/recipes/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/recipes/',
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # A like reaches the list once the card is rebuilt
+        UserLikes.objects.create(user=User.objects.create_user('fan'),
+                                 recipe=self.recipe)
+        refresh_cards([self.recipe.pk])
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class SitemapTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook')
+        self.recipes = [make_recipe(self.user), make_recipe(self.user)]
+
+    def test_removed_recipe_changes_the_segment(self):
+        url = reverse('sitemap_segment', args=['recipes', 0])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # The newest recipe stays, so Last-Modified doesn't move
+        soft_delete_recipes([self.recipes[0].pk])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(
+            response, reverse('recipe_detail', args=[self.recipes[0].pk]))
+
+    def test_renamed_user_changes_the_segment(self):
+        url = reverse('sitemap_segment', args=['users', 0])
+        etag = self.client.get(url)['ETag']
+
+        self.user.username = 'chef'
+        self.user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/chef/')
+
+
+@override_settings(JOBS_EAGER=True)
+class FeedTests(TestCase):
+
+    def setUp(self):
+        cook = User.objects.create_user('cook')
+        self.reader = User.objects.create_user(
+            'reader', last_login=timezone.now())
+        self.recipes = [make_recipe(cook, title=f'Dish {number}')
+                        for number in range(3)]
+        get_feed(self.reader.pk)
+        self.client.force_login(self.reader)
+
+    def feed_ids(self):
+        response = self.client.get('/api/feed/')
+        return [row['id'] for row in response.json()['results']]
+
+    def test_hidden_and_deleted_recipes_leave_cached_feeds(self):
+        private, deleted, kept = self.recipes
+        with self.captureOnCommitCallbacks(execute=True):
+            private.is_public = False
+            private.save()
+            soft_delete_recipes([deleted.pk])
+
+        self.assertEqual(get_feed(self.reader.pk)['recipe_ids'], [kept.pk])
+        self.assertEqual(self.feed_ids(), [kept.pk])
+
+
+class ApiInputTests(TestCase):
+    """Malformed query strings get a 400, never a 500."""
+
+    def assertBadRequest(self, url, data):
+        response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn('error', response.json())
+
+    def test_ids_must_be_plain_digits(self):
+        for ids in ['1,²', '①', '1,x']:
+            self.assertBadRequest('/api/recipes/batch/', {'ids': ids})
+
+    def test_max_time_must_be_plain_digits(self):
+        self.assertBadRequest('/api/recipes/', {'max_time': '³'})
+
+    def test_meal_plan_targets_must_be_finite(self):
+        for value in ['nan', 'inf', '-1']:
+            self.assertBadRequest('/api/meal-plan/', {'calories': value})
+
+    def test_shopping_list_servings_must_be_finite(self):
+        self.assertBadRequest('/api/shopping-list/', {'plan': '1:nan'})
+
+
+class RecipeApiTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook')
+        self.toast, self.jam = [make_recipe(self.user, title=title)
+                                for title in ['Toast', 'Jam']]
+        self.private = make_recipe(self.user, title='Secret',
+                                   is_public=False)
+        flour = Ingredient.objects.create(name='Flour')
+        RecipeIngredient.objects.create(
+            recipe=self.toast, ingredient=flour, quantity_display='200 g',
+            quantity_numeric=200, unit='g', display_order=1)
+
+    def test_only_the_fields_asked_for(self):
+        response = self.client.get(
+            reverse('api_recipe_detail', args=[self.toast.pk]),
+            {'fields': 'id,title,total_time', 'include': 'ingredients'})
+        self.assertEqual(response.json(), {
+            'id': self.toast.pk, 'title': 'Toast', 'total_time': 3,
+            'ingredients': [{
+                'ingredient_id': self.toast.recipeingredient_set.get()
+                .ingredient_id,
+                'name': 'Flour', 'quantity': 200.0,
+                'quantity_display': '200 g', 'unit': 'g', 'notes': '',
+                'display_order': 1}],
+        })
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('api_recipe_list'),
+                                   {'fields': 'title,password'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_batch_keeps_the_order_and_lists_missing_ids(self):
+        ids = [self.jam.pk, self.private.pk, self.toast.pk, 999999]
+        response = self.client.get(
+            reverse('api_recipe_batch'),
+            {'ids': ','.join(map(str, ids)), 'fields': 'title'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.jam.pk, 'title': 'Jam'},
+                        {'id': self.toast.pk, 'title': 'Toast'}],
+            'missing': [self.private.pk, 999999],
+        })
+
+    def test_html_pages_ignore_a_malformed_before(self):
+        refresh_cards([self.toast.pk])
+        self.assertContains(self.client.get(reverse('home'),
+                                            {'before': '²'}), 'Toast')
+
+    def test_list_pages_from_cards_and_from_recipes(self):
+        refresh_cards([self.toast.pk, self.jam.pk, self.private.pk])
+        for fields in ['id,title', 'id,title,base_servings']:
+            first = self.client.get(reverse('api_recipe_list'),
+                                    {'fields': fields, 'limit': 1}).json()
+            self.assertEqual([row['title'] for row in first['results']],
+                             ['Jam'])
+            second = self.client.get(
+                reverse('api_recipe_list'),
+                {'fields': fields, 'limit': 1,
+                 'before': first['next_before']}).json()
+            self.assertEqual([row['title'] for row in second['results']],
+                             ['Toast'])
+            self.assertIsNone(second['next_before'])
+
+
+class ShoppingListTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook')
+        self.milk = Ingredient.objects.create(
+            name='Milk', category='dairy', common_unit='ml')
+        self.pancakes = self.recipe('Pancakes', servings=2,
+                                    milk=('1 cup', 1, 'cup'))
+        self.porridge = self.recipe('Porridge', servings=1,
+                                    milk=('0.5 l', 0.5, 'l'))
+
+    def recipe(self, title, servings, milk, **fields):
+        recipe = make_recipe(self.user, title=title, **fields)
+        Recipe.objects.filter(pk=recipe.pk).update(base_servings=servings)
+        display, numeric, unit = milk
+        RecipeIngredient.objects.create(
+            recipe=recipe, ingredient=self.milk, quantity_display=display,
+            quantity_numeric=numeric, unit=unit, display_order=1)
+        return recipe
+
+    def test_amounts_are_scaled_converted_and_merged(self):
+        response = self.client.get(reverse('api_shopping_list'), {
+            'plan': f'{self.pancakes.pk}:4,{self.porridge.pk}:1'})
+        self.assertEqual(response.json(), {
+            'categories': [{'category': 'dairy', 'items': [{
+                'ingredient_id': self.milk.pk, 'name': 'Milk',
+                'quantity': 973.18, 'unit': 'ml',
+                'recipe_ids': [self.pancakes.pk, self.porridge.pk]}]}],
+            'missing': [],
+        })
+
+    def test_private_recipes_only_for_their_owner(self):
+        secret = self.recipe('Secret', servings=1, milk=('100 ml', 100, 'ml'),
+                             is_public=False)
+        plan = {'plan': f'{secret.pk}:1'}
+        response = self.client.get(reverse('api_shopping_list'), plan)
+        self.assertEqual(response.json(),
+                         {'categories': [], 'missing': [secret.pk]})
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('api_shopping_list'), plan)
+        items = response.json()['categories'][0]['items']
+        self.assertEqual(items[0]['quantity'], 100)
+
+
+class DedupeTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('cook')
+        self.ingredients = [Ingredient.objects.create(name=name)
+                            for name in ['Flour', 'Eggs', 'Milk', 'Salt']]
+
+    def recipe(self, title, ingredients, steps):
+        recipe = make_recipe(self.user, title=title)
+        for order, ingredient in enumerate(ingredients, 1):
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient,
+                quantity_display='1', quantity_numeric=1, unit='',
+                display_order=order)
+        for number, instruction in enumerate(steps, 1):
+            RecipeStep.objects.create(recipe=recipe, step_number=number,
+                                      instruction=instruction)
+        return recipe
+
+    def test_signatures_estimate_jaccard_similarity(self):
+        first = {f'w:{number}' for number in range(0, 100)}
+        second = {f'w:{number}' for number in range(25, 125)}  # 0.6
+        signatures = dedupe.minhash_many([first, second, first])
+        self.assertEqual(dedupe.similarity(signatures[0], signatures[2]), 1)
+        self.assertAlmostEqual(
+            dedupe.similarity(signatures[0], signatures[1]), 0.6, delta=0.15)
+
+    def test_copies_are_found_and_clustered(self):
+        steps = ['Whisk the flour eggs and milk into a smooth batter',
+                 'Fry thin pancakes in a hot buttered pan']
+        original = self.recipe('Pancakes', self.ingredients, steps)
+        copy = self.recipe('Pancakes', self.ingredients, steps)
+        other = self.recipe('Boiled eggs', self.ingredients[1:2],
+                            ['Boil the eggs for seven minutes'])
+        recipe_ids = [original.pk, copy.pk, other.pk]
+        self.assertEqual(dedupe.update_signatures(recipe_ids), 3)
+
+        self.assertEqual(dedupe.find_similar(original.pk),
+                         [(copy.pk, 1.0)])
+        self.assertEqual(dedupe.find_duplicate_clusters(), [
+            {'recipe_ids': [original.pk, copy.pk], 'similarity': 1.0}])
+
+    def test_removed_recipes_leave_the_index(self):
+        recipe = self.recipe('Pancakes', self.ingredients, [])
+        dedupe.update_signatures([recipe.pk])
+        Recipe.all_objects.filter(pk=recipe.pk).delete()
+
+        self.assertEqual(dedupe.update_signatures([recipe.pk]), 0)
+        self.assertFalse(RecipeSignature.objects.exists())
+
+
+class PrerenderTests(TestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        settings = override_settings(PRERENDER_PAGES=True,
+                                     PRERENDER_ROOT=root.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user('cook')
+        self.recipe = make_recipe(self.user)
+        self.path = reverse('recipe_detail', args=[self.recipe.pk])
+
+    def test_anonymous_visitors_get_the_stored_page(self):
+        self.assertEqual(prerender.stale_pages(), ([self.recipe.pk], []))
+        self.assertEqual(prerender.prerender_recipes([self.recipe.pk]),
+                         (1, 0))
+        self.assertEqual(prerender.stale_pages(), ([], []))
+        filename = prerender.page_file(self.path)
+        with open(filename, 'rb') as file:
+            self.assertIn(b'Toast', file.read())
+        # Mark the file, to tell it apart from a freshly rendered page
+        prerender.write_page(self.path, b'<p>stored</p>' * 100)
+
+        response = self.client.get(self.path, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        response = self.client.get(self.path)
+        self.assertEqual(b''.join(response.streaming_content),
+                         b'<p>stored</p>' * 100)
+        self.assertEqual(
+            self.client.get(self.path, HTTP_IF_NONE_MATCH=response['ETag'])
+            .status_code, 304)
+
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(self.path), 'Toast')
+        self.assertContains(self.client.get(self.path + '?page=1'), 'Toast')
+
+    def test_hidden_recipes_lose_their_page(self):
+        prerender.prerender_recipes([self.recipe.pk])
+        self.recipe.is_public = False
+        self.recipe.save()
+        self.assertFalse(os.path.exists(prerender.page_file(self.path)))
+        self.assertEqual(self.client.get(self.path).status_code, 404)
+
+
+class SimilarRecipeTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('cook')
+        self.tomato, self.creamy, self.brownies, self.soup = [
+            make_recipe(user, title=title, description=description)
+            for title, description in [
+                ('Tomato basil pasta', 'Spaghetti in a fresh tomato sauce'),
+                ('Creamy tomato pasta', 'Penne with tomato and cream'),
+                ('Chocolate brownies', 'Fudgy squares of chocolate'),
+                ('Leek soup', 'Leeks and potatoes, blended'),
+            ]]
+
+    def test_recipes_sharing_words_are_neighbours(self):
+        self.assertEqual(similar.rebuild_similar(), 4)
+        self.assertEqual(similar.similar_recipe_ids(self.tomato.pk),
+                         [self.creamy.pk])
+        self.assertEqual(similar.similar_recipe_ids(self.brownies.pk), [])
+
+    def test_fold_in_follows_edits_and_hidden_recipes(self):
+        similar.rebuild_similar()
+        self.soup.title = 'Tomato soup'
+        self.soup.save()
+        self.assertEqual(similar.changed_recipes(), {self.soup.pk})
+        similar.fold_in(similar.changed_recipes())
+        self.assertIn(self.soup.pk,
+                      similar.similar_recipe_ids(self.tomato.pk))
+
+        self.creamy.is_public = False
+        self.creamy.save()
+        similar.fold_in(similar.changed_recipes())
+        self.assertEqual(similar.similar_recipe_ids(self.tomato.pk),
+                         [self.soup.pk])
+        self.assertEqual(similar.changed_recipes(), set())
+
+
+class AuthorStatsTests(TestCase):
+
+    def setUp(self):
+        self.cook, self.baker, self.fan, self.critic = [
+            User.objects.create_user(name)
+            for name in ['cook', 'baker', 'fan', 'critic']]
+        self.toast, self.jam = (make_recipe(self.cook),
+                                make_recipe(self.cook, title='Jam'))
+        self.cake = make_recipe(self.baker, title='Cake')
+        for user in (self.fan, self.critic):
+            UserLikes.objects.create(user=user, recipe=self.toast)
+        Rating.objects.create(user=self.fan, recipe=self.toast,
+                              rating_value=5)
+        Rating.objects.create(user=self.critic, recipe=self.jam,
+                              rating_value=2)
+        Rating.objects.create(user=self.fan, recipe=self.jam,
+                              rating_value=2)
+        Rating.objects.create(user=self.fan, recipe=self.cake,
+                              rating_value=4)
+        refresh_cards([self.toast.pk, self.jam.pk, self.cake.pk])
+
+    def test_stats_are_summed_from_the_cards(self):
+        stats = author_stats(self.cook)
+        self.assertEqual(
+            (stats.recipe_count, stats.public_recipe_count, stats.like_count,
+             stats.rating_count, stats.average_rating),
+            (2, 2, 2, 3, 3))
+
+        self.jam.is_public = False
+        self.jam.save()
+        refresh_cards([self.jam.pk])
+        stats = author_stats(self.cook)
+        self.assertEqual(
+            (stats.recipe_count, stats.public_recipe_count,
+             stats.rating_count, stats.average_rating),
+            (2, 1, 1, 5))
+
+    def test_leaderboards_rank_active_authors(self):
+        self.assertEqual(rebuild_leaderboards(), {
+            LeaderboardEntry.ALL_TIME: 2, LeaderboardEntry.LAST_30_DAYS: 2})
+        self.assertEqual(
+            [(entry.author, entry.score)
+             for entry in leaderboard(LeaderboardEntry.ALL_TIME)],
+            [('cook', 5), ('baker', 1)])
+        self.assertContains(
+            self.client.get(reverse('top_cooks'), {'period': '30d'}),
+            'baker')
+
+        User.objects.filter(pk=self.cook.pk).update(is_active=False)
+        rebuild_leaderboards()
+        self.assertEqual(
+            [entry.author
+             for entry in leaderboard(LeaderboardEntry.LAST_30_DAYS)],
+            ['baker'])
+
+
+class RecipeContentsTests(TestCase):
+    """Saving whole ingredient and step lists (recipes.authoring)."""
+
+    def setUp(self):
+        self.recipe = make_recipe(User.objects.create_user('cook'))
+        self.steps = [RecipeStep.objects.create(
+            recipe=self.recipe, step_number=number, instruction=text)
+            for number, text in enumerate(['Slice', 'Toast', 'Butter'], 1)]
+        StepImage.objects.create(step=self.steps[2], image_url='placeholder',
+                                 display_order=1)
+
+    def submitted(self):
+        return [{'id': step.pk,
+                 **{name: getattr(step, name) for name in STEP_FIELDS}}
+                for step in self.steps]
+
+    def test_unchanged_lists_write_nothing(self):
+        touched = Recipe.objects.get(pk=self.recipe.pk).updated_at
+        ingredients, steps = save_recipe_contents(
+            self.recipe, ingredients=[], steps=self.submitted())
+        self.assertFalse(ingredients or steps)
+        self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).updated_at,
+                         touched)
+
+    def test_only_the_difference_is_written(self):
+        touched = Recipe.objects.get(pk=self.recipe.pk).updated_at
+        slice_, toast, _ = self.submitted()
+        toast['instruction'] = 'Toast both sides'
+        slice_['step_number'], toast['step_number'] = 2, 1
+        new = {'step_number': 3, 'instruction': 'Serve',
+               'estimated_time': None}
+
+        _, changes = save_recipe_contents(self.recipe,
+                                          steps=[toast, slice_, new])
+        self.assertEqual(len(changes.created), 1)
+        self.assertEqual(
+            sorted(fields for _, fields in changes.updated),
+            [['step_number'], ['step_number', 'instruction']])
+        self.assertEqual(changes.deleted, [self.steps[2]])
+        self.assertEqual(
+            list(self.recipe.recipestep_set.order_by('step_number')
+                 .values_list('instruction', flat=True)),
+            ['Toast both sides', 'Slice', 'Serve'])
+        self.assertFalse(StepImage.objects.exists())
+        self.assertGreater(Recipe.objects.get(pk=self.recipe.pk).updated_at,
+                           touched)
+
+    def test_rows_of_other_recipes_are_refused(self):
+        other = make_recipe(self.recipe.user, title='Jam')
+        with self.assertRaises(ValueError):
+            save_recipe_contents(other, steps=self.submitted())
+        self.assertEqual(self.recipe.recipestep_set.count(), 3)
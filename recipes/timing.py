@@ -0,0 +1,173 @@
+"""
+Recipe times: time-bucket tags and checking step times.
+
+Recipe.total_minutes (prep + cook) is a generated, indexed column, so
+time questions are answered by the database. This module builds on it:
+
+- Time tags. Tags of tag_type 'time' whose name reads like a limit -
+  "Under 30 min", "Less than 1 hour", "Over 2 hours" - are assigned to
+  exactly the recipes inside that limit, in bulk. "Under" limits
+  include the limit itself (a 30 minute recipe is "Under 30 min"). Time
+  tags whose names don't read like a limit are left alone.
+
+- Step times. The estimated_time of a recipe's steps should add up to
+  roughly its total time. step_time_mismatches() finds the recipes
+  where they don't, in one grouped query.
+"""
+import re
+
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from search.cache import recipes_changed
+from tags.models import RecipeTag, Tag
+from .cards import refresh_cards
+from .deletion import raw_delete
+from .models import Recipe
+
+
+CHUNK_SIZE = 500
+# Step times may differ from the total by this much before it counts
+# as a mismatch (steps often overlap, and prep isn't always a step)
+STEP_TOLERANCE = 0.25
+
+_LIMIT = re.compile(
+    r'\b(under|less than|within|up to|over|more than)\s+'
+    r'(\d+)\s*(m|min|mins|minutes?|h|hr|hrs|hours?)\b')
+
+
+def parse_time_tag(name):
+    """
+    The total_minutes range a time tag's name describes, as
+    (low, high) with None for no bound - or None if the name isn't a
+    time limit. "Under 30 min" -> (None, 30), "Over 1 hour" -> (61, None).
+    """
+    match = _LIMIT.search(name.lower())
+    if not match:
+        return None
+    word, amount, unit = match.groups()
+    minutes = int(amount) * (60 if unit.startswith('h') else 1)
+    if word in ('over', 'more than'):
+        return minutes + 1, None
+    return None, minutes
+
+
+def time_tag_ranges():
+    """{tag id: (low, high)} for every time tag that reads as a limit."""
+    ranges = {}
+    for tag_id, name in Tag.objects.filter(tag_type='time').values_list(
+            'id', 'name'):
+        bounds = parse_time_tag(name)
+        if bounds:
+            ranges[tag_id] = bounds
+    return ranges
+
+
+def _in_range(minutes, bounds):
+    low, high = bounds
+    return ((low is None or minutes >= low)
+            and (high is None or minutes <= high))
+
+
+def assign_time_tags(recipe_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    Give recipes exactly the time tags their total time falls inside,
+    ``chunk_size`` recipes at a time (None means every recipe). Only
+    rows that need to change are written; recipes that gained or lost a
+    tag are touched and get their card rebuilt.
+    Returns (tags added, tags removed).
+    """
+    ranges = time_tag_ranges()
+    if not ranges:
+        return 0, 0
+    if recipe_ids is None:
+        chunks = _all_recipe_chunks(chunk_size)
+    else:
+        recipe_ids = list(recipe_ids)
+        chunks = (recipe_ids[start:start + chunk_size]
+                  for start in range(0, len(recipe_ids), chunk_size))
+
+    added = removed = 0
+    for chunk in chunks:
+        wanted = {
+            (recipe_id, tag_id)
+            for recipe_id, minutes in Recipe.all_objects.filter(
+                id__in=chunk).values_list('id', 'total_minutes')
+            for tag_id, bounds in ranges.items()
+            if _in_range(minutes, bounds)
+        }
+        existing = {
+            (recipe_id, tag_id): pk
+            for pk, recipe_id, tag_id in RecipeTag.objects.filter(
+                recipe_id__in=chunk, tag_id__in=list(ranges),
+            ).values_list('id', 'recipe_id', 'tag_id')
+        }
+        to_add = wanted - set(existing)
+        to_remove = set(existing) - wanted
+        if not to_add and not to_remove:
+            continue
+        # Bulk writes skip the per-row signal handlers; the recipes are
+        # touched and their cards rebuilt once below instead
+        now = timezone.now()
+        RecipeTag.objects.bulk_create(
+            [RecipeTag(recipe_id=recipe_id, tag_id=tag_id, created_at=now)
+             for recipe_id, tag_id in to_add],
+            ignore_conflicts=True)
+        raw_delete(RecipeTag, 'id', [existing[pair] for pair in to_remove])
+        changed = {recipe_id for recipe_id, _ in to_add | to_remove}
+        Recipe.all_objects.filter(id__in=changed).update(updated_at=now)
+        refresh_cards(changed)
+        recipes_changed(tag_ids={tag_id for _, tag_id in to_add | to_remove})
+        added += len(to_add)
+        removed += len(to_remove)
+    return added, removed
+
+
+def _all_recipe_chunks(chunk_size):
+    last_id = 0
+    while True:
+        chunk = list(Recipe.all_objects.filter(id__gt=last_id).order_by(
+            'id').values_list('id', flat=True)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def step_time_mismatches(tolerance=STEP_TOLERANCE):
+    """
+    Recipes whose step times don't add up to their total time, as a
+    queryset of dicts (id, title, total_minutes, step_minutes, steps,
+    timed_steps). A recipe is listed when its steps take longer than
+    the whole recipe, or when every step has a time and together they
+    fall short of the total by more than ``tolerance``.
+    """
+    return Recipe.all_objects.annotate(
+        step_minutes=Sum('recipestep__estimated_time'),
+        steps=Count('recipestep'),
+        timed_steps=Count('recipestep__estimated_time'),
+    ).filter(
+        Q(step_minutes__gt=F('total_minutes'))
+        | Q(steps__gt=0, timed_steps=F('steps'),
+            step_minutes__lt=F('total_minutes') * (1 - tolerance))
+    ).order_by('id').values(
+        'id', 'title', 'total_minutes', 'step_minutes', 'steps',
+        'timed_steps',
+    )
+
+
+def fix_understated_times(recipe_ids):
+    """
+    Raise cook_time so the total is at least the sum of the step times,
+    for recipes where the steps take longer. Saved one by one so the
+    usual signal handlers refresh everything derived from the recipe.
+    Returns how many recipes were changed.
+    """
+    fixed = 0
+    for recipe in Recipe.all_objects.filter(id__in=list(recipe_ids)).annotate(
+            step_minutes=Sum('recipestep__estimated_time')):
+        if recipe.step_minutes and recipe.step_minutes > recipe.total_time():
+            recipe.cook_time = recipe.step_minutes - recipe.prep_time
+            recipe.save(update_fields=['cook_time', 'updated_at'])
+            fixed += 1
+    return fixed
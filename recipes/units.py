@@ -0,0 +1,119 @@
+"""
+Unit table and conversions for recipe quantities.
+
+Every unit belongs to a dimension (mass, volume or count) and has a factor
+that converts it to that dimension's base unit (grams, millilitres or
+pieces). Two units can only be converted if they share a dimension.
+"""
+
+MASS = 'mass'
+VOLUME = 'volume'
+COUNT = 'count'
+
+# Canonical unit -> (dimension, how many base units one of it is)
+UNITS = {
+    # mass - base unit is grams
+    'mg': (MASS, 0.001),
+    'g': (MASS, 1.0),
+    'kg': (MASS, 1000.0),
+    'oz': (MASS, 28.349523125),
+    'lb': (MASS, 453.59237),
+    # volume - base unit is millilitres
+    'ml': (VOLUME, 1.0),
+    'cl': (VOLUME, 10.0),
+    'dl': (VOLUME, 100.0),
+    'l': (VOLUME, 1000.0),
+    'tsp': (VOLUME, 4.92892159375),
+    'tbsp': (VOLUME, 14.78676478125),
+    'fl oz': (VOLUME, 29.5735295625),
+    'cup': (VOLUME, 236.5882365),
+    'pint': (VOLUME, 473.176473),
+    'pinch': (VOLUME, 0.3125),
+    'dash': (VOLUME, 0.625),
+    # count - base unit is pieces
+    'piece': (COUNT, 1.0),
+    'dozen': (COUNT, 12.0),
+}
+
+# Base unit for each dimension
+BASE_UNITS = {MASS: 'g', VOLUME: 'ml', COUNT: 'piece'}
+
+# Spellings people actually type -> canonical unit
+ALIASES = {
+    'milligram': 'mg', 'milligrams': 'mg',
+    'gram': 'g', 'grams': 'g', 'gr': 'g', 'grm': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg', 'kilo': 'kg', 'kilos': 'kg',
+    'kgs': 'kg',
+    'ounce': 'oz', 'ounces': 'oz',
+    'pound': 'lb', 'pounds': 'lb', 'lbs': 'lb',
+    'millilitre': 'ml', 'millilitres': 'ml', 'milliliter': 'ml',
+    'milliliters': 'ml', 'mls': 'ml',
+    'centilitre': 'cl', 'centilitres': 'cl', 'centiliter': 'cl',
+    'centiliters': 'cl',
+    'decilitre': 'dl', 'decilitres': 'dl', 'deciliter': 'dl',
+    'deciliters': 'dl',
+    'litre': 'l', 'litres': 'l', 'liter': 'l', 'liters': 'l', 'ltr': 'l',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp', 'tsps': 'tsp', 't': 'tsp',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbsps': 'tbsp',
+    'tbs': 'tbsp', 'tbl': 'tbsp', 'tbl.': 'tbsp', 'T': 'tbsp',
+    'fluid ounce': 'fl oz', 'fluid ounces': 'fl oz', 'floz': 'fl oz',
+    'fl. oz': 'fl oz', 'fl. oz.': 'fl oz',
+    'cups': 'cup', 'c': 'cup',
+    'pints': 'pint', 'pt': 'pint',
+    'pinches': 'pinch', 'dashes': 'dash',
+    'pieces': 'piece', 'pc': 'piece', 'pcs': 'piece', 'each': 'piece',
+    'whole': 'piece', 'item': 'piece', 'items': 'piece', 'x': 'piece',
+    'dozens': 'dozen', 'doz': 'dozen',
+}
+
+
+def normalize_unit(unit):
+    """
+    Return the canonical unit for whatever was typed, or None if unknown.
+    'Grams' -> 'g', 'Tablespoons' -> 'tbsp', 'handful' -> None
+    """
+    if not unit:
+        return None
+    text = unit.strip()
+    # Single letter 'T' (tablespoon) vs 't' (teaspoon) is case sensitive
+    if text in ALIASES:
+        return ALIASES[text]
+    text = text.lower().rstrip('.')
+    if text in UNITS:
+        return text
+    return ALIASES.get(text)
+
+
+def unit_dimension(unit):
+    """'kg' -> 'mass', 'cups' -> 'volume', 'handful' -> None"""
+    canonical = normalize_unit(unit)
+    return UNITS[canonical][0] if canonical else None
+
+
+def to_base(quantity, unit):
+    """
+    Convert a quantity to its dimension's base unit.
+    Returns (amount, base_unit) or (None, None) for unknown units.
+    """
+    canonical = normalize_unit(unit)
+    if canonical is None:
+        return None, None
+    dimension, factor = UNITS[canonical]
+    return float(quantity) * factor, BASE_UNITS[dimension]
+
+
+def convert(quantity, from_unit, to_unit):
+    """
+    Convert between two units of the same dimension.
+    Returns None when the units are unknown or can't be converted
+    (e.g. grams to cups would need the ingredient's density).
+    """
+    source = normalize_unit(from_unit)
+    target = normalize_unit(to_unit)
+    if source is None or target is None:
+        return None
+    source_dimension, source_factor = UNITS[source]
+    target_dimension, target_factor = UNITS[target]
+    if source_dimension != target_dimension:
+        return None
+    return float(quantity) * source_factor / target_factor
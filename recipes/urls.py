@@ -1,6 +1,38 @@
 from django.urls import path
-from . import views
+from . import api, sitemaps, views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
+    path('recipes/<int:pk>/', views.recipe_detail_view, name='recipe_detail'),
+    path('tags/<int:pk>/', views.tag_recipes_view, name='tag_recipes'),
+    path('users/<str:username>/', views.user_recipes_view,
+         name='user_recipes'),
+    path('cooks/', views.top_cooks_view, name='top_cooks'),
+
+    # Sitemaps for search engines
+    path('sitemap.xml', sitemaps.sitemap_index_view, name='sitemap_index'),
+    path('sitemap-<str:section>-<int:segment>.xml',
+         sitemaps.sitemap_segment_view, name='sitemap_segment'),
+
+    # JSON read API
+    path('api/recipes/', api.recipe_list_api, name='api_recipe_list'),
+    path('api/recipes/batch/', api.recipe_batch_api,
+         name='api_recipe_batch'),
+    path('api/recipes/<int:pk>/', api.recipe_detail_api,
+         name='api_recipe_detail'),
+    path('api/recipes/<int:pk>/comments/', api.recipe_comments_api,
+         name='api_recipe_comments'),
+    path('api/ingredients/', api.ingredient_list_api,
+         name='api_ingredient_list'),
+    path('api/ingredients/<int:pk>/', api.ingredient_detail_api,
+         name='api_ingredient_detail'),
+    path('api/tags/', api.tag_list_api, name='api_tag_list'),
+    path('api/tags/<int:pk>/recipes/', api.tag_recipes_api,
+         name='api_tag_recipes'),
+    path('api/users/<str:username>/recipes/', api.user_recipes_api,
+         name='api_user_recipes'),
+    path('api/shopping-list/', api.shopping_list_api,
+         name='api_shopping_list'),
+    path('api/meal-plan/', api.meal_plan_api, name='api_meal_plan'),
+    path('api/feed/', api.feed_api, name='api_feed'),
 ]
@@ -1,11 +1,112 @@
-from django.shortcuts import render
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.shortcuts import get_object_or_404, render
+from django.views.decorators.http import condition
+
+from tags.models import RecipeTag
+from . import masterdata
+from .authors import author_stats, leaderboard
+from .cards import public_cards
+from .conditional import recipe_last_modified, recipe_page_etag
+from .models import LeaderboardEntry, Recipe
+
+CARDS_PER_PAGE = 24
+SIMILAR_RECIPES = 6
 
 # Create your views here.
 
+def _card_page(request, cards):
+    """
+    One page of recipe cards, newest first, and the ?before= value for
+    the next page (None on the last page). A single query.
+    """
+    cards = cards.order_by('-recipe_id')
+    before = request.GET.get('before', '')
+    if before.isdecimal():
+        cards = cards.filter(recipe_id__lt=before)
+    page = list(cards[:CARDS_PER_PAGE + 1])
+    has_more = len(page) > CARDS_PER_PAGE
+    page = page[:CARDS_PER_PAGE]
+    return page, page[-1].recipe_id if has_more else None
+
+
 def home_view(request):
     """
     This function handles requests to the home page
     - request: Django automatically passes this - contains info about the user's request
     - render(): Takes the request + template name + data, returns HTML response
+    The newest public recipes come straight from the recipe cards.
+    """
+    cards, next_before = _card_page(request, public_cards())
+    return render(request, 'recipes/home.html',
+                  {'cards': cards, 'next_before': next_before})
+
+
+def tag_recipes_view(request, pk):
+    """Every public recipe with one tag, as cards."""
+    tag = masterdata.tags().by_id.get(pk)
+    if tag is None:
+        raise Http404('No such tag')
+    cards, next_before = _card_page(
+        request, public_cards().filter(recipe__recipetag__tag_id=pk))
+    return render(request, 'recipes/tag_recipes.html',
+                  {'tag': tag, 'cards': cards, 'next_before': next_before})
+
+
+def user_recipes_view(request, username):
+    """A user's profile page: their public recipes, as cards."""
+    author = get_object_or_404(User, username=username, is_active=True)
+    cards, next_before = _card_page(
+        request, public_cards().filter(user=author))
+    return render(request, 'recipes/user_recipes.html', {
+        'author': author, 'stats': author_stats(author),
+        'cards': cards, 'next_before': next_before,
+    })
+
+
+def top_cooks_view(request):
+    """
+    The "top cooks" leaderboard - all time, or ?period=30d for the last
+    30 days. Read from the stored board in one query.
+    """
+    recent = request.GET.get('period') == '30d'
+    board = (LeaderboardEntry.LAST_30_DAYS if recent
+             else LeaderboardEntry.ALL_TIME)
+    return render(request, 'recipes/top_cooks.html',
+                  {'entries': leaderboard(board), 'recent': recent})
+
+
+@condition(etag_func=recipe_page_etag, last_modified_func=recipe_last_modified)
+def recipe_detail_view(request, pk):
+    """
+    Show a single public recipe.
+    The @condition decorator answers 304 Not Modified when the browser's
+    copy is still current, so this body only runs when something changed.
     """
-    return render(request, 'recipes/home.html')
\ No newline at end of file
+    recipe = get_object_or_404(
+        Recipe.objects.public().select_related('user'), pk=pk
+    )
+    # Ingredient and tag names come from the in-process cache, not joins
+    ingredients = masterdata.ingredients().by_id
+    tags = masterdata.tags().by_id
+    context = {
+        'recipe': recipe,
+        'ingredients': [
+            {**row, 'name': ingredients[row['ingredient_id']].name
+             if row['ingredient_id'] in ingredients else ''}
+            for row in recipe.recipeingredient_set.values(
+                'ingredient_id', 'quantity_display', 'notes')
+        ],
+        'steps': recipe.recipestep_set.prefetch_related('stepimage_set'),
+        'tags': [tags[tag_id] for tag_id in RecipeTag.objects.filter(
+            recipe=recipe).values_list('tag_id', flat=True)
+            if tag_id in tags],
+        'comments': recipe.comment_set.filter(
+            user__is_active=True).select_related('user').order_by(
+            'created_at'),
+        # Precomputed by recipes.similar - one indexed lookup
+        'similar': public_cards().filter(
+            recipe__similar_of__recipe=recipe,
+        ).order_by('-recipe__similar_of__score')[:SIMILAR_RECIPES],
+    }
+    return render(request, 'recipes/recipe_detail.html', context)
@@ -1,7 +1,28 @@
 from django.contrib import admin
+from .fuzzy import fuzzy_search
 from .models import SearchHistory
 
 
+class FuzzySearchMixin:
+    """
+    Makes an admin's search box forgive typos: rows whose
+    ``fuzzy_search_field`` roughly matches the search are shown as well as
+    the normal exact matches. Autocomplete widgets pointing at this model
+    use the same search, so they get it too.
+    """
+    fuzzy_search_field = None
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term)
+        if search_term and self.fuzzy_search_field:
+            fuzzy_ids = fuzzy_search(queryset, self.fuzzy_search_field,
+                                     search_term)
+            if fuzzy_ids:
+                results |= queryset.filter(pk__in=fuzzy_ids)
+        return results, may_have_duplicates
+
+
 @admin.register(SearchHistory)
 class SearchHistoryAdmin(admin.ModelAdmin):
     """
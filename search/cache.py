@@ -0,0 +1,186 @@
+"""
+Cache of search results: ranked recipe ids (and the "did you mean"
+hint) per normalised query and filters.
+
+Entries live in each process's memory - at most MAX_ENTRIES, least
+recently used evicted first, each for at most TTL seconds.
+
+Invalidation is targeted. A recipe can only start or stop matching a
+search if it shares a trigram (three letters in a row) with the query:
+exact matches contain the whole query, so every trigram of it, and
+fuzzy matches share at least one of its words' (space padded) trigrams.
+So trigrams are hashed into BUCKETS buckets, and each bucket has a
+"last changed" time in the shared cache. When a
+recipe is created, edited, unpublished or deleted, the buckets of its
+old and new title are stamped (one set_many); a cached entry is only
+used if none of its query's buckets changed after it was filled. Tag
+filters get a bucket per tag, stamped when recipes gain or lose the tag.
+
+Hits, misses, invalidations and evictions are counted in the shared
+cache - see stats().
+"""
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from .fuzzy import trigrams
+
+
+MAX_ENTRIES = 1000
+TTL = 60 * 5
+BUCKETS = 4096
+# Everything changed (ingredients edited, bulk deletes) - stamped to
+# invalidate every entry at once
+EVERYTHING = 'search:stamp:all'
+OUTCOMES = ['hit', 'miss', 'invalidated', 'evicted']
+
+
+def normalize_query(query):
+    """Lower case, single spaces - "Vegan  Dessert" == "vegan dessert"."""
+    return ' '.join(query.lower().split())
+
+
+def cache_key(query, tag_ids=(), max_time=None):
+    tags = ','.join(map(str, sorted(set(tag_ids))))
+    return f'{normalize_query(query)}|tags={tags}|max_time={max_time}'
+
+
+def _raw_trigrams(text):
+    """Every run of three characters (a substring shares all of them)."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _bucket(gram):
+    return f'search:stamp:{zlib.crc32(gram.encode()) % BUCKETS}'
+
+
+def _tag_bucket(tag_id):
+    return f'search:stamp:tag:{tag_id}'
+
+
+def _text_buckets(text, fuzzy=True):
+    text = normalize_query(text)
+    grams = _raw_trigrams(text)
+    if fuzzy:
+        grams |= trigrams(text)
+    return {_bucket(gram) for gram in grams}
+
+
+def dependencies(query, tag_ids=(), fuzzy=False):
+    """
+    The stamp keys a cached result for this search depends on. Results
+    that came from the fuzzy fallback depend on more (and more common)
+    trigrams than exact ones, so they are dropped more often.
+    """
+    keys = _text_buckets(query, fuzzy) | {EVERYTHING}
+    if len(normalize_query(query)) < 3:
+        # Too short to have a trigram; any title change may matter
+        keys.add(_bucket(''))
+    return sorted(keys | {_tag_bucket(tag_id) for tag_id in tag_ids})
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+
+def recipes_changed(titles=(), tag_ids=()):
+    """
+    Recipes with these titles (before and after the change) and/or these
+    tags changed - drop the cached searches they could affect.
+    """
+    keys = {_bucket('')}
+    for title in titles:
+        keys |= _text_buckets(title or '')
+    keys |= {_tag_bucket(tag_id) for tag_id in tag_ids}
+    cache.set_many(dict.fromkeys(keys, time.time()), None)
+
+
+def invalidate_all():
+    cache.set(EVERYTHING, time.time(), None)
+
+
+# ---------------------------------------------------------------------------
+# The cache itself
+# ---------------------------------------------------------------------------
+
+class SearchResultCache:
+    """LRU of {key: (filled_at, dependencies, recipe_ids, suggestion)}."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """(recipe_ids, suggestion), or None when missing or stale."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None:
+            count('miss')
+            return None
+        filled_at, keys, recipe_ids, suggestion = entry
+        stamps = cache.get_many(keys)
+        if (time.time() - filled_at > self.ttl
+                or any(stamp >= filled_at for stamp in stamps.values())):
+            with self.lock:
+                self.entries.pop(key, None)
+            count('invalidated')
+            return None
+        count('hit')
+        return recipe_ids, suggestion
+
+    def put(self, key, filled_at, keys, recipe_ids, suggestion):
+        """
+        Store a result. ``filled_at`` must be taken before the search
+        ran, so changes made while it was running invalidate it.
+        """
+        evicted = 0
+        with self.lock:
+            self.entries[key] = (filled_at, keys, list(recipe_ids),
+                                 suggestion)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            count('evicted', evicted)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+results = SearchResultCache()
+
+
+# ---------------------------------------------------------------------------
+# Stats
+# ---------------------------------------------------------------------------
+
+def counter_key(outcome):
+    return f'search:cache:{outcome}'
+
+
+def count(outcome, amount=1):
+    key = counter_key(outcome)
+    if not cache.add(key, amount, None):
+        try:
+            cache.incr(key, amount)
+        except ValueError:  # evicted between add() and incr()
+            cache.add(key, amount, None)
+
+
+def stats():
+    """Counts since the counters were last reset, plus the hit rate."""
+    values = cache.get_many([counter_key(outcome) for outcome in OUTCOMES])
+    counts = {outcome: values.get(counter_key(outcome), 0)
+              for outcome in OUTCOMES}
+    lookups = counts['hit'] + counts['miss'] + counts['invalidated']
+    counts['hit_rate'] = round(counts['hit'] / lookups, 3) if lookups else 0
+    return counts
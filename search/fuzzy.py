@@ -0,0 +1,174 @@
+"""
+Typo-tolerant ("fuzzy") search using trigrams.
+
+A trigram is three letters in a row. Words are padded the way Postgres's
+pg_trgm extension does it, so "egg" becomes "  e", " eg", "egg", "gg ".
+Two spellings of a word share most of their trigrams even when one is
+misspelt ("zuchini" and "zucchini" share 7 of 10), so ranking by shared
+trigrams finds what the user meant.
+
+- On Postgres the work is done by pg_trgm, using the GIN trigram indexes
+  from recipes migration 0008.
+- Everywhere else (SQLite in development) an in-process TrigramIndex is
+  built per model and field, and rebuilt after that model changes (a
+  version stamp in the cache is bumped - see recipes.masterdata).
+
+fuzzy_search() returns matching primary keys, best first, either way.
+"""
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection, transaction
+
+from recipes.masterdata import current_version
+from recipes.models import Ingredient, Recipe
+
+
+# How alike a query word and an indexed word must be (0 to 1)
+FUZZY_THRESHOLD = 0.35
+DEFAULT_LIMIT = 20
+
+_WORD = re.compile(r'[a-z0-9]+')
+
+
+def _words(text):
+    return _WORD.findall(text.lower())
+
+
+def word_trigrams(word):
+    """pg_trgm style trigrams of one lower-case word."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigrams(text):
+    """All trigrams of a piece of text."""
+    grams = set()
+    for word in _words(text):
+        grams |= word_trigrams(word)
+    return grams
+
+
+class TrigramIndex:
+    """
+    Trigram index over the words of some texts, kept in memory.
+
+    A text's score for a query is the average, over the query's words,
+    of the best trigram similarity with any word in that text - close to
+    what pg_trgm's word_similarity() gives.
+    """
+
+    def __init__(self, entries):
+        self.word_ids = defaultdict(set)     # word -> ids of texts with it
+        self.word_grams = {}                 # word -> its trigrams
+        self.postings = defaultdict(set)     # trigram -> words with it
+        for pk, text in entries:
+            for word in _words(text or ''):
+                self.word_ids[word].add(pk)
+                if word not in self.word_grams:
+                    grams = word_trigrams(word)
+                    self.word_grams[word] = grams
+                    for gram in grams:
+                        self.postings[gram].add(word)
+
+    def similar_words(self, word, threshold=FUZZY_THRESHOLD):
+        """{indexed word: similarity} for words ``threshold`` alike."""
+        grams = word_trigrams(word)
+        shared = defaultdict(int)
+        for gram in grams:
+            for candidate in self.postings.get(gram, ()):
+                shared[candidate] += 1
+        similar = {}
+        for candidate, count in shared.items():
+            score = count / (len(grams) + len(self.word_grams[candidate])
+                             - count)
+            if score >= threshold:
+                similar[candidate] = score
+        return similar
+
+    def search(self, query, threshold=FUZZY_THRESHOLD, limit=DEFAULT_LIMIT):
+        """[(pk, score)] best first."""
+        words = _words(query)
+        if not words:
+            return []
+        totals = defaultdict(float)
+        for word in words:
+            best = {}
+            for similar, score in self.similar_words(word, threshold).items():
+                for pk in self.word_ids[similar]:
+                    if score > best.get(pk, 0):
+                        best[pk] = score
+            for pk, score in best.items():
+                totals[pk] += score
+        ranked = [(pk, total / len(words)) for pk, total in totals.items()
+                  if total / len(words) >= threshold]
+        ranked.sort(key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+_indexes = {}
+
+
+def get_index(model, field):
+    """This process's TrigramIndex for model.field, rebuilt if stale."""
+    version = current_version(model)
+    cached = _indexes.get((model, field))
+    if cached is None or cached[0] != version:
+        index = TrigramIndex(
+            model._default_manager.values_list('pk', field).iterator())
+        cached = _indexes[(model, field)] = (version, index)
+    return cached[1]
+
+
+def _uses_pg_trgm():
+    return connection.vendor == 'postgresql'
+
+
+def fuzzy_search(queryset, field, term, limit=DEFAULT_LIMIT,
+                 threshold=FUZZY_THRESHOLD):
+    """
+    Primary keys of rows in ``queryset`` whose ``field`` roughly matches
+    ``term``, best match first.
+    """
+    term = term.strip()
+    if not term:
+        return []
+    if _uses_pg_trgm():
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # threshold for the index-backed <% operator, this
+                # transaction only
+                cursor.execute(
+                    'SET LOCAL pg_trgm.word_similarity_threshold = %s',
+                    [threshold])
+            return list(
+                queryset.filter(**{f'{field}__trigram_word_similar': term})
+                .annotate(similarity=TrigramWordSimilarity(term, field))
+                .order_by('-similarity', 'pk')
+                .values_list('pk', flat=True)[:limit]
+            )
+
+    # Ask for extra matches as some may be outside the queryset
+    ranked = get_index(queryset.model, field).search(term, threshold,
+                                                     limit * 5)
+    if not ranked:
+        return []
+    allowed = set(queryset.filter(
+        pk__in=[pk for pk, _ in ranked]).values_list('pk', flat=True))
+    return [pk for pk, _ in ranked if pk in allowed][:limit]
+
+
+def did_you_mean(term):
+    """
+    The public recipe title or ingredient name closest to ``term``, for
+    a "Did you mean ...?" hint when a search finds nothing. None if
+    nothing is close.
+    """
+    for queryset, field in ((Recipe.objects.public(), 'title'),
+                            (Ingredient.objects.all(), 'name')):
+        best = fuzzy_search(queryset, field, term, limit=1)
+        if best:
+            return queryset.filter(pk=best[0]).values_list(
+                field, flat=True).first()
+    return None
@@ -0,0 +1,53 @@
+"""
+Signal handlers for the search app.
+
+Any change to recipes makes the in-process trigram indexes stale (see
+search.fuzzy), so their version number is bumped. Ingredients are
+bumped by recipes.signals, as the master data cache uses the same stamp.
+
+Cached search results (see search.cache) are dropped more selectively:
+a recipe change only affects searches sharing trigrams with its old or
+new title, and a tag change only searches filtered by that tag.
+Ingredient names feed "did you mean" hints, so changing one drops all.
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.masterdata import bump_version
+from recipes.models import Ingredient, Recipe
+from tags.models import RecipeTag
+from . import cache
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def searchable_changed(sender, **kwargs):
+    bump_version(sender)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_old_title(sender, instance, **kwargs):
+    # A renamed recipe stops matching searches for its old title
+    instance._title_before_save = None
+    if instance.pk:
+        instance._title_before_save = Recipe.all_objects.filter(
+            pk=instance.pk).values_list('title', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    old_title = getattr(instance, '_title_before_save', None)
+    cache.recipes_changed(titles={instance.title, old_title} - {None})
+
+
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+def recipe_tag_changed(sender, instance, **kwargs):
+    cache.recipes_changed(tag_ids=[instance.tag_id])
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    cache.invalidate_all()
@@ -1,3 +1,94 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache as shared_cache
 from django.test import TestCase
 
-# Create your tests here.
+from recipes.models import Ingredient, Recipe
+from tags.models import RecipeTag, Tag
+from . import cache
+from .fuzzy import TrigramIndex, fuzzy_search
+
+
+def make_recipe(user, title):
+    return Recipe.objects.create(
+        user=user, title=title, prep_time=1, cook_time=2, base_servings=1,
+        difficulty_level='Easy')
+
+
+class TrigramIndexTests(TestCase):
+
+    def test_typos_find_the_word_meant(self):
+        index = TrigramIndex([(1, 'Zucchini fritters'),
+                              (2, 'Cucumber salad'),
+                              (3, 'Stuffed zucchini boats')])
+        self.assertEqual([pk for pk, _ in index.search('zuchini')], [1, 3])
+        self.assertEqual(index.search('zuchini fritters')[0][0], 1)
+        self.assertEqual(index.search('xyz'), [])
+
+    def test_index_follows_edits(self):
+        ingredient = Ingredient.objects.create(name='Zucchini')
+        self.assertEqual(
+            fuzzy_search(Ingredient.objects.all(), 'name', 'zuchini'),
+            [ingredient.pk])
+        ingredient.name = 'Courgette'
+        ingredient.save()
+        self.assertEqual(
+            fuzzy_search(Ingredient.objects.all(), 'name', 'zuchini'), [])
+        self.assertEqual(
+            fuzzy_search(Ingredient.objects.all(), 'name', 'corgette'),
+            [ingredient.pk])
+
+
+class SearchApiTests(TestCase):
+
+    def setUp(self):
+        shared_cache.clear()
+        cache.results.clear()
+        self.user = User.objects.create_user('cook')
+        self.fritters = make_recipe(self.user, 'Zucchini fritters')
+        self.salad = make_recipe(self.user, 'Cucumber salad')
+
+    def search(self, query):
+        return self.client.get('/api/search/',
+                               {'q': query, 'fields': 'title'}).json()
+
+    def test_exact_matches_then_typo_tolerant_fallback(self):
+        self.assertEqual(self.search('SALAD'), {
+            'results': [{'id': self.salad.pk, 'title': 'Cucumber salad'}],
+            'did_you_mean': None})
+        self.assertEqual(self.search('zuchini fritters'), {
+            'results': [{'id': self.fritters.pk,
+                         'title': 'Zucchini fritters'}],
+            'did_you_mean': 'Zucchini fritters'})
+
+    def test_repeat_searches_come_from_the_cache(self):
+        self.search('salad')
+        self.search('Salad ')
+        self.assertEqual(cache.stats()['hit'], 1)
+
+        # Editing a recipe that can't match leaves the entry alone...
+        self.fritters.description = 'Crispy'
+        self.fritters.save()
+        self.search('salad')
+        self.assertEqual(cache.stats()['hit'], 2)
+
+        # ...one that can drops it, and the new title is found
+        self.fritters.title = 'Zucchini salad'
+        self.fritters.save()
+        results = self.search('salad')['results']
+        self.assertEqual(cache.stats()['invalidated'], 1)
+        self.assertEqual([row['id'] for row in results],
+                         [self.salad.pk, self.fritters.pk])
+
+    def test_tagging_a_recipe_drops_searches_filtered_by_the_tag(self):
+        tag = Tag.objects.create(name='Summer', tag_type='course')
+        RecipeTag.objects.create(recipe=self.salad, tag=tag)
+        potato = make_recipe(self.user, 'Potato salad')
+        query = {'q': 'salad', 'tag': tag.pk, 'fields': 'id'}
+
+        def found():
+            response = self.client.get('/api/search/', query)
+            return [row['id'] for row in response.json()['results']]
+
+        self.assertEqual(found(), [self.salad.pk])
+        RecipeTag.objects.create(recipe=potato, tag=tag)
+        self.assertEqual(found(), [potato.pk, self.salad.pk])
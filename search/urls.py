@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('api/search/', views.recipe_search_api, name='recipe_search_api'),
+    path('api/search/cache/', views.search_cache_stats_api,
+         name='search_cache_stats_api'),
+]
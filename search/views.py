@@ -1,3 +1,125 @@
-from django.shortcuts import render
+import time
 
-# Create your views here.
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+
+from recipes.api import (
+    DEFAULT_PAGE_SIZE, DEFAULT_RECIPE_FIELDS, MAX_PAGE_SIZE, RECIPE_FIELDS,
+    RECIPE_INCLUDES, ApiError, api_error_response, parse_fields,
+    parse_ids, parse_include, parse_max_time, serialize_by_id,
+)
+from metrics.registry import Histogram
+from recipes.models import Recipe
+from . import cache
+from .fuzzy import did_you_mean, fuzzy_search
+from .models import SearchHistory
+
+
+MAX_QUERY_LENGTH = 255
+MAX_TAG_FILTERS = 5
+
+SEARCH_SECONDS = Histogram(
+    'search_duration_seconds', 'Time to find the results of a search',
+    ['cache'])
+
+
+def _parse_search(request):
+    query = ' '.join(request.GET.get('q', '').split())
+    if not query:
+        raise ApiError("q is required")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ApiError(f"q can be at most {MAX_QUERY_LENGTH} characters")
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ApiError("limit must be an integer")
+    return query, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def search_recipe_ids(query, tag_ids=(), max_time=None):
+    """
+    Up to MAX_PAGE_SIZE matching public recipe ids, best first, a "did
+    you mean" suggestion (or None) and whether the fuzzy fallback ran.
+    Recipes must have every tag in ``tag_ids`` and take at most
+    ``max_time`` minutes.
+    """
+    recipes = Recipe.objects.public()
+    for tag_id in tag_ids:
+        recipes = recipes.filter(recipetag__tag_id=tag_id)
+    if max_time is not None:
+        recipes = recipes.quicker_than(max_time)
+
+    recipe_ids = list(recipes.filter(title__icontains=query).order_by(
+        '-id').values_list('id', flat=True)[:MAX_PAGE_SIZE])
+    if recipe_ids:
+        return recipe_ids, None, False
+    recipe_ids = fuzzy_search(recipes, 'title', query, MAX_PAGE_SIZE)
+    suggestion = did_you_mean(query)
+    if suggestion and suggestion.lower() == query.lower():
+        suggestion = None
+    return recipe_ids, suggestion, True
+
+
+def cached_search(query, tag_ids=(), max_time=None):
+    """search_recipe_ids(), answered from search.cache when possible."""
+    timer = time.perf_counter()
+    key = cache.cache_key(query, tag_ids, max_time)
+    cached = cache.results.get(key)
+    if cached is not None:
+        SEARCH_SECONDS.observe(time.perf_counter() - timer, cache='hit')
+        return cached
+    started = time.time()
+    recipe_ids, suggestion, fuzzy = search_recipe_ids(
+        cache.normalize_query(query), tag_ids, max_time)
+    cache.results.put(key, started,
+                      cache.dependencies(query, tag_ids, fuzzy),
+                      recipe_ids, suggestion)
+    SEARCH_SECONDS.observe(time.perf_counter() - timer, cache='miss')
+    return recipe_ids, suggestion
+
+
+@require_GET
+def recipe_search_api(request):
+    """
+    GET /api/search/?q=zuchini - search public recipes by title.
+    Narrow it with ?tag=3,7 (every tag must match) and ?max_time=30.
+
+    Exact (substring) matches come first. When there are none, the
+    search retries forgiving typos (see search.fuzzy) and suggests the
+    closest title or ingredient under "did_you_mean". Results are
+    cached (see search.cache).
+    """
+    try:
+        query, limit = _parse_search(request)
+        fields = parse_fields(request, RECIPE_FIELDS, DEFAULT_RECIPE_FIELDS)
+        include = parse_include(request, RECIPE_INCLUDES)
+        tag_ids = parse_ids(request.GET.get('tag', ''), MAX_TAG_FILTERS)
+        max_time = parse_max_time(request)
+    except ApiError as error:
+        return api_error_response(error)
+    if 'id' not in fields:
+        fields = ['id'] + fields
+
+    recipe_ids, suggestion = cached_search(query, tag_ids, max_time)
+    recipe_ids = recipe_ids[:limit]
+    found = serialize_by_id(recipe_ids, fields, include)
+    results = [found[i] for i in recipe_ids if i in found]
+
+    # Searches that find nothing show what the catalogue is missing
+    SearchHistory.objects.create(
+        user=request.user if request.user.is_authenticated else None,
+        search_query=query,
+        results_count=len(results),
+    )
+    return JsonResponse({
+        'results': results,
+        'did_you_mean': suggestion,
+    })
+
+
+@require_GET
+def search_cache_stats_api(request):
+    """GET /api/search/cache/ - search cache hit/miss counts (staff only)."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+    return JsonResponse(cache.stats())
@@ -0,0 +1,72 @@
+"""
+Activity timelines for recipes and users, read from ActivityEvent.
+
+Pages are keyset paginated on (created_at, id), newest first: the cursor
+handed back as ``next_before`` says where the last page stopped, so the
+next page continues the same index scan instead of counting past an
+OFFSET. Cursors look like "1760000000000000-123" (microseconds since the
+epoch, then the event id) and should be treated as opaque.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+from .models import ActivityEvent
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+EVENT_COLUMNS = ['id', 'verb', 'created_at', 'rating_value', 'excerpt',
+                 'recipe_id', 'recipe__title', 'actor__username']
+
+
+class InvalidCursor(ValueError):
+    """The ``before`` cursor couldn't be parsed."""
+
+
+def make_cursor(created_at, event_id):
+    micros = (created_at - EPOCH) // timedelta(microseconds=1)
+    return f'{micros}-{event_id}'
+
+
+def parse_cursor(cursor):
+    """'<microseconds>-<id>' -> (created_at, id)."""
+    micros, _, event_id = cursor.partition('-')
+    try:
+        return (EPOCH + timedelta(microseconds=int(micros)), int(event_id))
+    except (ValueError, OverflowError):
+        raise InvalidCursor(f"Invalid cursor: {cursor}")
+
+
+def timeline(queryset, limit, before=None):
+    """
+    One page of events from ``queryset`` (already filtered to a recipe or
+    an actor), newest first. Returns (events, next_before cursor or None).
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if before:
+        created_at, event_id = parse_cursor(before)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at)
+            | Q(created_at=created_at, id__lt=event_id))
+    rows = list(queryset.values(*EVENT_COLUMNS)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    events = []
+    for row in rows:
+        event = {
+            'id': row['id'],
+            'verb': row['verb'],
+            'actor': row['actor__username'],
+            'recipe_id': row['recipe_id'],
+            'recipe_title': row['recipe__title'],
+            'created_at': row['created_at'],
+        }
+        if row['verb'] == ActivityEvent.RATE:
+            event['rating'] = row['rating_value']
+        elif row['verb'] in (ActivityEvent.COMMENT, ActivityEvent.REPLY):
+            event['excerpt'] = row['excerpt']
+        events.append(event)
+    next_before = (make_cursor(rows[-1]['created_at'], rows[-1]['id'])
+                   if has_more else None)
+    return events, next_before
@@ -0,0 +1,41 @@
+"""
+Create ActivityEvent rows for likes, ratings and comments made before the
+activity stream existed.
+
+    python manage.py backfill_activity --batch-size 5000
+
+Each table is walked in primary key order one chunk at a time, and rows
+that already have an event are skipped by the database (one event per
+source row), so the command is safe to re-run or resume.
+"""
+from django.core.management.base import BaseCommand
+
+from social.models import ActivityEvent, Comment, Rating, UserLikes
+
+
+class Command(BaseCommand):
+    help = 'Backfill the activity stream from existing social rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        for model in (UserLikes, Rating, Comment):
+            last_id = 0
+            scanned = 0
+            while True:
+                rows = list(model.objects.filter(id__gt=last_id)
+                            .order_by('id')[:batch_size])
+                if not rows:
+                    break
+                ActivityEvent.objects.bulk_create(
+                    [ActivityEvent.for_source(row) for row in rows],
+                    ignore_conflicts=True,
+                )
+                scanned += len(rows)
+                last_id = rows[-1].id
+                self.stdout.write(f"...{model.__name__}: {scanned} rows "
+                                  f"(last id {last_id})")
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {ActivityEvent.objects.count()} activity events"))
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_recipes_rec_is_publ_3d0e59_idx'),
+        ('social', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['recipe', 'updated_at'], name='social_comm_recipe__1459d7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['updated_at'], name='social_comm_updated_69f01a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['recipe', 'updated_at'], name='social_rati_recipe__6ab273_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['updated_at'], name='social_rati_updated_f2fc9f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlikes',
+            index=models.Index(fields=['recipe', 'created_at'], name='social_user_recipe__d98e1c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userlikes',
+            index=models.Index(fields=['created_at'], name='social_user_created_0fbcb4_idx'),
+        ),
+    ]
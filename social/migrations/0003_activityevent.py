@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-19 19:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_deleted_at_recipe_is_deleted'),
+        ('social', '0002_comment_social_comm_recipe__1459d7_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('verb', models.CharField(choices=[('like', 'Liked'), ('rate', 'Rated'), ('comment', 'Commented on'), ('reply', 'Replied on')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('rating_value', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('excerpt', models.CharField(blank=True, help_text='start of the comment text', max_length=200)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('actor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.recipe')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['recipe', '-created_at', '-id'], name='social_acti_recipe__1e684a_idx'), models.Index(fields=['actor', '-created_at', '-id'], name='social_acti_actor_i_628c63_idx')],
+                'constraints': [models.UniqueConstraint(fields=('verb', 'object_id'), name='one_event_per_source_row')],
+            },
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 class Rating(models.Model):
@@ -17,6 +18,18 @@ class Rating(models.Model):
 
     class Meta:
         unique_together = ['recipe', 'user']  # One rating per user per recipe
+        indexes = [
+            models.Index(fields=['recipe', 'updated_at']),
+            models.Index(fields=['updated_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The activity event goes in the same transaction as the rating
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                ActivityEvent.record(self)
 
     def __str__(self):
         return f"{self.user.username} rated {self.recipe.title}: {self.rating_value} stars"
@@ -32,6 +45,18 @@ class UserLikes(models.Model):
 
     class Meta:
         unique_together = ['user', 'recipe']  # Prevent duplicate saves
+        indexes = [
+            models.Index(fields=['recipe', 'created_at']),
+            models.Index(fields=['created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The activity event goes in the same transaction as the like
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                ActivityEvent.record(self)
 
     def __str__(self):
         return f"{self.user.username} likes {self.recipe.title}"
@@ -53,6 +78,20 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['recipe', 'updated_at']),
+            models.Index(fields=['updated_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The activity event goes in the same transaction as the comment
+        with transaction.atomic():
+            adding = self._state.adding
+            super().save(*args, **kwargs)
+            if adding:
+                ActivityEvent.record(self)
+
     def __str__(self):
         if self.parent_comment:
             return f"Reply by {self.user.username} to {self.parent_comment.user.username}"
@@ -65,3 +104,82 @@ class Comment(models.Model):
     def is_reply(self):
         """Check if this is a reply to another comment"""
         return self.parent_comment is not None
+
+
+class ActivityEvent(models.Model):
+    """
+    Append-only activity stream: one row per like, rating and comment,
+    so "recent activity" for a recipe or a user is a single index scan
+    instead of three queries merged in Python. Written by the save() of
+    each of those models, in the same transaction.
+
+    Rows are never updated. The event for a like, rating or comment is
+    removed if that row is deleted (see social.signals).
+    """
+    LIKE = 'like'
+    RATE = 'rate'
+    COMMENT = 'comment'
+    REPLY = 'reply'
+    VERB_CHOICES = [
+        (LIKE, 'Liked'),
+        (RATE, 'Rated'),
+        (COMMENT, 'Commented on'),
+        (REPLY, 'Replied on'),
+    ]
+
+    actor = models.ForeignKey(User, on_delete=models.CASCADE)
+    recipe = models.ForeignKey('recipes.Recipe', on_delete=models.CASCADE)
+    verb = models.CharField(max_length=10, choices=VERB_CHOICES)
+    # pk of the Rating / UserLikes / Comment row the event is about
+    object_id = models.BigIntegerField()
+    # the rating as first given - later changes don't rewrite history
+    rating_value = models.PositiveSmallIntegerField(null=True, blank=True)
+    excerpt = models.CharField(max_length=200, blank=True,
+                               help_text='start of the comment text')
+    # when the like/rating/comment happened (not when the row was written)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # timelines, newest first, paged by (created_at, id)
+            models.Index(fields=['recipe', '-created_at', '-id']),
+            models.Index(fields=['actor', '-created_at', '-id']),
+        ]
+        constraints = [
+            # one event per source row - makes the backfill repeatable
+            models.UniqueConstraint(fields=['verb', 'object_id'],
+                                    name='one_event_per_source_row'),
+        ]
+
+    def __str__(self):
+        return f"{self.actor_id} {self.verb} {self.recipe_id}"
+
+    @staticmethod
+    def for_source(obj):
+        """The (unsaved) event describing a Rating, UserLikes or Comment."""
+        event = ActivityEvent(actor_id=obj.user_id, recipe_id=obj.recipe_id,
+                              object_id=obj.pk, created_at=obj.created_at)
+        if isinstance(obj, Rating):
+            event.verb = ActivityEvent.RATE
+            event.rating_value = obj.rating_value
+        elif isinstance(obj, Comment):
+            event.verb = (ActivityEvent.REPLY if obj.parent_comment_id
+                          else ActivityEvent.COMMENT)
+            event.excerpt = obj.comment_text[:200]
+        else:
+            event.verb = ActivityEvent.LIKE
+        return event
+
+    @staticmethod
+    def record(obj):
+        ActivityEvent.for_source(obj).save()
+
+    @staticmethod
+    def forget(obj):
+        """Remove the event of a Rating, UserLikes or Comment being deleted."""
+        verbs = {
+            Rating: [ActivityEvent.RATE],
+            UserLikes: [ActivityEvent.LIKE],
+            Comment: [ActivityEvent.COMMENT, ActivityEvent.REPLY],
+        }[type(obj)]
+        ActivityEvent.objects.filter(verb__in=verbs, object_id=obj.pk).delete()
@@ -0,0 +1,66 @@
+"""
+Signal handlers for the social app.
+
+Ratings, likes and comments feed into data derived from the recipe, so
+each change queues the (coalesced) recipe refresh job rather than doing
+any work while the user waits. Likes and ratings also say what the user
+enjoys, so their personalised feed is rebuilt too.
+
+New rows write their activity event themselves (in save()); deleted
+rows take their event with them here.
+
+The write APIs remember each user's like/rating state in the cache to
+answer repeats (see social.throttle); changes made anywhere else (admin,
+shell) update that memory here, once the transaction commits.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.tasks import rebuild_feed, refresh_recipe
+from . import throttle
+from .models import ActivityEvent, Comment, Rating, UserLikes
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=UserLikes)
+@receiver(post_delete, sender=UserLikes)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def social_activity_changed(sender, instance, **kwargs):
+    refresh_recipe.enqueue(recipe_id=instance.recipe_id)
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+@receiver(post_save, sender=UserLikes)
+@receiver(post_delete, sender=UserLikes)
+def user_taste_changed(sender, instance, **kwargs):
+    rebuild_feed.enqueue(user_id=instance.user_id)
+
+
+@receiver(post_delete, sender=Rating)
+@receiver(post_delete, sender=UserLikes)
+@receiver(post_delete, sender=Comment)
+def social_row_deleted(sender, instance, **kwargs):
+    ActivityEvent.forget(instance)
+
+
+@receiver(post_save, sender=UserLikes)
+@receiver(post_delete, sender=UserLikes)
+def like_state_changed(sender, instance, signal, **kwargs):
+    key = throttle.like_state_key(instance.user_id, instance.recipe_id)
+    liked = signal is post_save
+    transaction.on_commit(lambda: throttle.remember(key, liked))
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def rating_state_changed(sender, instance, signal, **kwargs):
+    key = throttle.rating_state_key(instance.user_id, instance.recipe_id)
+    if signal is post_save:
+        value = instance.rating_value
+        transaction.on_commit(lambda: throttle.remember(key, value))
+    else:
+        transaction.on_commit(lambda: throttle.forget(key))
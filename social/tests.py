@@ -1,3 +1,153 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
 
-# Create your tests here.
+from recipes.models import Recipe
+from .models import ActivityEvent, Comment, Rating, UserLikes
+from .throttle import IP_BUCKET, USER_BUCKET, check_rate, counters
+
+
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        self.request.user = User.objects.create_user('cook')
+
+    def test_ip_rejection_leaves_the_user_bucket_alone(self):
+        for _ in range(IP_BUCKET.capacity):
+            IP_BUCKET.consume('10.0.0.1')
+
+        allowed, wait = check_rate(self.request)
+        self.assertFalse(allowed)
+        self.assertGreater(wait, 0)
+        self.assertEqual(USER_BUCKET.wait(self.request.user.pk), 0)
+        self.assertEqual(cache.get(USER_BUCKET.cache_key(
+            self.request.user.pk)), None)
+
+    def test_allowed_request_takes_from_both(self):
+        self.assertEqual(check_rate(self.request), (True, 0))
+        self.assertIsNotNone(cache.get(USER_BUCKET.cache_key(
+            self.request.user.pk)))
+        self.assertIsNotNone(cache.get(IP_BUCKET.cache_key('10.0.0.1')))
+
+
+class ActivityTests(TestCase):
+
+    def setUp(self):
+        self.recipe = Recipe.objects.create(
+            user=User.objects.create_user('cook'), title='Toast',
+            prep_time=1, cook_time=2, base_servings=1,
+            difficulty_level='Easy')
+        self.url = f'/api/recipes/{self.recipe.pk}/activity/'
+
+    def test_recipe_timeline_leaves_out_deleted_users(self):
+        fan, gone = (User.objects.create_user('fan'),
+                     User.objects.create_user('gone'))
+        UserLikes.objects.create(user=fan, recipe=self.recipe)
+        Comment.objects.create(user=gone, recipe=self.recipe,
+                               comment_text='Lovely')
+        self.assertEqual(len(self.client.get(self.url).json()['results']), 2)
+
+        User.objects.filter(pk=gone.pk).update(is_active=False)
+        results = self.client.get(self.url).json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertNotIn('Lovely', str(results))
+
+    def test_pages_of_likes_ratings_and_comments(self):
+        fan = User.objects.create_user('fan')
+        UserLikes.objects.create(user=fan, recipe=self.recipe)
+        Rating.objects.create(user=fan, recipe=self.recipe, rating_value=4)
+        comment = Comment.objects.create(user=fan, recipe=self.recipe,
+                                         comment_text='Lovely')
+        Comment.objects.create(user=fan, recipe=self.recipe,
+                               comment_text='Thanks', parent_comment=comment)
+
+        first = self.client.get(self.url, {'limit': 3}).json()
+        self.assertEqual([event['verb'] for event in first['results']],
+                         ['reply', 'comment', 'rate'])
+        self.assertEqual(first['results'][1]['excerpt'], 'Lovely')
+        self.assertEqual(first['results'][2]['rating'], 4)
+        second = self.client.get(
+            self.url, {'limit': 3, 'before': first['next_before']}).json()
+        self.assertEqual([event['verb'] for event in second['results']],
+                         ['like'])
+        self.assertIsNone(second['next_before'])
+
+    def test_removed_rows_take_their_events(self):
+        like = UserLikes.objects.create(
+            user=User.objects.create_user('fan'), recipe=self.recipe)
+        like.delete()
+        self.assertFalse(ActivityEvent.objects.exists())
+
+    def test_user_timeline_leaves_out_private_recipes(self):
+        fan = User.objects.create_user('fan')
+        UserLikes.objects.create(user=fan, recipe=self.recipe)
+        Recipe.objects.filter(pk=self.recipe.pk).update(is_public=False)
+        response = self.client.get('/api/users/fan/activity/')
+        self.assertEqual(response.json()['results'], [])
+
+    def test_bad_cursor_is_rejected(self):
+        response = self.client.get(self.url, {'before': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class WriteApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('fan')
+        self.recipe = Recipe.objects.create(
+            user=User.objects.create_user('cook'), title='Toast',
+            prep_time=1, cook_time=2, base_servings=1,
+            difficulty_level='Easy')
+        self.client.force_login(self.user)
+
+    def url(self, action):
+        return f'/api/recipes/{self.recipe.pk}/{action}/'
+
+    def test_repeated_like_is_answered_without_writing(self):
+        for _ in range(2):
+            response = self.client.post(self.url('like'))
+            self.assertEqual(response.json(), {'liked': True})
+        self.assertEqual(UserLikes.objects.count(), 1)
+        self.assertEqual(counters()['like'],
+                         {'allowed': 1, 'rejected': 0, 'deduplicated': 1})
+
+        self.client.delete(self.url('like'))
+        self.assertFalse(UserLikes.objects.exists())
+
+    def test_repeated_comment_returns_the_first(self):
+        first = self.client.post(self.url('comment'), {'text': 'Lovely'})
+        self.assertEqual(first.status_code, 201)
+        again = self.client.post(self.url('comment'), {'text': 'Lovely'})
+        self.assertEqual(again.json(),
+                         {'id': first.json()['id'], 'duplicate': True})
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_flood_of_ratings_is_turned_away(self):
+        for value in range(USER_BUCKET.capacity):
+            response = self.client.post(self.url('rating'),
+                                        {'value': value % 5 + 1})
+            self.assertEqual(response.status_code, 200)
+        response = self.client.post(self.url('rating'), {'value': 3})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(
+            Rating.objects.get(user=self.user).rating_value,
+            (USER_BUCKET.capacity - 1) % 5 + 1)
+
+
+class CommentInputTests(TestCase):
+
+    def test_parent_must_be_plain_digits(self):
+        user = User.objects.create_user('cook')
+        recipe = Recipe.objects.create(
+            user=user, title='Toast', prep_time=1, cook_time=2,
+            base_servings=1, difficulty_level='Easy')
+        cache.clear()
+        self.client.force_login(user)
+        response = self.client.post(
+            f'/api/recipes/{recipe.pk}/comment/',
+            {'text': 'Lovely', 'parent': '²'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,159 @@
+"""
+Throttling and de-duplication for the social write endpoints.
+
+Token buckets: every user and every IP address has a bucket of tokens
+that refills at a steady rate. Each write takes a token; an empty bucket
+means "429 Too Many Requests". A burst (the bucket's capacity) is fine,
+a sustained flood is not. Buckets live in the shared cache (Redis when
+REDIS_URL is set), so all web processes see the same counts.
+
+The buckets are read and written with plain cache get/set, so two
+requests racing on the same bucket can both get through - good enough
+for stopping floods, and it keeps this free of Redis-only features.
+
+Repeats: the last known like/rating state of each (user, recipe) is kept
+in the cache (and updated by social.signals whenever the rows change),
+so a double-click that asks for what is already true is answered
+straight away, without a database query or using up a token.
+
+allowed / rejected / deduplicated counts are kept per endpoint for
+metrics (see counters()).
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+
+from django.core.cache import cache
+
+
+STATE_TTL = 60 * 10
+COMMENT_REPEAT_WINDOW = 60
+OUTCOMES = ['allowed', 'rejected', 'deduplicated']
+ENDPOINTS = ['like', 'rating', 'comment']
+
+
+@dataclass(frozen=True)
+class TokenBucket:
+    """``capacity`` tokens, refilling at ``refill_per_second``."""
+    name: str
+    capacity: int
+    refill_per_second: float
+
+    def cache_key(self, key):
+        return f'throttle:{self.name}:{key}'
+
+    def _tokens(self, key, now):
+        tokens, updated = cache.get(self.cache_key(key), (self.capacity, now))
+        return min(self.capacity,
+                   tokens + (now - updated) * self.refill_per_second)
+
+    def wait(self, key, now=None):
+        """Seconds until ``key``'s bucket has a token (0: it has one now)."""
+        now = time.time() if now is None else now
+        tokens = self._tokens(key, now)
+        return 0 if tokens >= 1 else (1 - tokens) / self.refill_per_second
+
+    def consume(self, key, now=None):
+        """
+        Take one token from ``key``'s bucket.
+        Returns (allowed, seconds until a token is available).
+        """
+        now = time.time() if now is None else now
+        cache_key = self.cache_key(key)
+        tokens = self._tokens(key, now)
+        if tokens < 1:
+            return False, (1 - tokens) / self.refill_per_second
+        # Once a bucket would be full again it may as well not exist
+        full_in = (self.capacity - tokens + 1) / self.refill_per_second
+        cache.set(cache_key, (tokens - 1, now), int(full_in) + 1)
+        return True, 0
+
+
+# ~20 writes a minute per user after a burst of 20; an IP gets more
+# room as several people can share one (offices, phone networks)
+USER_BUCKET = TokenBucket('user', capacity=20, refill_per_second=1 / 3)
+IP_BUCKET = TokenBucket('ip', capacity=60, refill_per_second=1)
+
+
+def client_ip(request):
+    """
+    The caller's IP. Behind Heroku's router the real address is the
+    last one in X-Forwarded-For (earlier ones are whatever the client
+    sent, so they can't be trusted).
+    """
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if forwarded:
+        return forwarded.split(',')[-1].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def check_rate(request):
+    """
+    Take a token from both the user's and the IP's bucket - or from
+    neither, so a request turned away by one bucket doesn't use up the
+    other. Returns (allowed, retry_after seconds).
+    """
+    now = time.time()
+    user, ip = request.user.pk, client_ip(request)
+    wait = max(USER_BUCKET.wait(user, now), IP_BUCKET.wait(ip, now))
+    if wait:
+        return False, wait
+    USER_BUCKET.consume(user, now)
+    return IP_BUCKET.consume(ip, now)
+
+
+# ---------------------------------------------------------------------------
+# Last known state, for answering repeats without the database
+# ---------------------------------------------------------------------------
+
+def like_state_key(user_id, recipe_id):
+    return f'social:like:{user_id}:{recipe_id}'
+
+
+def rating_state_key(user_id, recipe_id):
+    return f'social:rating:{user_id}:{recipe_id}'
+
+
+def comment_repeat_key(user_id, recipe_id, text):
+    digest = hashlib.md5(text.encode()).hexdigest()[:12]
+    return f'social:comment:{user_id}:{recipe_id}:{digest}'
+
+
+def remember(key, value, timeout=STATE_TTL):
+    cache.set(key, value, timeout)
+
+
+def forget(key):
+    cache.delete(key)
+
+
+def recall(key):
+    return cache.get(key)
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+def counter_key(endpoint, outcome):
+    return f'throttle:count:{endpoint}:{outcome}'
+
+
+def count(endpoint, outcome):
+    key = counter_key(endpoint, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:  # evicted between add() and incr()
+            cache.add(key, 1, None)
+
+
+def counters():
+    """{'like': {'allowed': 10, 'rejected': 2, 'deduplicated': 5}, ...}"""
+    keys = {counter_key(endpoint, outcome): (endpoint, outcome)
+            for endpoint in ENDPOINTS for outcome in OUTCOMES}
+    values = cache.get_many(list(keys))
+    result = {endpoint: dict.fromkeys(OUTCOMES, 0) for endpoint in ENDPOINTS}
+    for key, (endpoint, outcome) in keys.items():
+        result[endpoint][outcome] = values.get(key, 0)
+    return result
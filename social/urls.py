@@ -0,0 +1,17 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('api/recipes/<int:pk>/activity/', views.recipe_activity_api,
+         name='recipe_activity_api'),
+    path('api/recipes/<int:pk>/like/', views.recipe_like_api,
+         name='recipe_like_api'),
+    path('api/recipes/<int:pk>/rating/', views.recipe_rating_api,
+         name='recipe_rating_api'),
+    path('api/recipes/<int:pk>/comment/', views.recipe_comment_api,
+         name='recipe_comment_api'),
+    path('api/social/throttle/', views.throttle_stats_api,
+         name='throttle_stats_api'),
+    path('api/users/<str:username>/activity/', views.user_activity_api,
+         name='user_activity_api'),
+]
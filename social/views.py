@@ -1,3 +1,197 @@
-from django.shortcuts import render
+import math
 
-# Create your views here.
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.views.decorators.http import (require_GET, require_http_methods,
+                                          require_POST)
+
+from recipes.api import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, api_error_response
+from recipes.models import Recipe
+from . import throttle
+from .activity import InvalidCursor, timeline
+from .models import ActivityEvent, Comment, Rating, UserLikes
+
+
+MAX_COMMENT_LENGTH = 5000
+
+
+def _page_params(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidCursor("limit must be an integer")
+    return max(1, min(limit, MAX_PAGE_SIZE)), request.GET.get('before')
+
+
+def _timeline_response(request, queryset):
+    try:
+        limit, before = _page_params(request)
+        events, next_before = timeline(queryset, limit, before)
+    except InvalidCursor as error:
+        return api_error_response(error)
+    return JsonResponse({'results': events, 'next_before': next_before})
+
+
+@require_GET
+def recipe_activity_api(request, pk):
+    """
+    GET /api/recipes/<pk>/activity/ - likes, ratings and comments on a
+    public recipe, newest first. Page with ?before=<next_before>.
+    Deleted (deactivated) users' activity is left out.
+    """
+    if not Recipe.objects.public().filter(pk=pk).exists():
+        return JsonResponse({'error': 'Recipe not found'}, status=404)
+    return _timeline_response(request, ActivityEvent.objects.filter(
+        recipe_id=pk, actor__is_active=True))
+
+
+@require_GET
+def user_activity_api(request, username):
+    """
+    GET /api/users/<username>/activity/ - what a user liked, rated and
+    commented on (public recipes only), newest first.
+    """
+    user_id = User.objects.filter(
+        username=username, is_active=True).values_list('id', flat=True).first()
+    if user_id is None:
+        return JsonResponse({'error': 'User not found'}, status=404)
+    return _timeline_response(request, ActivityEvent.objects.filter(
+        actor_id=user_id, recipe__is_public=True, recipe__is_deleted=False))
+
+
+# ---------------------------------------------------------------------------
+# Writes - throttled, and repeats are answered from the cache (see
+# social.throttle)
+# ---------------------------------------------------------------------------
+
+def _login_required_response():
+    return JsonResponse({'error': 'Log in first'}, status=401)
+
+
+def _not_found_response():
+    return JsonResponse({'error': 'Recipe not found'}, status=404)
+
+
+def _deduplicated(endpoint, data):
+    throttle.count(endpoint, 'deduplicated')
+    return JsonResponse(data)
+
+
+def _rate_limited(request, endpoint):
+    """A 429 response if the caller is over their limit, else None."""
+    allowed, retry_after = throttle.check_rate(request)
+    if allowed:
+        throttle.count(endpoint, 'allowed')
+        return None
+    throttle.count(endpoint, 'rejected')
+    response = JsonResponse(
+        {'error': 'Too many requests - try again shortly'}, status=429)
+    response['Retry-After'] = str(math.ceil(retry_after))
+    return response
+
+
+@require_http_methods(['POST', 'DELETE'])
+def recipe_like_api(request, pk):
+    """
+    POST /api/recipes/<pk>/like/ to like a public recipe, DELETE to
+    unlike it. Doing either twice is fine - the answer is the same.
+    """
+    if not request.user.is_authenticated:
+        return _login_required_response()
+    liked = request.method == 'POST'
+    state_key = throttle.like_state_key(request.user.pk, pk)
+    if throttle.recall(state_key) == liked:
+        return _deduplicated('like', {'liked': liked})
+    limited = _rate_limited(request, 'like')
+    if limited:
+        return limited
+
+    if not Recipe.objects.public().filter(pk=pk).exists():
+        return _not_found_response()
+    if liked:
+        UserLikes.objects.get_or_create(user=request.user, recipe_id=pk)
+    else:
+        # delete() (not a raw update) so the signal handlers still run
+        UserLikes.objects.filter(user=request.user, recipe_id=pk).delete()
+    throttle.remember(state_key, liked)
+    return JsonResponse({'liked': liked})
+
+
+@require_POST
+def recipe_rating_api(request, pk):
+    """
+    POST /api/recipes/<pk>/rating/ with value=1..5 to rate a public
+    recipe (or change your rating).
+    """
+    if not request.user.is_authenticated:
+        return _login_required_response()
+    try:
+        value = int(request.POST.get('value', ''))
+    except ValueError:
+        value = None
+    if value is None or not 1 <= value <= 5:
+        return api_error_response("value must be a whole number from 1 to 5")
+    state_key = throttle.rating_state_key(request.user.pk, pk)
+    if throttle.recall(state_key) == value:
+        return _deduplicated('rating', {'rating': value})
+    limited = _rate_limited(request, 'rating')
+    if limited:
+        return limited
+
+    if not Recipe.objects.public().filter(pk=pk).exists():
+        return _not_found_response()
+    Rating.objects.update_or_create(
+        user=request.user, recipe_id=pk, defaults={'rating_value': value})
+    throttle.remember(state_key, value)
+    return JsonResponse({'rating': value})
+
+
+@require_POST
+def recipe_comment_api(request, pk):
+    """
+    POST /api/recipes/<pk>/comment/ with text=... (and parent=<comment
+    id> for a reply). Sending the same comment again within a minute
+    returns the first one instead of posting it twice.
+    """
+    if not request.user.is_authenticated:
+        return _login_required_response()
+    text = request.POST.get('text', '').strip()
+    if not text:
+        return api_error_response("text is required")
+    if len(text) > MAX_COMMENT_LENGTH:
+        return api_error_response(
+            f"text can be at most {MAX_COMMENT_LENGTH} characters")
+    parent_id = request.POST.get('parent') or None
+    if parent_id is not None and not parent_id.isdecimal():
+        return api_error_response("parent must be a comment id")
+    repeat_key = throttle.comment_repeat_key(
+        request.user.pk, pk, f'{parent_id}:{text}')
+    earlier = throttle.recall(repeat_key)
+    if earlier is not None:
+        return _deduplicated('comment', {'id': earlier, 'duplicate': True})
+    limited = _rate_limited(request, 'comment')
+    if limited:
+        return limited
+
+    if not Recipe.objects.public().filter(pk=pk).exists():
+        return _not_found_response()
+    if parent_id is not None and not Comment.objects.filter(
+            pk=parent_id, recipe_id=pk).exists():
+        return api_error_response("parent is not a comment on this recipe")
+    comment = Comment.objects.create(
+        user=request.user, recipe_id=pk, comment_text=text,
+        parent_comment_id=parent_id)
+    throttle.remember(repeat_key, comment.pk,
+                      timeout=throttle.COMMENT_REPEAT_WINDOW)
+    return JsonResponse({'id': comment.pk, 'duplicate': False}, status=201)
+
+
+@require_GET
+def throttle_stats_api(request):
+    """
+    GET /api/social/throttle/ - allowed, rejected and deduplicated
+    write counts per endpoint (staff only).
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff only'}, status=403)
+    return JsonResponse(throttle.counters())
@@ -0,0 +1,35 @@
+"""
+Signal handlers for the tags app.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.masterdata import bump_version
+from recipes.signals import touch_recipe
+from recipes.tasks import refresh_recipe, refresh_tag_cards, retag_by_time
+from .models import RecipeTag, Tag
+
+
+@receiver(post_save, sender=RecipeTag)
+@receiver(post_delete, sender=RecipeTag)
+def recipe_tag_changed(sender, instance, **kwargs):
+    # Tags show up on recipe pages, so the recipe counts as changed
+    touch_recipe(instance.recipe_id)
+    refresh_recipe.enqueue(recipe_id=instance.recipe_id)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    # Time tags are assigned from each recipe's total time
+    if instance.tag_type == 'time':
+        retag_by_time.enqueue()
+    # Recipe cards show tag names and colours
+    if not created:
+        refresh_tag_cards.enqueue(tag_id=instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    # Every process reloads its cached tags (see recipes.masterdata)
+    bump_version(Tag)